@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'questionnaire.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'questionnaire.middleware.DownloadRedirectMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,10 +77,39 @@ WSGI_APPLICATION = 'csr_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite is tuned for concurrent use: WAL lets readers run alongside the
+# single writer (switched on once by migration 0011, as it is stored in the
+# database file), busy_timeout (OPTIONS['timeout']) makes writers queue
+# instead of failing with "database is locked", and IMMEDIATE transactions
+# take the write lock up front so two transactions never deadlock trying to
+# upgrade a read lock. synchronous=NORMAL is durable across crashes of the
+# app in WAL mode; only a power loss can drop the last transactions.
+SQLITE_PRAGMAS = [
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=134217728',  # 128 MB
+    'PRAGMA cache_size=-32000',    # 32 MB
+    'PRAGMA temp_store=MEMORY',
+]
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reuse connections across requests (WSGI workers; ASGI requests
+        # run their ORM calls on per-request threads)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRAGMAS),
+        },
+        'TEST': {
+            # A file rather than the default in-memory database, so tests
+            # exercise the same WAL locking as production; kept out of the
+            # source tree along with its -wal/-shm files
+            'NAME': Path(tempfile.gettempdir()) / 'csr_test_db.sqlite3',
+        },
     }
 }
 
@@ -126,5 +157,68 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Add session support
-# SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Where sessions live. None of these touch the database per request:
+#   'signed_cookies' - in the client's cookie, signed with SECRET_KEY; no
+#                      server state, works with any number of workers
+#   'cache'          - in SESSION_CACHE_ALIAS; the cache must be shared by
+#                      all workers (Memcached/Redis), not the per-process
+#                      local-memory default
+#   'cached_db'      - cache in front of the django_session table
+# 'db' restores Django's default of one query per request.
+SESSION_STORAGE = 'signed_cookies'
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_STORAGE}'
+SESSION_CACHE_ALIAS = 'default'
 # SESSION_COOKIE_AGE = 86400  # 1 day
+
+# Questionnaire PDF generation
+# Number of pre-rendered question bodies kept in memory per worker
+PDF_TEMPLATE_CACHE_SIZE = 32
+# Import reportlab and load PDF fonts when the worker starts instead of on
+# the first download; the cost is logged by questionnaire.font_registry
+PDF_PRELOAD = False
+# Write questionnaire PDFs in compact mode (see questionnaire.pdf): about a
+# third of the size, same content. `manage.py benchmark_pdf` reports both.
+PDF_COMPACT_OUTPUT = True
+# How long browsers may reuse a downloaded questionnaire PDF (seconds)
+PDF_CACHE_MAX_AGE = 3600
+# Worker processes rendering PDFs (0 renders on the request thread), extra
+# jobs allowed to wait for a worker, and the per-job timeout in seconds.
+# Requests beyond workers + queue get a 503 with Retry-After. Each worker is
+# a full Django process of about 55 MB, started on the first download.
+# A job over the timeout gets a 503 and its pool is restarted, so a hung
+# render cannot keep a worker; the timeout is not enforced when rendering
+# on the request thread.
+PDF_RENDER_WORKERS = 2
+PDF_RENDER_QUEUE_SIZE = 8
+PDF_RENDER_TIMEOUT = 30
+PDF_RENDER_RETRY_AFTER = 5
+# Lifetime in seconds of the signed links download_trigger hands out
+PDF_DOWNLOAD_TOKEN_MAX_AGE = 300
+# Fonts for PDFs in other languages, as language code -> (text, title) TTF
+# paths, relative to questionnaire/fonts/. Loaded on the first download in
+# that language; a language whose fonts are missing is rendered in English.
+# The fonts are not shipped: copy the Noto Sans TTFs into questionnaire/fonts/
+# when deploying, and `pip install uharfbuzz rlbidi` so that the scripts are
+# shaped. With PDF_PRELOAD, startup logs a warning when either is missing.
+PDF_LANGUAGE_FONTS = {
+    'hi': ('NotoSansDevanagari-Regular.ttf', 'NotoSansDevanagari-Bold.ttf'),
+    'ta': ('NotoSansTamil-Regular.ttf', 'NotoSansTamil-Bold.ttf'),
+}
+
+# Response uploads
+# Largest response PDF accepted, in bytes; bigger uploads are cut off early
+RESPONSE_PDF_MAX_SIZE = 10 * 1024 * 1024
+# Threads reading answers out of uploaded PDFs (0 reads them on the request
+# thread); `manage.py extract_answers` backfills older uploads
+ANSWER_EXTRACTION_WORKERS = 1
+
+# Application IDs
+# Counter values each worker reserves at a time for new application IDs
+APPLICATION_ID_BLOCK_SIZE = 50
+# Key for the application ID permutation; defaults to SECRET_KEY. Keep it
+# stable once registrations have started.
+# APPLICATION_ID_KEY = ''
+
+# Performance metrics
+# Requests slower than this many seconds are logged; None disables it
+METRICS_SLOW_REQUEST_SECONDS = 1.0
@@ -20,6 +20,8 @@ from questionnaire import views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
     path('', views.home, name='home'),
     path('set-language/<str:language>/', views.set_language, name='set_language'),
     path('section-a/', views.section_a, name='section_a'),
@@ -32,10 +34,7 @@ urlpatterns = [
          views.download_trigger, name='download_trigger'),
     path('download-trigger/<str:application_id>/<str:download_type>/<str:section_key>/', 
          views.download_trigger, name='download_trigger_section'),
-    path('serve-pdf/<str:application_id>/<str:pdf_type>/', 
-         views.serve_pdf, name='serve_pdf'),
-    path('serve-pdf/<str:application_id>/<str:pdf_type>/<str:section_key>/', 
-         views.serve_pdf, name='serve_pdf_section'),
+    path('serve-pdf/<str:token>/', views.serve_pdf, name='serve_pdf'),
     path('upload/', views.upload_start, name='upload_start'),
     path('upload/<str:application_id>/', views.upload_pdf, name='upload_pdf'),
     path('upload/success/<str:application_id>/', views.upload_success, name='upload_success'),
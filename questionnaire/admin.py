@@ -1,3 +1,262 @@
-from django.contrib import admin
+import io
+import sys
 
-# Register your models here.
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.http import content_disposition_header
+
+from .analytics import dashboard_data
+from .definitions import copy_version, publish_version
+from .forms import RespondentImportForm
+from .imports import ImportFormatError, import_respondents
+from .models import (
+    AnalyticsSummary, QuestionnaireQuestion, QuestionnaireSection, QuestionnaireVersion, Respondent, ResponsePDF,
+)
+
+
+def _estimated_rows(model, using):
+    """Cheap row estimate for a whole table, without COUNT(*)"""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    # Walks one end of the primary key index; deleted rows make it an overestimate
+    return model._default_manager.using(using).aggregate(n=Max('pk'))['n'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts a large table in full. Unfiltered lists use a
+    table estimate; filtered ones are counted up to COUNT_LIMIT rows, so the
+    last pages of a very broad filter are not listed.
+    """
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = _estimated_rows(queryset.model, queryset.db)
+            if estimate > self.COUNT_LIMIT:
+                return estimate
+        # COUNT(*) over a LIMITed subquery stops after COUNT_LIMIT rows
+        return queryset.values('pk')[:self.COUNT_LIMIT].count()
+
+
+def prefix_filter(field, term):
+    """`field` starts with `term`, as an index range instead of LIKE"""
+    # LIKE is case-insensitive on SQLite and cannot use the default indexes
+    following = ord(term[-1]) + 1
+    if following > sys.maxunicode or 0xD800 <= following <= 0xDFFF:
+        # No character follows the last one, or only a lone surrogate,
+        # which the database cannot be sent
+        return Q(**{f'{field}__startswith': term})
+    return Q(**{f'{field}__gte': term, f'{field}__lt': term[:-1] + chr(following)})
+
+
+class ScalableAdminMixin:
+    """Change list settings that stay fast with millions of rows"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['-pk']
+    # Searched as prefixes through their indexes (see get_search_results)
+    prefix_search_fields = []
+    search_help_text = "Start of an application ID or mobile number"
+
+    def get_search_fields(self, request):
+        # Only so the search box is shown
+        return self.prefix_search_fields
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.prefix_search_fields:
+            condition |= prefix_filter(field, term)
+        return queryset.filter(condition), False
+
+
+@admin.register(Respondent)
+class RespondentAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['application_id', 'name', 'mobile_number', 'state', 'profession', 'created_at']
+    list_filter = ['state', 'profession', 'specialization']
+    prefix_search_fields = ['application_id', 'mobile_number']
+    readonly_fields = ['application_id', 'created_at']
+    change_list_template = 'admin/questionnaire/respondent/change_list.html'
+
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_view), name='questionnaire_respondent_import'),
+        ]
+        return urls + super().get_urls()
+
+    def import_view(self, request):
+        """Upload a CSV of pre-registered respondents (see imports.py)"""
+        if not self.has_add_permission(request):
+            return redirect('admin:questionnaire_respondent_changelist')
+
+        form = RespondentImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            errors = io.StringIO()
+            source = io.TextIOWrapper(form.cleaned_data['csv_file'], encoding='utf-8-sig', newline='')
+            try:
+                result = import_respondents(source, errors, dry_run=form.cleaned_data['dry_run'])
+            except (ImportFormatError, UnicodeDecodeError, ValueError) as exc:
+                form.add_error('csv_file', str(exc))
+            else:
+                verb = "would be imported" if form.cleaned_data['dry_run'] else "imported"
+                self.message_user(request, f"{result.created} of {result.rows} respondents {verb}.")
+                if not result.failed:
+                    return redirect('admin:questionnaire_respondent_changelist')
+                # Hand the rejected rows back so they can be fixed and re-uploaded
+                self.message_user(request, f"{result.failed} rows were rejected.", messages.WARNING)
+                response = HttpResponse(errors.getvalue(), content_type='text/csv; charset=utf-8')
+                response['Content-Disposition'] = content_disposition_header(True, 'import-errors.csv')
+                return response
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import respondents",
+            'form': form,
+            'changelist_url': reverse('admin:questionnaire_respondent_changelist'),
+        }
+        return TemplateResponse(request, 'admin/questionnaire/respondent/import.html', context)
+
+
+@admin.register(ResponsePDF)
+class ResponsePDFAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'respondent', 'upload_date', 'is_verified', 'answers_extracted_at']
+    list_filter = ['is_verified']
+    list_select_related = ['respondent']
+    prefix_search_fields = ['respondent__application_id', 'respondent__mobile_number']
+    # A select of every respondent would be rendered otherwise
+    raw_id_fields = ['respondent']
+    readonly_fields = ['sha256', 'upload_date', 'verification_code', 'answers_extracted_at', 'extraction_error']
+
+
+@admin.register(AnalyticsSummary)
+class AnalyticsSummaryAdmin(admin.ModelAdmin):
+    """Dashboard over the precomputed totals; never touches the respondent tables"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            return redirect('admin:index')
+        context = {
+            **self.admin_site.each_context(request),
+            **dashboard_data(),
+            'opts': self.model._meta,
+            'title': "Analytics",
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/questionnaire/analyticssummary/dashboard.html', context)
+
+
+def _published(version):
+    # Compiled versions are cached by number, so published ones stay frozen
+    return version is not None and version.published_at is not None
+
+
+class QuestionnaireSectionInline(admin.TabularInline):
+    model = QuestionnaireSection
+    fields = ['position', 'key', 'title', 'title_translations']
+    extra = 0
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return not _published(obj) and super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        return not _published(obj) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not _published(obj) and super().has_delete_permission(request, obj)
+
+
+class QuestionnaireQuestionInline(admin.TabularInline):
+    model = QuestionnaireQuestion
+    fields = ['position', 'text', 'translations']
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return not (obj and _published(obj.version)) and super().has_add_permission(request, obj)
+
+    def has_change_permission(self, request, obj=None):
+        return not (obj and _published(obj.version)) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not (obj and _published(obj.version)) and super().has_delete_permission(request, obj)
+
+
+@admin.register(QuestionnaireVersion)
+class QuestionnaireVersionAdmin(admin.ModelAdmin):
+    """Draft, publish and copy questionnaire versions (see definitions.py)"""
+    list_display = ['number', 'note', 'is_active', 'published_at', 'created_at']
+    fields = ['number', 'note']
+    inlines = [QuestionnaireSectionInline]
+    actions = ['publish', 'copy_as_draft']
+
+    def get_changeform_initial_data(self, request):
+        last = QuestionnaireVersion.objects.order_by('-number').values_list('number', flat=True).first()
+        return {'number': (last or 0) + 1}
+
+    def has_change_permission(self, request, obj=None):
+        return not _published(obj) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not (obj and obj.is_active) and super().has_delete_permission(request, obj)
+
+    @admin.action(description="Publish the selected version", permissions=['change'])
+    def publish(self, request, queryset):
+        if len(queryset) != 1:
+            self.message_user(request, "Select exactly one version to publish.", messages.ERROR)
+            return
+        version = queryset[0]
+        publish_version(version)
+        self.message_user(request, f"{version} is now used for new downloads.")
+
+    @admin.action(description="Copy as a new draft version", permissions=['add'])
+    def copy_as_draft(self, request, queryset):
+        for version in queryset:
+            draft = copy_version(version)
+            self.message_user(request, f"Created draft {draft} from {version}.")
+
+
+@admin.register(QuestionnaireSection)
+class QuestionnaireSectionAdmin(admin.ModelAdmin):
+    list_display = ['title', 'key', 'version', 'position']
+    list_filter = ['version']
+    list_select_related = ['version']
+    inlines = [QuestionnaireQuestionInline]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'version':
+            kwargs['queryset'] = QuestionnaireVersion.objects.filter(published_at__isnull=True)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def has_change_permission(self, request, obj=None):
+        return not (obj and _published(obj.version)) and super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        return not (obj and _published(obj.version)) and super().has_delete_permission(request, obj)
@@ -0,0 +1,123 @@
+"""
+Precomputed respondent and funnel counts for the analytics dashboard.
+
+AnalyticsSummary holds one row per (state, profession, specialization,
+gender) with running totals. The views bump them where the event happens,
+in the same transaction: registration, a claimed full or section download,
+an upload and its verification. The dashboard then only sums this small
+table, however many respondents there are.
+
+Changes made outside those paths (admin edits, deletions, shell scripts)
+are not tracked; the rebuild_analytics command recomputes everything from
+Respondent and ResponsePDF.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+
+from .models import AnalyticsSummary, Respondent, ResponsePDF
+
+DIMENSIONS = ('state', 'profession', 'specialization', 'gender')
+COUNTERS = ('respondents', 'full_downloads', 'section_downloads', 'uploads', 'verified_uploads')
+
+
+def dimensions_of(respondent):
+    return tuple(getattr(respondent, name) for name in DIMENSIONS)
+
+
+def increment(key, **counts):
+    """Add `counts` to the summary row for the dimension values in `key`"""
+    lookup = dict(zip(DIMENSIONS, key))
+    changes = {name: F(name) + value for name, value in counts.items()}
+    with transaction.atomic():
+        if AnalyticsSummary.objects.filter(**lookup).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                AnalyticsSummary.objects.create(**lookup, **counts)
+        except IntegrityError:
+            # Another request created the row first
+            AnalyticsSummary.objects.filter(**lookup).update(**changes)
+
+
+def record_registrations(respondents):
+    """Count newly created respondents, one UPDATE per distinct combination"""
+    for key, count in Counter(dimensions_of(r) for r in respondents).items():
+        increment(key, respondents=count)
+
+
+def record_download(application_id, full):
+    """Count a download claimed by the respondent with `application_id`"""
+    counter = 'full_downloads' if full else 'section_downloads'
+    # One UPDATE finding the respondent's row through a subquery; the
+    # dimension values are only read when the row has to be created
+    respondent = Respondent.objects.filter(
+        application_id=application_id, **{name: OuterRef(name) for name in DIMENSIONS})
+    if AnalyticsSummary.objects.filter(Exists(respondent)).update(**{counter: F(counter) + 1}):
+        return
+    key = Respondent.objects.values_list(*DIMENSIONS).get(application_id=application_id)
+    increment(key, **{counter: 1})
+
+
+def record_upload(respondent):
+    increment(dimensions_of(respondent), uploads=1)
+
+
+def record_verification(respondent):
+    increment(dimensions_of(respondent), verified_uploads=1)
+
+
+def compute_summary(chunk_size=5000):
+    """Totals per dimension key, recomputed from the source tables"""
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    rows = Respondent.objects.values_list(*DIMENSIONS, 'full_downloaded', 'sections_downloaded')
+    for *key, full_downloaded, sections_downloaded in rows.iterator(chunk_size=chunk_size):
+        counts = totals[tuple(key)]
+        counts['respondents'] += 1
+        counts['full_downloads'] += bool(full_downloaded)
+        counts['section_downloads'] += len(sections_downloaded or {})
+
+    uploads = (ResponsePDF.objects
+               .values_list(*[f'respondent__{name}' for name in DIMENSIONS])
+               .annotate(uploads=Count('pk'), verified=Count('pk', filter=Q(is_verified=True)))
+               .order_by())
+    for *key, upload_count, verified_count in uploads:
+        counts = totals[tuple(key)]
+        counts['uploads'] += upload_count
+        counts['verified_uploads'] += verified_count
+    return totals
+
+
+def rebuild_summary():
+    """Replace the summary table with freshly computed totals; returns the row count"""
+    # Readers never see a half-rebuilt table; on SQLite the write lock is
+    # held from the start, so events recorded meanwhile wait for it
+    with transaction.atomic():
+        rows = [AnalyticsSummary(**dict(zip(DIMENSIONS, key)), **counts)
+                for key, counts in compute_summary().items()]
+        AnalyticsSummary.objects.all().delete()
+        AnalyticsSummary.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def dashboard_data():
+    """Totals, funnel and per-dimension breakdowns, read from the summary only"""
+    sums = {name: Sum(name) for name in COUNTERS}
+    totals = {name: value or 0 for name, value in AnalyticsSummary.objects.aggregate(**sums).items()}
+    breakdowns = {
+        name: [{'label': row.pop(name), **row}
+               for row in AnalyticsSummary.objects.values(name).annotate(**sums).order_by(name)]
+        for name in DIMENSIONS
+    }
+    registered = totals['respondents']
+    funnel = [
+        (label, totals[name], round(100 * totals[name] / registered, 1) if registered else 0)
+        for label, name in (
+            ("Registered", 'respondents'),
+            ("Full questionnaire downloads", 'full_downloads'),
+            ("Uploads", 'uploads'),
+            ("Verified uploads", 'verified_uploads'),
+        )
+    ]
+    return {'totals': totals, 'funnel': funnel, 'breakdowns': breakdowns}
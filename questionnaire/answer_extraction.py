@@ -0,0 +1,190 @@
+"""
+Extraction of answers from uploaded response PDFs.
+
+The PDFs we hand out name their answer fields answer_<section>_<idx> (full
+questionnaire) or answer_<idx> (one section, identified by the document
+keywords or, for older copies, the printed section title). Once an upload
+is saved, schedule_extraction() hands it to a small thread pool so the
+request never waits for parsing; ANSWER_EXTRACTION_WORKERS = 0 extracts
+inline instead. Answers are stored as one Answer row per respondent,
+section and question, and a later upload replaces earlier answers.
+
+Section keys, titles and question counts come from the questionnaire
+version the PDF was downloaded with, which the document keywords name;
+copies without it are read against the active version. Answers are kept
+per version, so a later version's renumbered questions never overwrite
+them. The extract_answers management command backfills existing
+uploads. Nothing here needs Django at import time, so parse_upload() can run
+in spawned worker processes.
+"""
+import atexit
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .definitions import UnknownQuestionnaireVersion, get_questionnaire
+from .pdf_forms import PDFFormError, parse_form
+
+logger = logging.getLogger(__name__)
+
+FULL_FIELD_RE = re.compile(r'^answer_(?P<section>\w+)_(?P<index>\d+)$')
+SECTION_FIELD_RE = re.compile(r'^answer_(?P<index>\d+)$')
+# Written into the PDFs by pdf.section_keywords() and pdf.full_keywords()
+SECTION_KEYWORD_RE = re.compile(r'\bsection:(?P<section>\w+)')
+VERSION_KEYWORD_RE = re.compile(r'\bversion:(?P<version>\d+)')
+
+
+def form_questionnaire(form):
+    """
+    The questionnaire version `form` was downloaded with, or the active one
+    for older copies. Raises UnknownQuestionnaireVersion.
+    """
+    match = VERSION_KEYWORD_RE.search(form.keywords)
+    return get_questionnaire(int(match.group('version')) if match else None)
+
+
+def _form_section(form, questionnaire):
+    match = SECTION_KEYWORD_RE.search(form.keywords)
+    if match and match.group('section') in questionnaire.questions:
+        return match.group('section')
+    # Copies downloaded before the keywords were added: go by the title
+    found = [key for key, title in questionnaire.titles.items() if title in form.markers]
+    return found[0] if len(found) == 1 else None
+
+
+def answers_from_form(form, questionnaire=None):
+    """[(section, question_index, text)] for every filled-in answer field"""
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    questions = questionnaire.questions
+    answers = []
+    section = None
+    for name, value in form.fields.items():
+        text = (value or '').replace('\r\n', '\n').replace('\r', '\n').strip()
+        if not text:
+            continue
+
+        full_match = FULL_FIELD_RE.match(name)
+        section_match = SECTION_FIELD_RE.match(name)
+        if full_match and full_match.group('section') in questions:
+            field_section, index = full_match.group('section'), int(full_match.group('index'))
+        elif section_match:
+            if section is None:
+                section = _form_section(form, questionnaire)
+                if section is None:
+                    raise PDFFormError("Could not tell which section this PDF belongs to")
+            field_section, index = section, int(section_match.group('index'))
+        else:
+            continue
+
+        if index < len(questions[field_section]):
+            answers.append((field_section, index, text))
+    return answers
+
+
+def parse_upload(path, markers):
+    """parse_form() for worker processes: returns (form, error)"""
+    try:
+        return parse_form(path, markers=markers), None
+    except (PDFFormError, OSError) as exc:
+        return None, str(exc) or type(exc).__name__
+
+
+def store_answers(response_pdf, answers, questionnaire_version):
+    from .models import Answer, ResponsePDF
+
+    rows = [
+        Answer(respondent_id=response_pdf.respondent_id, response_pdf_id=response_pdf.pk,
+               questionnaire_version=questionnaire_version,
+               section=section, question_index=index, text=text)
+        for section, index, text in answers
+    ]
+    with transaction.atomic():
+        if rows:
+            Answer.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['respondent', 'questionnaire_version', 'section', 'question_index'],
+                update_fields=['response_pdf', 'text', 'updated_at'],
+            )
+        ResponsePDF.objects.filter(pk=response_pdf.pk).update(
+            answers_extracted_at=timezone.now(), extraction_error='')
+
+
+def record_error(response_pdf, error):
+    from .models import ResponsePDF
+
+    logger.warning("Could not extract answers from response %s: %s", response_pdf.pk, error)
+    ResponsePDF.objects.filter(pk=response_pdf.pk).update(
+        answers_extracted_at=timezone.now(), extraction_error=error[:255])
+
+
+def store_form(response_pdf, form):
+    """Store the answers of a parsed upload; returns how many, or None on error"""
+    try:
+        questionnaire = form_questionnaire(form)
+        answers = answers_from_form(form, questionnaire)
+    except (UnknownQuestionnaireVersion, PDFFormError) as exc:
+        record_error(response_pdf, str(exc))
+        return None
+    store_answers(response_pdf, answers, questionnaire.version)
+    return len(answers)
+
+
+def extract_answers(response_pdf):
+    """Read one upload's answers into Answer rows; returns how many were stored"""
+    # Printed titles only identify older section copies without keywords
+    markers = list(get_questionnaire().titles.values())
+    form, error = parse_upload(response_pdf.pdf_file.path, markers)
+    if error is not None:
+        record_error(response_pdf, error)
+        return 0
+    return store_form(response_pdf, form) or 0
+
+
+def _extract_by_pk(response_pdf_id):
+    from .models import ResponsePDF
+
+    response_pdf = (ResponsePDF.objects.only('pk', 'respondent_id', 'pdf_file')
+                    .filter(pk=response_pdf_id).first())
+    if response_pdf is not None:
+        extract_answers(response_pdf)
+
+
+def _extract_in_background(response_pdf_id):
+    close_old_connections()
+    try:
+        _extract_by_pk(response_pdf_id)
+    except Exception:
+        logger.exception("Answer extraction failed for response %s", response_pdf_id)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ANSWER_EXTRACTION_WORKERS', 1),
+                thread_name_prefix='answer-extraction',
+            )
+            atexit.register(_executor.shutdown)
+        return _executor
+
+
+def schedule_extraction(response_pdf_id):
+    """Extract an upload's answers once the current transaction commits"""
+    if getattr(settings, 'ANSWER_EXTRACTION_WORKERS', 1) <= 0:
+        transaction.on_commit(lambda: _extract_by_pk(response_pdf_id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_extract_in_background, response_pdf_id))
@@ -0,0 +1,138 @@
+"""
+Allocation of 8-digit application IDs.
+
+IDs are derived from a DB-backed counter passed through a keyed permutation
+of the 8-digit range, so they are unique by construction yet not guessable
+from one another. Each process reserves blocks of counter values with a
+single UPDATE and hands them out from memory, so a registration normally
+costs no extra query at all.
+
+The permutation key comes from APPLICATION_ID_KEY (falling back to
+SECRET_KEY) and must stay stable. Each reserved block is still checked
+against existing rows in one query, which covers IDs issued by the old
+random generator or under a previous key.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+ID_MIN = 10000000
+ID_SPACE = 90000000  # 10000000..99999999
+COUNTER_NAME = 'application_id'
+
+# Feistel network over 28-bit values (2**28 > ID_SPACE); values that land
+# outside the 8-digit range are walked through the network again
+_HALF_BITS = 14
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+# Largest IN (...) list used when checking a block against existing rows
+_LOOKUP_CHUNK = 500
+
+
+class ApplicationIdsExhausted(Exception):
+    pass
+
+
+def _permutation_key():
+    secret = getattr(settings, 'APPLICATION_ID_KEY', None) or settings.SECRET_KEY
+    return hashlib.sha256(f'questionnaire.application_id:{secret}'.encode('utf-8')).digest()
+
+
+def _feistel(key, value):
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for round_no in range(_ROUNDS):
+        digest = hashlib.blake2b(f'{round_no}:{right}'.encode('ascii'), key=key, digest_size=4).digest()
+        left, right = right, left ^ (int.from_bytes(digest, 'big') & _HALF_MASK)
+    return (left << _HALF_BITS) | right
+
+
+def counter_to_id(counter_value, key=None):
+    """Map a counter value in [0, ID_SPACE) to its 8-digit application ID"""
+    if not 0 <= counter_value < ID_SPACE:
+        raise ApplicationIdsExhausted("All 8-digit application IDs have been allocated")
+    if key is None:
+        key = _permutation_key()
+    value = _feistel(key, counter_value)
+    while value >= ID_SPACE:
+        value = _feistel(key, value)
+    return str(ID_MIN + value)
+
+
+def _reserve(count):
+    """Atomically take `count` counter values; returns them as a range"""
+    from .models import ApplicationIdCounter
+
+    with transaction.atomic():
+        # Updating first takes the write lock before the value is read
+        updated = ApplicationIdCounter.objects.filter(name=COUNTER_NAME).update(value=F('value') + count)
+        if not updated:
+            ApplicationIdCounter.objects.create(name=COUNTER_NAME, value=count)
+        end = ApplicationIdCounter.objects.values_list('value', flat=True).get(name=COUNTER_NAME)
+    return range(end - count, end)
+
+
+def _drop_taken(ids):
+    """Remove IDs that already belong to a respondent"""
+    from .models import Respondent
+
+    taken = set()
+    for start in range(0, len(ids), _LOOKUP_CHUNK):
+        chunk = ids[start:start + _LOOKUP_CHUNK]
+        taken.update(Respondent.objects.filter(application_id__in=chunk)
+                     .values_list('application_id', flat=True))
+    return [app_id for app_id in ids if app_id not in taken] if taken else ids
+
+
+def allocate_application_ids(count):
+    """Allocate `count` unused application IDs in a handful of queries"""
+    key = _permutation_key()
+    allocated = []
+    while len(allocated) < count:
+        needed = count - len(allocated)
+        ids = [counter_to_id(value, key) for value in _reserve(needed)]
+        allocated.extend(_drop_taken(ids))
+    return allocated
+
+
+class ApplicationIdAllocator:
+    """Hands out application IDs from per-process blocks"""
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        with self._lock:
+            if self._ids:
+                return self._ids.pop()
+
+            # Leftovers of a block reserved inside a transaction could be
+            # rolled back with it, so only cache blocks from autocommit
+            if connection.in_atomic_block:
+                return allocate_application_ids(1)[0]
+
+            block = allocate_application_ids(self.block_size)
+            block.reverse()
+            app_id = block.pop()
+            self._ids = block
+            return app_id
+
+    def reset(self):
+        """Forget the cached block, e.g. after the counter has been reset"""
+        with self._lock:
+            self._ids = []
+
+
+def reset_allocator(sender, **kwargs):
+    """post_migrate receiver: drop IDs cached before a `flush`"""
+    # flush empties the counter table, so counting restarts from zero and
+    # the cached IDs would be handed out a second time
+    allocator.reset()
+
+
+allocator = ApplicationIdAllocator(getattr(settings, 'APPLICATION_ID_BLOCK_SIZE', 50))
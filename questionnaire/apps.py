@@ -1,6 +1,30 @@
+import multiprocessing
+
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class QuestionnaireConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'questionnaire'
+
+    def ready(self):
+        # Count SQL per request for the metrics middleware
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_recorder
+        connection_created.connect(install_query_recorder)
+
+        # Cached application IDs are stale once the counter table is flushed
+        from django.db.models.signals import post_migrate
+        from .application_ids import reset_allocator
+        post_migrate.connect(reset_allocator, sender=self)
+        # Likewise the compiled questionnaire versions
+        from .definitions import reset_registry
+        post_migrate.connect(reset_registry, sender=self)
+
+        # Optionally pay the reportlab import and font loading cost at
+        # worker startup instead of on the first download. PDF render
+        # workers load their fonts themselves and skip the startup report.
+        if getattr(settings, 'PDF_PRELOAD', False) and multiprocessing.parent_process() is None:
+            from .font_registry import warm_up
+            warm_up()
@@ -1,3 +1,6 @@
+# The questionnaire as first published. Live definitions are versioned in the
+# database (see definitions.py); this seeds version 1 and is used until a
+# version has been published.
 SECTION_B_QUESTIONS = {
     'legislative': [
         "What are the three lists in the Seventh Schedule of the Constitution, and how do they define the legislative powers of the Centre and states?",
@@ -41,4 +44,17 @@ SECTION_B_QUESTIONS = {
         "What are the main recommendations of the Sarkaria Commission concerning the role of Governors?",
         "Discuss the impact of the 42nd amendment on Centre-State relations.",
     ],
-}
\ No newline at end of file
+}
+
+# Titles printed on the section PDFs
+SECTION_TITLES = {
+    'legislative': 'Legislative Relations',
+    'administrative': 'Administrative Relations',
+    'financial': 'Financial Relations',
+    'commissions': 'Role of Commissions and Councils',
+    'constitutional': 'Constitutional and Judicial Influences',
+    'challenges': 'Challenges and Issues',
+    'examples': 'Specific Examples',
+    'articles': 'Important Articles',
+    'financial_articles': 'Articles Related to Financial Relations',
+}
@@ -0,0 +1,38 @@
+"""
+Database expressions used for in-place updates.
+"""
+import json
+
+from django.db.models import Func, JSONField
+from django.db.models.fields.json import compile_json_path
+
+
+class JSONSetKey(Func):
+    """
+    Set one top-level key of a JSON object column inside the UPDATE itself.
+
+    Used as QuerySet.update(field=JSONSetKey('field', key, value)) so the
+    column is changed without reading the object into Python first.
+    """
+    output_field = JSONField()
+
+    def __init__(self, expression, key, value):
+        self.key = key
+        self.value = json.dumps(value)
+        super().__init__(expression)
+
+    def _column_sql(self, compiler):
+        return compiler.compile(self.source_expressions[0])
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # MySQL / MariaDB
+        sql, params = self._column_sql(compiler)
+        return f"JSON_SET({sql}, %s, CAST(%s AS JSON))", (*params, compile_json_path([self.key]), self.value)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = self._column_sql(compiler)
+        return f"JSON_SET({sql}, %s, JSON(%s))", (*params, compile_json_path([self.key]), self.value)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = self._column_sql(compiler)
+        return f"JSONB_SET({sql}, ARRAY[%s], %s::jsonb)", (*params, self.key, self.value)
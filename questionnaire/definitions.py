@@ -0,0 +1,260 @@
+"""
+Questionnaire definitions, compiled once per process.
+
+The Section B questionnaire is stored in the database as numbered versions
+(QuestionnaireVersion -> QuestionnaireSection -> QuestionnaireQuestion). A
+version is compiled into an immutable Questionnaire the first time it is
+needed and shared by the views, the PDF renderers and answer extraction
+from then on. Published versions never change, so a compiled version is
+valid for as long as the process lives; only "which version is active" is
+looked up again, at most every QUESTIONNAIRE_REFRESH_INTERVAL seconds.
+
+Download tokens carry the version number, so a PDF is rendered (and its
+ETag computed) from the version that was active when the download started,
+in the web process and in the render workers alike.
+
+Sections and questions may carry translations. Each language found in a
+version is compiled alongside it (Questionnaire.in_language()); anything
+left untranslated keeps its English text.
+
+Before any version has been published the questions in constants.py are
+used, as version 0. Models are imported lazily: worker processes that never
+set Django up can still import this module.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from itertools import chain
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .constants import SECTION_B_QUESTIONS, SECTION_TITLES
+
+BUILTIN_VERSION = 0
+# Language of the title and text columns; translations are keyed by code
+DEFAULT_LANGUAGE = 'en'
+
+
+class UnknownQuestionnaireVersion(LookupError):
+    pass
+
+
+class Section(namedtuple('Section', 'key title questions')):
+    __slots__ = ()
+
+    @property
+    def count(self):
+        return len(self.questions)
+
+
+class Questionnaire:
+    """Compiled, read-only questionnaire: sections in order with their questions"""
+
+    __slots__ = ('version', 'language', 'sections', 'questions', 'titles', 'total_questions',
+                 'content_hash', 'translations')
+
+    def __init__(self, version, sections, language=DEFAULT_LANGUAGE, translations=None):
+        sections = tuple(Section(key, title, tuple(questions)) for key, title, questions in sections)
+        set_ = object.__setattr__
+        set_(self, 'version', version)
+        set_(self, 'language', language)
+        set_(self, 'sections', sections)
+        # Same shape as SECTION_B_QUESTIONS: section key -> questions
+        set_(self, 'questions', MappingProxyType({s.key: s.questions for s in sections}))
+        set_(self, 'titles', MappingProxyType({s.key: s.title for s in sections}))
+        set_(self, 'total_questions', sum(s.count for s in sections))
+        payload = json.dumps([language] + [[s.key, s.title, s.questions] for s in sections],
+                             separators=(',', ':'))
+        # Identifies the content, whatever the version number; keys PDF caches
+        set_(self, 'content_hash', hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16])
+        set_(self, 'translations', MappingProxyType({
+            code: Questionnaire(version, translated, code)
+            for code, translated in (translations or {}).items() if code != language
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Questionnaire is immutable")
+
+    def in_language(self, language):
+        """This questionnaire translated into `language`, or itself if there is no translation"""
+        return self.translations.get(language, self)
+
+    @classmethod
+    def from_dict(cls, questions, titles=None, version=BUILTIN_VERSION):
+        """Build from a SECTION_B_QUESTIONS-style dict"""
+        titles = titles or {}
+        return cls(version, [
+            (key, titles.get(key, key.replace('_', ' ').title()), section_questions)
+            for key, section_questions in questions.items()
+        ])
+
+    def __repr__(self):
+        return f"<Questionnaire v{self.version} {len(self.sections)} sections>"
+
+
+BUILTIN = Questionnaire.from_dict(SECTION_B_QUESTIONS, SECTION_TITLES)
+
+
+def _load(number):
+    """Compile version `number` from the database; returns (questionnaire, published)"""
+    from .models import QuestionnaireSection, QuestionnaireVersion
+
+    try:
+        version = QuestionnaireVersion.objects.only('number', 'published_at').get(number=number)
+    except QuestionnaireVersion.DoesNotExist:
+        raise UnknownQuestionnaireVersion(f"No questionnaire version {number}")
+    sections = (QuestionnaireSection.objects.filter(version=version)
+                .prefetch_related('questions').order_by('position', 'pk'))
+    rows = [
+        (section.key, section.title, section.title_translations or {},
+         [(question.text, question.translations or {}) for question in section.questions.all()])
+        for section in sections
+    ]
+    languages = {code for _, _, titles, questions in rows
+                 for code in chain(titles, *(translations for _, translations in questions))}
+    questionnaire = Questionnaire(
+        number,
+        [(key, title, [text for text, _ in questions]) for key, title, _, questions in rows],
+        translations={
+            code: [(key, titles.get(code) or title,
+                    [translations.get(code) or text for text, translations in questions])
+                   for key, title, titles, questions in rows]
+            for code in languages
+        },
+    )
+    return questionnaire, version.published_at is not None
+
+
+def _active_number():
+    from .models import QuestionnaireVersion
+
+    number = QuestionnaireVersion.objects.filter(is_active=True).values_list('number', flat=True).first()
+    return BUILTIN_VERSION if number is None else number
+
+
+class QuestionnaireRegistry:
+    """Compiled versions of this process, and which one is active"""
+
+    # Published versions kept compiled; old ones are only needed for links
+    # handed out just before a new version went live
+    MAX_VERSIONS = 4
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._compiled = OrderedDict()
+        self._active = None
+        self._checked_at = None
+
+    def _refresh_due(self):
+        interval = getattr(settings, 'QUESTIONNAIRE_REFRESH_INTERVAL', 30)
+        return self._checked_at is None or time.monotonic() - self._checked_at >= interval
+
+    def cached(self, number=None):
+        """The compiled version if no query is needed to return it, else None"""
+        with self._lock:
+            if number is None:
+                if self._refresh_due():
+                    return None
+                number = self._active
+            if number == BUILTIN_VERSION:
+                return BUILTIN
+            questionnaire = self._compiled.get(number)
+            if questionnaire is not None:
+                self._compiled.move_to_end(number)
+            return questionnaire
+
+    def get(self, number=None):
+        questionnaire = self.cached(number)
+        if questionnaire is not None:
+            return questionnaire
+
+        if number is None:
+            number = _active_number()
+            with self._lock:
+                self._active = number
+                self._checked_at = time.monotonic()
+            questionnaire = self.cached(number)
+            if questionnaire is not None:
+                return questionnaire
+
+        questionnaire, published = _load(number)
+        # Drafts can still change, so they are compiled afresh every time
+        if published:
+            with self._lock:
+                self._compiled[number] = questionnaire
+                while len(self._compiled) > self.MAX_VERSIONS:
+                    self._compiled.popitem(last=False)
+        return questionnaire
+
+    def reset(self):
+        with self._lock:
+            self._compiled.clear()
+            self._active = None
+            self._checked_at = None
+
+
+registry = QuestionnaireRegistry()
+
+
+def get_questionnaire(version=None):
+    """Compiled questionnaire `version`, or the active one"""
+    return registry.get(version)
+
+
+async def aget_questionnaire(version=None):
+    """get_questionnaire() for async views; only leaves the event loop to query"""
+    questionnaire = registry.cached(version)
+    if questionnaire is None:
+        questionnaire = await sync_to_async(registry.get)(version)
+    return questionnaire
+
+
+def publish_version(version):
+    """Freeze `version` and make it the one new downloads use"""
+    from .models import QuestionnaireVersion
+
+    with transaction.atomic():
+        QuestionnaireVersion.objects.filter(is_active=True).exclude(pk=version.pk).update(is_active=False)
+        version.is_active = True
+        version.published_at = version.published_at or timezone.now()
+        version.save(update_fields=['is_active', 'published_at'])
+    # Other processes notice within QUESTIONNAIRE_REFRESH_INTERVAL
+    registry.reset()
+
+
+def copy_version(version):
+    """New draft version with the same sections and questions, for editing"""
+    from .models import QuestionnaireQuestion, QuestionnaireSection, QuestionnaireVersion
+
+    with transaction.atomic():
+        last = QuestionnaireVersion.objects.order_by('-number').values_list('number', flat=True).first()
+        draft = QuestionnaireVersion.objects.create(number=last + 1, note=f"Copy of v{version.number}")
+        for section in version.sections.prefetch_related('questions'):
+            new_section = QuestionnaireSection.objects.create(
+                version=draft, key=section.key, title=section.title,
+                title_translations=section.title_translations, position=section.position)
+            QuestionnaireQuestion.objects.bulk_create([
+                QuestionnaireQuestion(section=new_section, text=question.text,
+                                      translations=question.translations, position=question.position)
+                for question in section.questions.all()
+            ])
+    return draft
+
+
+def reset_registry(sender, **kwargs):
+    """post_migrate receiver: a flush may have removed every version"""
+    registry.reset()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith('QUESTIONNAIRE_'):
+        registry.reset()
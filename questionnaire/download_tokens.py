@@ -0,0 +1,82 @@
+"""
+Signed, short-lived links to questionnaire PDFs.
+
+download_trigger mints a token once the download has been claimed. The
+token only names what to render (application ID, PDF type, section,
+questionnaire version and language) and is signed with SECRET_KEY, so a
+bare application ID is not enough to have a PDF rendered. The respondent
+details printed in the PDF header stay on the server: they are put in the
+default cache alongside the token, so serve_pdf usually needs no database
+query or session, and are read from the database when the cache does not
+have them (e.g. another worker's local-memory cache).
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .definitions import get_questionnaire
+from .models import Respondent
+
+SALT = 'questionnaire.download'
+
+# Respondent fields the PDF header needs
+HEADER_FIELDS = ('application_id', 'name', 'profession', 'specialization', 'state', 'created_at')
+
+
+class InvalidDownloadToken(Exception):
+    pass
+
+
+class ExpiredDownloadToken(InvalidDownloadToken):
+    pass
+
+
+def _max_age():
+    return getattr(settings, 'PDF_DOWNLOAD_TOKEN_MAX_AGE', 300)
+
+
+def _cache_key(application_id):
+    return f'questionnaire.download:{application_id}'
+
+
+def make_download_token(respondent, pdf_type, section_key=None, version=None, language=None):
+    """`version` defaults to the active questionnaire version, `language` to English"""
+    if version is None:
+        version = get_questionnaire().version
+    cache.set(_cache_key(respondent.application_id),
+              {field: getattr(respondent, field) for field in HEADER_FIELDS}, _max_age())
+
+    # A list rather than a dict keeps the URL short; a full PDF has no section
+    section_key = section_key if pdf_type == 'section' else None
+    return signing.dumps([respondent.application_id, section_key, version, language], salt=SALT)
+
+
+def read_download_token(token):
+    """
+    Return (application_id, pdf_type, section_key, questionnaire version,
+    language) for a valid token; language is None for English.
+    """
+    try:
+        value = signing.loads(token, salt=SALT, max_age=_max_age())
+    except signing.SignatureExpired as exc:
+        raise ExpiredDownloadToken(str(exc)) from exc
+    except signing.BadSignature as exc:
+        raise InvalidDownloadToken(str(exc)) from exc
+
+    try:
+        application_id, section_key, version, language = value
+        pdf_type = 'section' if section_key else 'full'
+        return application_id, pdf_type, section_key or None, int(version), language or None
+    except (TypeError, ValueError) as exc:
+        raise InvalidDownloadToken("Malformed download token") from exc
+
+
+async def aget_header_respondent(application_id):
+    """
+    Respondent holding only the PDF header fields, from the cache filled by
+    make_download_token or else the database. Raises Respondent.DoesNotExist.
+    """
+    fields = await cache.aget(_cache_key(application_id))
+    if fields is not None:
+        return Respondent(**fields)
+    return await Respondent.objects.only(*HEADER_FIELDS).aget(application_id=application_id)
@@ -0,0 +1,175 @@
+"""
+Streaming export of respondents and uploaded responses as CSV or JSONL.
+
+Rows are read with QuerySet.iterator() / aiterator() in chunks of
+EXPORT_CHUNK_SIZE and encoded as they arrive, so memory use stays flat
+however many rows are exported. Uploads are exported together with their
+respondent (one JOIN via select_related). Used by the export view and the
+export_data management command.
+"""
+import csv
+import datetime
+import json
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Respondent, ResponsePDF
+
+EXPORT_CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# (column name, model field path); a path through 'respondent' follows the join
+RESPONDENT_COLUMNS = [
+    ('application_id', 'application_id'),
+    ('name', 'name'),
+    ('gender', 'gender'),
+    ('mobile_number', 'mobile_number'),
+    ('email', 'email'),
+    ('state', 'state'),
+    ('place_of_residence', 'place_of_residence'),
+    ('profession', 'profession'),
+    ('specialization', 'specialization'),
+    ('created_at', 'created_at'),
+    ('download_option', 'download_option'),
+    ('full_downloaded', 'full_downloaded'),
+    ('sections_downloaded', 'sections_downloaded'),
+]
+
+RESPONSE_COLUMNS = [
+    ('response_id', 'id'),
+    ('application_id', 'respondent__application_id'),
+    ('name', 'respondent__name'),
+    ('state', 'respondent__state'),
+    ('profession', 'respondent__profession'),
+    ('specialization', 'respondent__specialization'),
+    ('upload_date', 'upload_date'),
+    ('pdf_file', 'pdf_file'),
+    ('sha256', 'sha256'),
+    ('is_verified', 'is_verified'),
+    ('verification_code', 'verification_code'),
+    ('answers_extracted_at', 'answers_extracted_at'),
+    ('extraction_error', 'extraction_error'),
+]
+
+# dataset -> (columns, date field the date range applies to)
+DATASETS = {
+    'respondents': (RESPONDENT_COLUMNS, 'created_at'),
+    'responses': (RESPONSE_COLUMNS, 'upload_date'),
+}
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def export_queryset(dataset, state=None, profession=None, specialization=None,
+                    date_from=None, date_to=None):
+    """Rows of `dataset` matching the filters, in primary key order; both dates are inclusive"""
+    columns, date_field = DATASETS[dataset]
+    if dataset == 'respondents':
+        queryset = Respondent.objects.all()
+        prefix = ''
+    else:
+        queryset = ResponsePDF.objects.select_related('respondent')
+        prefix = 'respondent__'
+
+    filters = {}
+    for field, value in (('state', state), ('profession', profession), ('specialization', specialization)):
+        if value:
+            filters[prefix + field] = value
+    # Range on the column itself (not __date), so its index can be used
+    if date_from:
+        filters[f'{date_field}__gte'] = _day_start(date_from)
+    if date_to:
+        filters[f'{date_field}__lt'] = _day_start(date_to + datetime.timedelta(days=1))
+
+    return queryset.filter(**filters).only(*[path for _, path in columns]).order_by('pk')
+
+
+def _value(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    # FieldFile -> stored name
+    return getattr(obj, 'name', obj) if path == 'pdf_file' else obj
+
+
+# Spreadsheets run a cell starting with one of these as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if isinstance(value, str):
+        # Quote respondent-entered text so it is never evaluated on opening
+        return "'" + value if value.startswith(_FORMULA_PREFIXES) else value
+    if value is None:
+        return ''
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that returns what was written"""
+
+    def write(self, value):
+        return value
+
+
+class RowEncoder:
+    """Encodes model instances as CSV or JSONL lines"""
+
+    def __init__(self, dataset, fmt):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.columns = DATASETS[dataset][0]
+        self.fmt = fmt
+        self.writer = csv.writer(_LineBuffer())
+        self.json = DjangoJSONEncoder(ensure_ascii=False)
+
+    def header(self):
+        if self.fmt == 'csv':
+            return self.writer.writerow([name for name, _ in self.columns])
+        return ''
+
+    def line(self, obj):
+        values = [_value(obj, path) for _, path in self.columns]
+        if self.fmt == 'csv':
+            return self.writer.writerow([_csv_value(value) for value in values])
+        row = {name: str(value) if isinstance(value, uuid.UUID) else value
+               for (name, _), value in zip(self.columns, values)}
+        return self.json.encode(row) + '\n'
+
+
+def export_lines(queryset, encoder, chunk_size=EXPORT_CHUNK_SIZE):
+    """Encoded output, one string per chunk of rows"""
+    yield encoder.header()
+    lines = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        lines.append(encoder.line(obj))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+async def aexport_lines(queryset, encoder, chunk_size=EXPORT_CHUNK_SIZE):
+    """export_lines() for ASGI, where a sync iterator would be read into memory whole"""
+    yield encoder.header()
+    lines = []
+    async for obj in queryset.aiterator(chunk_size=chunk_size):
+        lines.append(encoder.line(obj))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
@@ -0,0 +1,186 @@
+"""
+Fonts used by the questionnaire PDFs.
+
+Fonts are registered with reportlab once per process: from
+QuestionnaireConfig.ready() when PDF_PRELOAD is enabled, otherwise lazily
+on the first PDF render. The bundled text face has a name of its own, as
+reportlab keeps whichever font first took a name and anything may touch
+the built-in Helvetica before the fonts are loaded. Without its TTF the
+name stands for the built-in face. Titles use built-in Helvetica-Bold.
+
+Other languages need their own Unicode fonts (PDF_LANGUAGE_FONTS). These
+are large, so each language's pair is only loaded by the first render in
+that language, and never preloaded. reportlab embeds TrueType fonts as
+subsets holding just the glyphs a document uses, so a download does not
+carry the whole font. Text in these fonts is shaped (conjuncts, vowel
+signs) when reportlab's optional uharfbuzz and rlbidi packages are
+installed; without them it is drawn glyph by glyph. Neither the fonts nor
+those packages ship with the project, so warm_up() notes in startup_report
+what is missing and logs it once, if any language is configured.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+FONT_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+
+TITLE_FONT = "Helvetica-Bold"
+TEXT_FONT = "Questionnaire"
+# The viewer's own Helvetica, never embedded; compact PDFs use it for
+# Latin header text instead of the embedded TEXT_FONT
+BUILTIN_TEXT_FONT = "Helvetica-Builtin"
+
+# reportlab font name -> (TTF file in FONT_DIR, built-in face used without it)
+FONT_FILES = {
+    TEXT_FONT: ('Helvetica.ttf', 'Helvetica'),
+}
+
+# Fonts a PDF is drawn with; `shaped` asks reportlab to shape the text
+FontSet = namedtuple('FontSet', 'text title shaped')
+DEFAULT_FONTS = FontSet(TEXT_FONT, TITLE_FONT, False)
+
+# Timings of the last warm-up / font load, in milliseconds
+startup_report = {}
+
+_lock = threading.Lock()
+_loaded = False
+# Language code -> FontSet, or None when its fonts could not be loaded
+_language_fonts = {}
+
+
+def _register(font_name, font_path):
+    """Register one TTF with reportlab; False (and a warning) if it cannot be used"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFError, TTFont
+
+    try:
+        pdfmetrics.registerFont(TTFont(font_name, font_path))
+    except (TTFError, OSError) as exc:
+        logger.warning("Could not load font %s from %s: %s", font_name, font_path, exc)
+        return False
+    return True
+
+
+def shaping_available():
+    """Whether reportlab can shape text, which needs uharfbuzz and rlbidi"""
+    from reportlab.pdfbase import ttfonts
+    from reportlab.pdfgen import textobject
+    return ttfonts.uharfbuzz is not None and textobject.rtlSupport
+
+
+def _configured_language_fonts():
+    """Language code -> (text, title) TTF, relative to FONT_DIR unless absolute"""
+    return getattr(settings, 'PDF_LANGUAGE_FONTS', {})
+
+
+def check_language_support():
+    """Record and warn about configured languages that cannot be rendered properly"""
+    languages = list(_configured_language_fonts())
+    missing = [language for language in languages if not has_language_fonts(language)]
+    startup_report['missing_language_fonts'] = missing
+    startup_report['text_shaping'] = shaping_available()
+    if missing:
+        logger.warning("PDF fonts for %s are not installed in %s; those PDFs are rendered in English",
+                       ', '.join(missing), FONT_DIR)
+    if len(missing) < len(languages) and not startup_report['text_shaping']:
+        logger.warning("uharfbuzz and rlbidi are not installed; PDFs in %s are drawn without shaping",
+                       ', '.join(language for language in languages if language not in missing))
+
+
+def ensure_fonts():
+    """Register the PDF fonts with reportlab if that has not happened yet"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+
+        started = time.perf_counter()
+        from reportlab.pdfbase import pdfmetrics
+        pdfmetrics.registerFont(pdfmetrics.Font(BUILTIN_TEXT_FONT, 'Helvetica', 'WinAnsiEncoding'))
+
+        registered = []
+        for font_name, (filename, builtin) in FONT_FILES.items():
+            font_path = os.path.join(FONT_DIR, filename)
+            if os.path.exists(font_path) and _register(font_name, font_path):
+                registered.append(font_name)
+            else:
+                pdfmetrics.registerFont(pdfmetrics.Font(font_name, builtin, 'WinAnsiEncoding'))
+
+        startup_report['font_load_ms'] = (time.perf_counter() - started) * 1000
+        startup_report['embedded_fonts'] = registered
+        logger.info("Registered PDF fonts %s in %.1f ms",
+                    ', '.join(registered) or '(built-in only)', startup_report['font_load_ms'])
+        _loaded = True
+
+
+def warm_up():
+    """Import the PDF backend and load fonts up front, reporting the cost"""
+    started = time.perf_counter()
+    importlib.import_module('questionnaire.pdf')
+    startup_report['import_ms'] = (time.perf_counter() - started) * 1000
+    ensure_fonts()
+    check_language_support()
+    logger.info("PDF backend ready: import %.1f ms, fonts %.1f ms",
+                startup_report['import_ms'], startup_report['font_load_ms'])
+    return startup_report
+
+
+def _language_font_paths(language):
+    files = _configured_language_fonts().get(language)
+    if not files:
+        return None
+    return [os.path.join(FONT_DIR, filename) for filename in files]
+
+
+def has_language_fonts(language):
+    """Whether `language` has font files configured and present; loads nothing"""
+    paths = _language_font_paths(language)
+    return bool(paths) and all(os.path.exists(path) for path in paths)
+
+
+def fonts_for(language):
+    """
+    Fonts for a PDF in `language`, registering them on first use. None if
+    the language has no usable fonts; English always has DEFAULT_FONTS.
+    """
+    ensure_fonts()
+    try:
+        return DEFAULT_FONTS if language in (None, 'en') else _language_fonts[language]
+    except KeyError:
+        pass
+    with _lock:
+        if language in _language_fonts:
+            return _language_fonts[language]
+
+        started = time.perf_counter()
+        paths = _language_font_paths(language)
+        fonts = None
+        if not paths:
+            logger.warning("No PDF fonts configured for language %r", language)
+        elif not all(os.path.exists(path) for path in paths):
+            logger.warning("PDF fonts for language %r not found: %s", language, ', '.join(paths))
+        else:
+            names = [f'Questionnaire-{language}', f'Questionnaire-{language}-Bold']
+            if all(_register(name, path) for name, path in zip(names, paths)):
+                fonts = FontSet(*names, shaped=shaping_available())
+        _language_fonts[language] = fonts
+        startup_report[f'font_load_ms_{language}'] = (time.perf_counter() - started) * 1000
+        return fonts
+
+
+@receiver(setting_changed)
+def _reset_language_fonts(setting, **kwargs):
+    if setting == 'PDF_LANGUAGE_FONTS':
+        with _lock:
+            _language_fonts.clear()
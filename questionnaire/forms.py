@@ -1,5 +1,10 @@
+import hashlib
+
 from django import forms
 from .models import Respondent, ResponsePDF
+from .uploads import (
+    NOT_PDF_MESSAGE, PDF_MAGIC, HashedPDFUpload, max_upload_size, too_large_message,
+)
 
 class RespondentForm(forms.ModelForm):
     class Meta:
@@ -49,4 +54,61 @@ class ResponseUploadForm(forms.ModelForm):
                 'class': 'form-control',
                 'accept': '.pdf'
             })
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, upload_error=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if upload_error:
+            # The upload handler dropped the file; say why instead of "required"
+            field = self.fields['pdf_file']
+            field.error_messages = {**field.error_messages, 'required': upload_error}
+
+    def clean_pdf_file(self):
+        upload = self.cleaned_data['pdf_file']
+        if isinstance(upload, HashedPDFUpload):
+            # Already size-checked, sniffed and hashed while streaming in
+            return upload
+
+        if upload.size > max_upload_size():
+            raise forms.ValidationError(too_large_message())
+        upload.seek(0)
+        if upload.read(len(PDF_MAGIC)) != PDF_MAGIC:
+            raise forms.ValidationError(NOT_PDF_MESSAGE)
+        hasher = hashlib.sha256()
+        for chunk in upload.chunks():
+            hasher.update(chunk)
+        upload.sha256 = hasher.hexdigest()
+        upload.seek(0)
+        return upload
+
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        instance.sha256 = self.cleaned_data['pdf_file'].sha256
+        if commit:
+            instance.save()
+        return instance
+
+class ExportFilterForm(forms.Form):
+    """Filters for the data export; every field is optional"""
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], required=False)
+    state = forms.CharField(max_length=50, required=False)
+    profession = forms.ChoiceField(choices=[('', 'Any')] + Respondent.PROFESSION_CHOICES, required=False)
+    specialization = forms.ChoiceField(choices=[('', 'Any')] + Respondent.SPECIALIZATION_CHOICES, required=False)
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("date_from must not be after date_to")
+        cleaned_data['format'] = cleaned_data.get('format') or 'csv'
+        return cleaned_data
+
+    def filters(self):
+        """Keyword arguments for exports.export_queryset()"""
+        return {key: value for key, value in self.cleaned_data.items() if key != 'format'}
+
+class RespondentImportForm(forms.Form):
+    csv_file = forms.FileField(label="CSV file")
+    dry_run = forms.BooleanField(required=False, label="Only validate, do not import")
@@ -0,0 +1,130 @@
+"""
+Bulk import of pre-registered respondents from CSV.
+
+The file is read and validated one row at a time against the Respondent
+fields (choices, lengths, email format). Valid rows are collected into
+batches; each batch gets its application IDs from one allocate_application_ids()
+call and is inserted with a single bulk_create inside a transaction. Rows
+that fail validation are written to an error report as they are found, with
+their line number, the problems and the original values, so the report can
+be fixed and imported again on its own.
+"""
+import csv
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .analytics import record_registrations
+from .application_ids import allocate_application_ids
+from .models import Respondent
+
+IMPORT_FIELDS = [
+    'name', 'gender', 'mobile_number', 'email', 'state',
+    'place_of_residence', 'profession', 'specialization',
+]
+REQUIRED_COLUMNS = [name for name in IMPORT_FIELDS if name != 'email']
+DEFAULT_BATCH_SIZE = 1000
+
+ImportResult = namedtuple('ImportResult', 'rows created failed')
+
+
+class ImportFormatError(Exception):
+    """The file as a whole cannot be imported (e.g. missing columns)"""
+
+
+def _choice_lookup(field):
+    # Partner lists rarely match our capitalisation exactly
+    return {value.casefold(): value for value, _ in field.choices}
+
+
+class RowValidator:
+    """Cleans one CSV row into Respondent field values"""
+
+    def __init__(self):
+        self.fields = {name: Respondent._meta.get_field(name) for name in IMPORT_FIELDS}
+        self.choices = {name: _choice_lookup(field) for name, field in self.fields.items() if field.choices}
+
+    def clean(self, row):
+        """Returns (values, errors); errors maps column name to messages"""
+        values, errors = {}, {}
+        for name, field in self.fields.items():
+            raw = (row.get(name) or '').strip()
+            if name in self.choices:
+                raw = self.choices[name].get(raw.casefold(), raw)
+            if not raw and field.null:
+                raw = None
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as exc:
+                errors[name] = exc.messages
+        return values, errors
+
+
+class ErrorReport:
+    """CSV of rejected rows: line number, errors, then the row as given"""
+
+    def __init__(self, file, columns):
+        self.columns = columns
+        self.writer = csv.writer(file)
+        self.writer.writerow(['line', 'errors'] + columns)
+
+    def add(self, line, errors, row):
+        message = '; '.join(f"{name}: {' '.join(messages)}" for name, messages in errors.items())
+        self.writer.writerow([line, message] + [row.get(column) or '' for column in self.columns])
+
+
+def read_rows(file):
+    """csv.DictReader with normalised column names; checks the header"""
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        raise ImportFormatError("The file is empty")
+    reader.fieldnames = [name.strip().lower().replace(' ', '_') for name in reader.fieldnames]
+    missing = [name for name in REQUIRED_COLUMNS if name not in reader.fieldnames]
+    if missing:
+        raise ImportFormatError(f"Missing column(s): {', '.join(missing)}")
+    return reader
+
+
+def _insert(batch):
+    with transaction.atomic():
+        # Rolled back together with the rows if the insert fails
+        ids = allocate_application_ids(len(batch))
+        respondents = Respondent.objects.bulk_create(
+            [Respondent(application_id=app_id, **values) for app_id, values in zip(ids, batch)])
+        record_registrations(respondents)
+
+
+def import_respondents(file, error_file=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Import respondents from an open CSV text file. Invalid rows are skipped
+    and, if `error_file` is given, reported there. `progress(result)` is
+    called after each batch.
+    """
+    reader = read_rows(file)
+    report = ErrorReport(error_file, reader.fieldnames) if error_file is not None else None
+    validator = RowValidator()
+
+    rows = created = failed = 0
+    batch = []
+    for row in reader:
+        rows += 1
+        values, errors = validator.clean(row)
+        if errors:
+            failed += 1
+            if report is not None:
+                report.add(reader.line_num, errors, row)
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            if not dry_run:
+                _insert(batch)
+            created += len(batch)
+            batch = []
+            if progress is not None:
+                progress(ImportResult(rows, created, failed))
+    if batch:
+        if not dry_run:
+            _insert(batch)
+        created += len(batch)
+    return ImportResult(rows, created, failed)
@@ -0,0 +1,346 @@
+"""
+End-to-end load test for the questionnaire site.
+
+Runs against a server that is already up (runserver, gunicorn, ...) and
+drives it the way respondents do. Each virtual user repeatedly goes through
+a journey: register through section A, verify the mobile number, then a
+weighted mix of section B visits, section and full PDF downloads and
+response uploads. Every HTTP request is timed and reported per endpoint.
+
+Only the standard library is used, so the harness runs anywhere the site
+does. Journeys create real respondents and uploaded files; point it at a
+scratch database. Used by the `loadtest` management command.
+"""
+import http.cookiejar
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from .constants import SECTION_B_QUESTIONS
+
+# Relative weights of the steps taken after registration and verification
+DEFAULT_MIX = {
+    'section_b': 3,
+    'section_pdf': 3,
+    'full_pdf': 1,
+    'upload': 1,
+}
+
+# A tiny but well-formed PDF used for uploads
+SAMPLE_PDF = (
+    b'%PDF-1.4\n'
+    b'1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n'
+    b'2 0 obj << /Type /Pages /Kids [] /Count 0 >> endobj\n'
+    b'trailer << /Root 1 0 R >>\n'
+    b'%%EOF\n'
+)
+
+_DOWNLOAD_OPTIONS_RE = re.compile(r'/download-options/(\d{8})/')
+_DOWNLOAD_URL_RE = re.compile(r'href="(/serve-pdf/[^"]+)"')
+
+
+class JourneyError(Exception):
+    """A step got an unexpected response; the rest of the journey is skipped"""
+
+
+def parse_mix(value):
+    """Parse "section_b=3,full_pdf=1" into a weight dict"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown step '{name}', expected one of {', '.join(DEFAULT_MIX)}")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight for '{name}': {weight}") from None
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one step with a positive weight")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Stats:
+    """Thread-safe per-endpoint timings and outcomes"""
+
+    def __init__(self):
+        self._latencies = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+        self.journeys = 0
+        self.failed_journeys = 0
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status, ok):
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+            self._statuses[endpoint][str(status)] += 1
+            if not ok:
+                self._errors[endpoint] += 1
+
+    def journey_done(self, ok):
+        with self._lock:
+            self.journeys += 1
+            if not ok:
+                self.failed_journeys += 1
+
+    def summary(self, duration):
+        with self._lock:
+            endpoints = {}
+            for endpoint, latencies in sorted(self._latencies.items()):
+                endpoints[endpoint] = self._endpoint_summary(
+                    latencies, self._errors[endpoint], dict(self._statuses[endpoint]), duration)
+            all_latencies = [value for values in self._latencies.values() for value in values]
+            total = self._endpoint_summary(
+                all_latencies, sum(self._errors.values()), {}, duration)
+            del total['statuses']
+            total['journeys'] = self.journeys
+            total['failed_journeys'] = self.failed_journeys
+        return {'total': total, 'endpoints': endpoints}
+
+    @staticmethod
+    def _endpoint_summary(latencies, errors, statuses, duration):
+        ordered = sorted(latencies)
+        count = len(ordered)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'throughput_rps': round(count / duration, 2) if duration else 0.0,
+            'latency_ms': {
+                'mean': ms(sum(ordered) / count) if count else None,
+                'p50': ms(percentile(ordered, 50)),
+                'p95': ms(percentile(ordered, 95)),
+                'p99': ms(percentile(ordered, 99)),
+                'max': ms(ordered[-1]) if count else None,
+            },
+            'statuses': statuses,
+        }
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Redirects are timed as their own request, so never follow them
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    """One simulated respondent with its own cookies (session, CSRF)"""
+
+    def __init__(self, base_url, stats, rng, mix, steps, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.rng = rng
+        self.mix = mix
+        self.steps = steps
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    # -- HTTP helpers -------------------------------------------------------
+
+    def request(self, endpoint, path, data=None, files=None, expect=(200,)):
+        """Send one timed request; returns (status, headers, body)"""
+        headers = {}
+        body = None
+        if files:
+            body, content_type = self._multipart(data or {}, files)
+            headers['Content-Type'] = content_type
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if body is not None:
+            headers['X-CSRFToken'] = self._csrf_token()
+            headers['Referer'] = self.base_url + path
+
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                status, response_headers, content = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as exc:
+            status, response_headers, content = exc.code, exc.headers, exc.read()
+        except OSError as exc:
+            self.stats.record(endpoint, time.perf_counter() - started, type(exc).__name__, False)
+            raise JourneyError(f"{endpoint}: {exc}") from exc
+        elapsed = time.perf_counter() - started
+
+        ok = status in expect
+        self.stats.record(endpoint, elapsed, status, ok)
+        if not ok:
+            raise JourneyError(f"{endpoint}: HTTP {status}")
+        return status, response_headers, content
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def _multipart(self, fields, files):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                         f'{value}\r\n'.encode('utf-8'))
+        for name, (filename, content, content_type) in files.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                         f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode('utf-8'))
+            parts.append(content + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+    # -- Journey steps ------------------------------------------------------
+
+    def register(self):
+        mobile_number = '9' + ''.join(self.rng.choice('0123456789') for _ in range(9))
+        self.request('GET section_a', '/section-a/')
+        self.request('POST section_a', '/section-a/', data={
+            'name': f'Load Test {mobile_number}',
+            'gender': self.rng.choice(['Male', 'Female', 'Transgender']),
+            'mobile_number': mobile_number,
+            'email': '',
+            'state': 'Tamil Nadu',
+            'place_of_residence': 'Chennai',
+            'profession': 'Researchers',
+            'specialization': 'Economics',
+        }, expect=(302,))
+        return mobile_number
+
+    def verify(self, mobile_number):
+        self.request('GET home', '/')
+        _, headers, _ = self.request('POST verify_mobile', '/verify-mobile/',
+                                     data={'mobile_number': mobile_number}, expect=(302,))
+        match = _DOWNLOAD_OPTIONS_RE.search(headers.get('Location', ''))
+        if not match:
+            raise JourneyError("verify_mobile did not redirect to download options")
+        application_id = match.group(1)
+        self.request('GET download_options', f'/download-options/{application_id}/')
+        return application_id
+
+    def section_b(self, application_id):
+        self.request('GET section_b', f'/section-b/{application_id}/')
+
+    def download(self, claim_path, trigger_name, pdf_name):
+        _, headers, _ = self.request(f'GET {trigger_name.replace("trigger", "claim")}',
+                                     claim_path, expect=(302,))
+        _, _, page = self.request(f'GET {trigger_name}', urllib.parse.urlsplit(headers['Location']).path)
+        match = _DOWNLOAD_URL_RE.search(page.decode('utf-8', 'replace'))
+        if not match:
+            raise JourneyError(f"{trigger_name} page has no download link")
+        _, _, pdf = self.request(f'GET {pdf_name}', match.group(1))
+        if not pdf.startswith(b'%PDF'):
+            raise JourneyError(f"{pdf_name} did not return a PDF")
+
+    def upload(self, application_id, mobile_number):
+        self.request('GET upload_start', '/upload/')
+        self.request('POST upload_start', '/upload/', data={
+            'application_id': application_id,
+            'mobile_number': mobile_number,
+        }, expect=(302,))
+        self.request('GET upload_pdf', f'/upload/{application_id}/')
+        self.request('POST upload_pdf', f'/upload/{application_id}/',
+                     files={'pdf_file': (f'response_{application_id}.pdf', SAMPLE_PDF, 'application/pdf')},
+                     expect=(302,))
+
+    def run_journey(self):
+        mobile_number = self.register()
+        application_id = self.verify(mobile_number)
+
+        remaining_sections = list(SECTION_B_QUESTIONS)
+        self.rng.shuffle(remaining_sections)
+        full_done = False
+        names, weights = zip(*self.mix.items())
+        for _ in range(self.steps):
+            step = self.rng.choices(names, weights)[0]
+            # Each download can only be claimed once per respondent
+            if (step == 'section_pdf' and not remaining_sections) or (step == 'full_pdf' and full_done):
+                step = 'section_b'
+
+            if step == 'section_b':
+                self.section_b(application_id)
+            elif step == 'section_pdf':
+                section_key = remaining_sections.pop()
+                self.download(f'/download/section/{application_id}/{section_key}/',
+                              'section_trigger', 'section_pdf')
+            elif step == 'full_pdf':
+                full_done = True
+                self.download(f'/download/full/{application_id}/', 'full_trigger', 'full_pdf')
+            elif step == 'upload':
+                self.upload(application_id, mobile_number)
+
+
+def run_load_test(base_url, users=10, journeys=5, duration=None, mix=None, steps=4,
+                  seed=None, timeout=30, errors=None):
+    """
+    Run `users` concurrent virtual users, each doing `journeys` journeys (or
+    as many as fit in `duration` seconds), and return the results as a
+    JSON-serialisable dict. Journey failures are appended to `errors`.
+    """
+    mix = mix or DEFAULT_MIX
+    stats = Stats()
+    seed = seed if seed is not None else random.randrange(2 ** 32)
+    deadline = None
+    errors = errors if errors is not None else []
+    errors_lock = threading.Lock()
+    start = threading.Barrier(users)
+
+    def worker(index):
+        user = VirtualUser(base_url, stats, random.Random(seed + index), mix, steps, timeout)
+        start.wait()
+        done = 0
+        while (time.monotonic() < deadline) if duration else (done < journeys):
+            try:
+                user.run_journey()
+                stats.journey_done(True)
+            except JourneyError as exc:
+                stats.journey_done(False)
+                with errors_lock:
+                    errors.append(str(exc))
+            done += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(users)]
+    started_at = datetime.now(timezone.utc)
+    began = time.perf_counter()
+    if duration:
+        deadline = time.monotonic() + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    return {
+        'started_at': started_at.isoformat(),
+        'duration_seconds': round(elapsed, 3),
+        'config': {
+            'base_url': base_url,
+            'users': users,
+            'journeys_per_user': None if duration else journeys,
+            'duration': duration,
+            'steps_per_journey': steps,
+            'mix': mix,
+            'seed': seed,
+        },
+        **stats.summary(elapsed),
+    }
@@ -0,0 +1,82 @@
+import json
+import os
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire.pdf_benchmark import DEFAULT_SCALES, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Benchmark PDF rendering at several question-set sizes and fail if it got "
+            "slower than the stored baseline by more than --max-regression percent.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help="Question-set multipliers to render (default: %(default)s)")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Renders per measurement; the median is reported (default: %(default)s)")
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'pdf_benchmark_baseline.json'),
+                            help="Baseline file to compare against (default: %(default)s)")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Store this run as the new baseline instead of comparing")
+        parser.add_argument('--max-regression', type=float, default=20.0,
+                            help="Allowed slowdown against the baseline in percent (default: %(default)s)")
+        parser.add_argument('--output', help="Also write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',') if scale.strip()]
+        except ValueError:
+            raise CommandError("--scales must be a comma-separated list of integers")
+        if not scales or min(scales) < 1 or options['repeat'] < 1:
+            raise CommandError("--scales and --repeat must be positive")
+
+        results = run_benchmarks(scales, options['repeat'])
+        self.print_report(results)
+
+        report = {
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            self.write_json(options['output'], report)
+
+        if options['save_baseline']:
+            self.write_json(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {options['baseline']}"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                f"No baseline at {options['baseline']}; run with --save-baseline to record one"))
+            return
+
+        with open(options['baseline']) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, options['max_regression'])
+        if regressions:
+            for name, key, previous, current, change in regressions:
+                self.stderr.write(f"{name} {key}: {previous} ms -> {current} ms (+{change}%)")
+            raise CommandError(f"{len(regressions)} PDF timing(s) regressed by more than "
+                               f"{options['max_regression']}%")
+        self.stdout.write(self.style.SUCCESS(
+            f"No PDF timing regressed by more than {options['max_regression']}%"))
+
+    def write_json(self, path, report):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    def print_report(self, results):
+        header = (f"{'case':<16}{'pages':>7}{'KB':>9}{'compact':>9}{'saved':>7}"
+                  f"{'cold ms':>10}{'warm ms':>10}{'pages/s':>10}{'peak KB':>10}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in results.items():
+            saved = 100 * (1 - row['compact_bytes'] / row['bytes'])
+            self.stdout.write(
+                f"{name:<16}{row['pages']:>7}{row['bytes'] / 1024:>9.1f}{row['compact_bytes'] / 1024:>9.1f}"
+                f"{saved:>6.0f}%{row['cold_ms']:>10.2f}"
+                f"{row['warm_ms']:>10.2f}{row['pages_per_second']:>10}{row['peak_memory_kb']:>10}")
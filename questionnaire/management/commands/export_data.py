@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire.exports import DATASETS, EXPORT_CHUNK_SIZE, FORMATS, RowEncoder, export_lines, export_queryset
+from questionnaire.forms import ExportFilterForm
+
+
+class Command(BaseCommand):
+    help = ("Export respondents or uploaded responses as CSV or JSONL. Rows are streamed "
+            "in chunks, so memory use does not grow with the number of rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--state')
+        parser.add_argument('--profession')
+        parser.add_argument('--specialization')
+        parser.add_argument('--from', dest='date_from', help="First day to include (YYYY-MM-DD)")
+        parser.add_argument('--to', dest='date_to', help="Last day to include (YYYY-MM-DD)")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Rows fetched per query round trip (default: %(default)s)")
+        parser.add_argument('--output', help="File to write to (default: standard output)")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+        # Same validation as the export view
+        form = ExportFilterForm({key: options[key] or '' for key in
+                                 ('format', 'state', 'profession', 'specialization', 'date_from', 'date_to')})
+        if not form.is_valid():
+            errors = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+            raise CommandError(errors)
+
+        dataset = options['dataset']
+        queryset = export_queryset(dataset, **form.filters())
+        lines = export_lines(queryset, RowEncoder(dataset, form.cleaned_data['format']),
+                             chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                for chunk in lines:
+                    f.write(chunk)
+            self.stderr.write(f"Exported {dataset} to {options['output']}")
+        else:
+            for chunk in lines:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire.answer_extraction import parse_upload, record_error, store_form
+from questionnaire.definitions import get_questionnaire
+from questionnaire.models import ResponsePDF
+
+
+class Command(BaseCommand):
+    help = ("Read the answers of uploaded response PDFs into the Answer table. Parsing runs "
+            "in parallel worker processes; results are written batch by batch in upload order.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Uploads parsed and written per batch (default: %(default)s)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Parser processes; 1 parses in this process (default: %(default)s)")
+        parser.add_argument('--all', action='store_true',
+                            help="Re-extract uploads that have been processed already")
+
+    def handle(self, *args, **options):
+        batch_size, workers = options['batch_size'], options['workers']
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be at least 1")
+
+        queryset = ResponsePDF.objects.order_by('pk').only('pk', 'respondent_id', 'pdf_file')
+        if not options['all']:
+            queryset = queryset.filter(answers_extracted_at__isnull=True)
+
+        markers = list(get_questionnaire().titles.values())
+        executor = None
+        if workers > 1:
+            # Parsing needs no Django, so spawned workers skip django.setup()
+            executor = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context('spawn'))
+        processed = answers = failed = 0
+        last_pk = 0
+        try:
+            while True:
+                batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                paths = [response_pdf.pdf_file.path for response_pdf in batch]
+                if executor is not None:
+                    results = executor.map(parse_upload, paths, repeat(markers),
+                                           chunksize=max(1, len(paths) // (workers * 4)))
+                else:
+                    results = map(parse_upload, paths, repeat(markers))
+
+                # Written in upload order, so later uploads win
+                for response_pdf, (form, error) in zip(batch, results):
+                    stored = None
+                    if error is not None:
+                        record_error(response_pdf, error)
+                    else:
+                        stored = store_form(response_pdf, form)
+                    if stored is None:
+                        failed += 1
+                    else:
+                        answers += stored
+                    processed += 1
+                self.stdout.write(f"{processed} uploads processed ({answers} answers, {failed} failed)")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Extracted {answers} answers from {processed - failed} uploads; {failed} could not be read"))
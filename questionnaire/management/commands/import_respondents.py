@@ -0,0 +1,53 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire.imports import DEFAULT_BATCH_SIZE, ImportFormatError, import_respondents
+
+
+class Command(BaseCommand):
+    help = ("Import pre-registered respondents from a CSV file with the columns name, gender, "
+            "mobile_number, email, state, place_of_residence, profession and specialization. "
+            "Invalid rows are skipped and written to an error report.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help="CSV file to import, or - for standard input")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help="Rows inserted per transaction (default: %(default)s)")
+        parser.add_argument('--errors',
+                            help="Where to write rejected rows (default: <csv_file>.errors.csv)")
+        parser.add_argument('--encoding', default='utf-8-sig',
+                            help="Encoding of the CSV file (default: %(default)s)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Validate the file without inserting anything")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        path = options['csv_file']
+        error_path = options['errors'] or ('import-errors.csv' if path == '-' else f'{path}.errors.csv')
+
+        try:
+            source = sys.stdin if path == '-' else open(path, encoding=options['encoding'], newline='')
+        except OSError as exc:
+            raise CommandError(f"Cannot open {path}: {exc}")
+        try:
+            with open(error_path, 'w', encoding='utf-8', newline='') as error_file:
+                result = import_respondents(
+                    source, error_file, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                    progress=lambda r: self.stdout.write(f"{r.rows} rows read, {r.created} imported"),
+                )
+        except ImportFormatError as exc:
+            os.unlink(error_path)
+            raise CommandError(str(exc))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        if not result.failed:
+            os.unlink(error_path)
+        verb = "would be imported" if options['dry_run'] else "imported"
+        self.stdout.write(self.style.SUCCESS(f"{result.created} of {result.rows} respondents {verb}"))
+        if result.failed:
+            self.stdout.write(self.style.WARNING(f"{result.failed} rows rejected; see {error_path}"))
@@ -0,0 +1,83 @@
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questionnaire.loadtest import DEFAULT_MIX, parse_mix, run_load_test
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Load-test a running server with concurrent respondent journeys and report "
+            "throughput, latency percentiles and error rates per endpoint.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help="Server to test (default: %(default)s)")
+        parser.add_argument('--users', type=int, default=10,
+                            help="Concurrent virtual users (default: %(default)s)")
+        parser.add_argument('--journeys', type=int, default=5,
+                            help="Journeys per user (default: %(default)s)")
+        parser.add_argument('--duration', type=float,
+                            help="Run for this many seconds instead of a fixed number of journeys")
+        parser.add_argument('--steps', type=int, default=4,
+                            help="Steps after registration and verification per journey (default: %(default)s)")
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                            help="Relative step weights (default: %(default)s)")
+        parser.add_argument('--seed', type=int, help="Random seed, for repeatable runs")
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds")
+        parser.add_argument('--output', help="Write the results as JSON to this file")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1")
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        errors = []
+        results = run_load_test(
+            options['base_url'],
+            users=options['users'],
+            journeys=options['journeys'],
+            duration=options['duration'],
+            mix=mix,
+            steps=options['steps'],
+            seed=options['seed'],
+            timeout=options['timeout'],
+            errors=errors,
+        )
+        results['commit'] = _git_commit()
+        results['journey_errors'] = sorted(set(errors))[:50]
+
+        self.print_report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def print_report(self, results):
+        header = f"{'endpoint':<26}{'reqs':>7}{'err%':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        rows = list(results['endpoints'].items()) + [('TOTAL', results['total'])]
+        for endpoint, row in rows:
+            latency = row['latency_ms']
+            cells = [latency[key] for key in ('p50', 'p95', 'p99', 'max')]
+            self.stdout.write(
+                f"{endpoint:<26}{row['requests']:>7}{row['error_rate'] * 100:>6.1f}%{row['throughput_rps']:>9}"
+                + ''.join(f"{'-' if value is None else value:>9}" for value in cells))
+        total = results['total']
+        self.stdout.write(f"\n{total['journeys']} journeys ({total['failed_journeys']} failed) "
+                          f"in {results['duration_seconds']}s; latencies in ms")
+        for error in results['journey_errors'][:10]:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
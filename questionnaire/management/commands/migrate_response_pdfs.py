@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from questionnaire.models import ResponsePDF
+from questionnaire.storage import SHARDED_NAME_RE, get_response_pdf_storage, is_sharded
+
+
+class Command(BaseCommand):
+    help = ("Move uploaded response PDFs into the sharded, content-addressed layout "
+            "(response_pdfs/ab/cd/<sha256>.pdf) and rewrite their paths in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Rows updated per transaction (default: %(default)s)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report what would be moved")
+        parser.add_argument('--keep-old', action='store_true',
+                            help="Leave the files at their old paths after copying them")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        storage = get_response_pdf_storage()
+        queryset = ResponsePDF.objects.order_by('pk').only('pk', 'pdf_file', 'sha256')
+
+        moved = missing = 0
+        last_pk = 0
+        while True:
+            # Keyset pagination, so rows rewritten earlier do not shift pages
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for response_pdf in batch:
+                name = response_pdf.pdf_file.name
+                if not name or is_sharded(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f"Missing file for response {response_pdf.pk}: {name}")
+                    continue
+                moved += 1
+                if options['dry_run']:
+                    continue
+
+                # Copied to a temp file and renamed into place; content that
+                # is already stored is not written twice
+                with storage.open(name, 'rb') as f:
+                    new_name = storage.save(name, f)
+                response_pdf.pdf_file.name = new_name
+                response_pdf.sha256 = SHARDED_NAME_RE.search(new_name).group(1)
+                changed.append((response_pdf, name))
+
+            if changed:
+                with transaction.atomic():
+                    ResponsePDF.objects.bulk_update([row for row, _ in changed], ['pdf_file', 'sha256'])
+                if not options['keep_old']:
+                    self.delete_unreferenced(storage, {old_name for _, old_name in changed})
+            self.stdout.write(f"Processed up to response {last_pk}: {moved} moved, {missing} missing")
+
+        verb = "would be moved" if options['dry_run'] else "moved"
+        self.stdout.write(self.style.SUCCESS(f"{moved} response PDF(s) {verb}, {missing} missing"))
+
+    def delete_unreferenced(self, storage, old_names):
+        # Deduplicated uploads can share a file; keep it while any row that
+        # has not been migrated yet still points at it
+        still_used = set(ResponsePDF.objects.filter(pdf_file__in=old_names)
+                         .values_list('pdf_file', flat=True))
+        for old_name in old_names - still_used:
+            storage.delete(old_name)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from questionnaire.analytics import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = ("Recompute the analytics summary from Respondent and ResponsePDF. Run after "
+            "bulk changes made outside the app, e.g. admin deletions or data fixes.")
+
+    def handle(self, *args, **options):
+        groups = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(f"Analytics rebuilt: {groups} respondent groups"))
@@ -0,0 +1,207 @@
+"""
+In-process performance metrics, exposed in Prometheus text format.
+
+MetricsMiddleware times every request and counts the SQL it runs. The PDF
+render service and the upload view report render time, PDF size and upload
+size through the helpers at the bottom of this module. Values are kept per
+worker process; scrape every worker (or run one) to get the full picture.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Slow requests are reported through the views logger
+logger = logging.getLogger('questionnaire.views')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))  # 1 KB .. 256 MB
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (made cumulative on exposition), sum, count
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket'
+                                 f'{_format_labels(self.labelnames, labels, [("le", bound)])} {cumulative}')
+                lines.append(f'{self.name}_bucket'
+                             f'{_format_labels(self.labelnames, labels, [("le", "+Inf")])} {count}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+# Method label values; anything else a client sends is counted as "other",
+# so arbitrary method names cannot grow the metrics without bound
+KNOWN_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+REQUEST_LATENCY = Histogram(
+    'csr_request_duration_seconds', 'Request latency by URL name.', ('view', 'method'))
+REQUESTS = Counter(
+    'csr_requests_total', 'Requests by URL name and status code.', ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'csr_request_db_queries', 'SQL queries per request by URL name.', ('view',), QUERY_COUNT_BUCKETS)
+DB_QUERY_TIME = Counter(
+    'csr_db_query_seconds_total', 'Time spent in SQL by URL name.', ('view',))
+PDF_RENDER_TIME = Histogram(
+    'csr_pdf_render_seconds', 'PDF render time, including time queued for a worker.', ('pdf_type',))
+PDF_BYTES = Histogram(
+    'csr_pdf_bytes', 'Size of rendered PDFs.', ('pdf_type',), SIZE_BUCKETS)
+UPLOAD_BYTES = Histogram(
+    'csr_upload_bytes', 'Size of uploaded response PDFs.', (), SIZE_BUCKETS)
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUESTS, REQUEST_QUERIES, DB_QUERY_TIME,
+    PDF_RENDER_TIME, PDF_BYTES, UPLOAD_BYTES,
+]
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.expose())
+    return '\n'.join(lines) + '\n'
+
+
+# Query statistics of the request being handled. A context variable follows
+# the request into the threads sync_to_async runs ORM calls in.
+_request_stats = contextvars.ContextVar('questionnaire_request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver: count queries on every new connection"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class MetricsMiddleware:
+    """Records latency and SQL usage per URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_seconds = getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', None)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    def _start(self):
+        stats = [0, 0.0]  # query count, query seconds
+        return stats, _request_stats.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        query_count, query_seconds = stats
+
+        REQUEST_LATENCY.observe((view, method), elapsed)
+        REQUESTS.inc((view, method, str(response.status_code)))
+        REQUEST_QUERIES.observe((view,), query_count)
+        DB_QUERY_TIME.inc((view,), query_seconds)
+
+        if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+            logger.warning("Slow request %s %s (%s): %.3fs, %d queries in %.3fs",
+                           request.method, request.path, view, elapsed, query_count, query_seconds)
+
+
+def observe_pdf_render(pdf_type, seconds, size):
+    PDF_RENDER_TIME.observe((pdf_type,), seconds)
+    PDF_BYTES.observe((pdf_type,), size)
+
+
+def observe_upload(size):
+    UPLOAD_BYTES.observe((), size)
@@ -1,25 +1,54 @@
 # questionnaire/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.shortcuts import redirect
 from django.urls import reverse
 
 class DownloadRedirectMiddleware:
+    # Works in both modes so async views are not forced through a sync hop
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         response = self.get_response(request)
-        
-        # Check if this is a PDF download response
-        if (response.get('Content-Type') == 'application/pdf' and 
-            'download_completed' in request.session and
+
+        # Only PDF downloads are of interest; any other response leaves the
+        # session untouched so it is never loaded on their behalf
+        if not self._is_pdf(response):
+            return response
+
+        if ('download_completed' in request.session and
             'completed_application_id' in request.session):
-            
-            application_id = request.session['completed_application_id']
-            final_url = reverse('final_page', kwargs={'application_id': application_id})
-            
-            # Create a new response that redirects after download
-            redirect_response = redirect(final_url)
-            redirect_response['Refresh'] = f'0;url={final_url}'
-            return redirect_response
-            
-        return response
\ No newline at end of file
+            return self._redirect_to_final_page(request.session['completed_application_id'])
+
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+
+        if not self._is_pdf(response):
+            return response
+
+        if (await request.session.ahas_key('download_completed') and
+            await request.session.ahas_key('completed_application_id')):
+            return self._redirect_to_final_page(await request.session.aget('completed_application_id'))
+
+        return response
+
+    def _is_pdf(self, response):
+        return response.get('Content-Type') == 'application/pdf'
+
+    def _redirect_to_final_page(self, application_id):
+        final_url = reverse('final_page', kwargs={'application_id': application_id})
+
+        # Create a new response that redirects after download
+        redirect_response = redirect(final_url)
+        redirect_response['Refresh'] = f'0;url={final_url}'
+        return redirect_response
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    ApplicationIdCounter = apps.get_model('questionnaire', 'ApplicationIdCounter')
+    ApplicationIdCounter.objects.get_or_create(name='application_id', defaults={'value': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationIdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0002_application_id_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['mobile_number'], name='respondent_mobile_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['application_id', 'mobile_number'], name='respondent_app_mobile_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0003_respondent_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='responsepdf',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+    ]
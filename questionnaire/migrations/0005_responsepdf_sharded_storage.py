@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:54
+
+import questionnaire.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0004_responsepdf_sha256'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='responsepdf',
+            name='pdf_file',
+            field=models.FileField(storage=questionnaire.storage.get_response_pdf_storage, upload_to='response_pdfs/'),
+        ),
+    ]
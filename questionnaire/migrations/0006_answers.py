@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 15:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0005_responsepdf_sharded_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='responsepdf',
+            name='answers_extracted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='responsepdf',
+            name='extraction_error',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Answer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=50)),
+                ('question_index', models.PositiveSmallIntegerField()),
+                ('text', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('respondent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='questionnaire.respondent')),
+                ('response_pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='questionnaire.responsepdf')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['section', 'question_index'], name='answer_question_idx')],
+                'constraints': [models.UniqueConstraint(fields=('respondent', 'section', 'question_index'), name='answer_unique_question')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0006_answers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['state'], name='respondent_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['profession'], name='respondent_profession_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='respondent',
+            index=models.Index(fields=['specialization'], name='respondent_specialization_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='responsepdf',
+            index=models.Index(fields=['is_verified'], name='responsepdf_verified_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0007_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(max_length=50)),
+                ('profession', models.CharField(max_length=50)),
+                ('specialization', models.CharField(max_length=50)),
+                ('gender', models.CharField(max_length=20)),
+                ('respondents', models.PositiveIntegerField(default=0)),
+                ('full_downloads', models.PositiveIntegerField(default=0)),
+                ('section_downloads', models.PositiveIntegerField(default=0)),
+                ('uploads', models.PositiveIntegerField(default=0)),
+                ('verified_uploads', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'analytics summary',
+                'verbose_name_plural': 'analytics',
+                'constraints': [models.UniqueConstraint(fields=('state', 'profession', 'specialization', 'gender'), name='analytics_summary_unique_group')],
+            },
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:09
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+# Version 1 as it was when this migration was written; a frozen copy, so
+# later edits to constants.py do not change what the migration seeds
+VERSION_1 = [
+    ('legislative', 'Legislative Relations', [
+        'What are the three lists in the Seventh Schedule of the Constitution, and how do they define the legislative powers of the Centre and states?',
+        'Under what circumstances can the Union Parliament legislate on subjects in the State List?',
+        'What is the doctrine of "pith and substance" in relation to Centre-State legislative relations?',
+        'How does the Constitution address inconsistencies between Union and State laws on concurrent subjects?',
+    ]),
+    ('administrative', 'Administrative Relations', [
+        'How does the Constitution ensure that state governments carry out the directions of the Union Government?',
+        'What are the provisions for the Centre to direct states in matters of national security?',
+    ]),
+    ('financial', 'Financial Relations', [
+        'How are financial resources allocated between the Centre and the states?',
+        'What role do bodies like the Finance Commission play in Centre-State financial distribution?',
+        'How do GST and other tax-sharing arrangements impact Centre-State financial relations?',
+    ]),
+    ('commissions', 'Role of Commissions and Councils', [
+        'What was the purpose of the Sarkaria Commission, and what were its key recommendations?',
+        'What is the role of the Inter-State Council in promoting cooperation between Centre and states?',
+        'What are the key recommendations of the Punchhi Commission concerning Centre-State relations?',
+    ]),
+    ('constitutional', 'Constitutional and Judicial Influences', [
+        'How have constitutional amendments, like the 42nd and 73rd amendments, affected Centre-State relations?',
+        'How have judicial interpretations, particularly by the Supreme Court, shaped the understanding of Centre-State relations?',
+    ]),
+    ('challenges', 'Challenges and Issues', [
+        'What are some of the key challenges and tensions that exist in Centre-State relations in India?',
+        'How do issues like financial imbalances, legislative conflicts, and administrative interventions impact these relations?',
+    ]),
+    ('examples', 'Specific Examples', [
+        "How does the Centre exert control over states during President's rule?",
+        'How has the concept of cooperative federalism been applied in the context of Centre-State relations?',
+    ]),
+    ('articles', 'Important Articles', [
+        'Which articles of the Indian Constitution deal with legislative relations between the Centre and states?',
+        'Which article deals with the executive power of the Union?',
+    ]),
+    ('financial_articles', 'Articles Related to Financial Relations', [
+        'What are the key features of the Seventh Schedule of the Indian Constitution?',
+        'How does the Constitution ensure that the Union can give directions to the states?',
+        'What are the main recommendations of the Sarkaria Commission concerning the role of Governors?',
+        'Discuss the impact of the 42nd amendment on Centre-State relations.',
+    ]),
+]
+
+
+def seed_first_version(apps, schema_editor):
+    """Version 1 is the questionnaire that used to live in constants.py"""
+    QuestionnaireVersion = apps.get_model('questionnaire', 'QuestionnaireVersion')
+    QuestionnaireSection = apps.get_model('questionnaire', 'QuestionnaireSection')
+    QuestionnaireQuestion = apps.get_model('questionnaire', 'QuestionnaireQuestion')
+
+    version = QuestionnaireVersion.objects.create(
+        number=1, note="Initial questionnaire", is_active=True, published_at=timezone.now())
+    for position, (key, title, questions) in enumerate(VERSION_1):
+        section = QuestionnaireSection.objects.create(
+            version=version, key=key, title=title, position=position)
+        QuestionnaireQuestion.objects.bulk_create([
+            QuestionnaireQuestion(section=section, text=text, position=index)
+            for index, text in enumerate(questions)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0008_analytics_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionnaireSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, validators=[django.core.validators.RegexValidator('^[a-z0-9_]+$', 'Use lowercase letters, digits and underscores only.')])),
+                ('title', models.CharField(max_length=200)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['position', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionnaireQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('section', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='questionnaire.questionnairesection')),
+            ],
+            options={
+                'ordering': ['position', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionnaireVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(unique=True)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('is_active', models.BooleanField(default=False)),
+                ('published_at', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-number'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('is_active',), name='questionnaire_single_active_version')],
+            },
+        ),
+        migrations.AddField(
+            model_name='questionnairesection',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='questionnaire.questionnaireversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='questionnairesection',
+            constraint=models.UniqueConstraint(fields=('version', 'key'), name='questionnaire_unique_section_key'),
+        ),
+        migrations.RunPython(seed_first_version, migrations.RunPython.noop),
+    ]
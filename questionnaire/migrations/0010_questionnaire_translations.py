@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0009_questionnaire_definitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionnairequestion',
+            name='translations',
+            field=models.JSONField(blank=True, default=dict, help_text='Language code to translated text, e.g. {"ta": "..."}'),
+        ),
+        migrations.AddField(
+            model_name='questionnairesection',
+            name='title_translations',
+            field=models.JSONField(blank=True, default=dict, help_text='Language code to translated text, e.g. {"ta": "..."}'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def enable_wal(apps, schema_editor):
+    # WAL is a property of the database file, so it is switched on once
+    # here rather than by every new connection
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+
+
+class Migration(migrations.Migration):
+    # journal_mode cannot change inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('questionnaire', '0010_questionnaire_translations'),
+    ]
+
+    operations = [
+        migrations.RunPython(enable_wal, migrations.RunPython.noop, elidable=True),
+    ]
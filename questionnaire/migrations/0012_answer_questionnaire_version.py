@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def set_active_version(apps, schema_editor):
+    # Existing answers were read against whichever version was active
+    QuestionnaireVersion = apps.get_model('questionnaire', 'QuestionnaireVersion')
+    Answer = apps.get_model('questionnaire', 'Answer')
+    number = QuestionnaireVersion.objects.filter(is_active=True).values_list('number', flat=True).first()
+    if number is not None:
+        Answer.objects.update(questionnaire_version=number)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questionnaire', '0011_sqlite_wal'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='answer',
+            name='answer_unique_question',
+        ),
+        migrations.AddField(
+            model_name='answer',
+            name='questionnaire_version',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_active_version, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='answer',
+            constraint=models.UniqueConstraint(fields=('respondent', 'questionnaire_version', 'section', 'question_index'), name='answer_unique_question'),
+        ),
+    ]
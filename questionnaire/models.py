@@ -1,14 +1,22 @@
-import random
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
 from uuid import uuid4  # Add this import back
 
+from .storage import get_response_pdf_storage
+
 def generate_application_id():
     """Generate an 8-digit unique application ID"""
-    while True:
-        app_id = str(random.randint(10000000, 99999999))  # 8-digit number
-        if not Respondent.objects.filter(application_id=app_id).exists():
-            return app_id
+    from .application_ids import allocator
+    return allocator.next_id()
+
+class ApplicationIdCounter(models.Model):
+    """Counter that application IDs are derived from (see application_ids.py)"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
 
 class Respondent(models.Model):
     PROFESSION_CHOICES = [
@@ -56,6 +64,18 @@ class Respondent(models.Model):
         null=True
     )
 
+    class Meta:
+        indexes = [
+            # Mobile verification looks respondents up by number alone
+            models.Index(fields=['mobile_number'], name='respondent_mobile_idx'),
+            # Covers the upload check on (application_id, mobile_number)
+            models.Index(fields=['application_id', 'mobile_number'], name='respondent_app_mobile_idx'),
+            # Admin list filters
+            models.Index(fields=['state'], name='respondent_state_idx'),
+            models.Index(fields=['profession'], name='respondent_profession_idx'),
+            models.Index(fields=['specialization'], name='respondent_specialization_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.application_id})"
 
@@ -66,10 +86,127 @@ class Respondent(models.Model):
 
 class ResponsePDF(models.Model):
     respondent = models.ForeignKey(Respondent, on_delete=models.CASCADE, related_name='responses')
-    pdf_file = models.FileField(upload_to='response_pdfs/')
+    # Stored as response_pdfs/ab/cd/<sha256>.pdf, see storage.py
+    pdf_file = models.FileField(upload_to='response_pdfs/', storage=get_response_pdf_storage)
+    # SHA-256 of the file content; identical uploads share one stored file
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     upload_date = models.DateTimeField(auto_now_add=True)
     verification_code = models.UUIDField(default=uuid4, editable=False, unique=True)
     is_verified = models.BooleanField(default=False)
+    # Set by answer extraction (see answer_extraction.py)
+    answers_extracted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    extraction_error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            # Admin list filter
+            models.Index(fields=['is_verified'], name='responsepdf_verified_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.respondent.name} - {self.upload_date.strftime('%Y-%m-%d')}"
\ No newline at end of file
+        return f"{self.respondent.name} - {self.upload_date.strftime('%Y-%m-%d')}"
+
+class Answer(models.Model):
+    """An answer read from the form fields of an uploaded response PDF"""
+    respondent = models.ForeignKey(Respondent, on_delete=models.CASCADE, related_name='answers')
+    response_pdf = models.ForeignKey(ResponsePDF, on_delete=models.CASCADE, related_name='answers')
+    # Section and question_index refer to this version of the questionnaire
+    questionnaire_version = models.PositiveIntegerField()
+    section = models.CharField(max_length=50)
+    question_index = models.PositiveSmallIntegerField()
+    text = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # The latest upload's answer to a question replaces earlier ones
+            models.UniqueConstraint(fields=['respondent', 'questionnaire_version', 'section', 'question_index'],
+                                    name='answer_unique_question'),
+        ]
+        indexes = [
+            models.Index(fields=['section', 'question_index'], name='answer_question_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.respondent_id} {self.section}[{self.question_index}]"
+
+
+class AnalyticsSummary(models.Model):
+    """Running totals per respondent group, maintained by analytics.py"""
+    state = models.CharField(max_length=50)
+    profession = models.CharField(max_length=50)
+    specialization = models.CharField(max_length=50)
+    gender = models.CharField(max_length=20)
+    respondents = models.PositiveIntegerField(default=0)
+    full_downloads = models.PositiveIntegerField(default=0)
+    section_downloads = models.PositiveIntegerField(default=0)
+    uploads = models.PositiveIntegerField(default=0)
+    verified_uploads = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "analytics summary"
+        verbose_name_plural = "analytics"
+        constraints = [
+            models.UniqueConstraint(fields=['state', 'profession', 'specialization', 'gender'],
+                                    name='analytics_summary_unique_group'),
+        ]
+
+    def __str__(self):
+        return f"{self.state} / {self.profession} / {self.specialization} / {self.gender}"
+
+
+class QuestionnaireVersion(models.Model):
+    """
+    One version of the Section B questionnaire. Versions are edited as
+    drafts and frozen once published; see definitions.py.
+    """
+    number = models.PositiveIntegerField(unique=True)
+    note = models.CharField(max_length=200, blank=True)
+    is_active = models.BooleanField(default=False)
+    published_at = models.DateTimeField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [
+            # The version every new download uses
+            models.UniqueConstraint(fields=['is_active'], condition=models.Q(is_active=True),
+                                    name='questionnaire_single_active_version'),
+        ]
+
+    def __str__(self):
+        return f"Questionnaire v{self.number}"
+
+# Untranslated sections and questions appear in English in that language's PDF
+TRANSLATIONS_HELP = 'Language code to translated text, e.g. {"ta": "..."}'
+
+class QuestionnaireSection(models.Model):
+    version = models.ForeignKey(QuestionnaireVersion, on_delete=models.CASCADE, related_name='sections')
+    # Part of the PDF field names (answer_<key>_<n>); keep it stable across versions
+    key = models.CharField(max_length=50, validators=[
+        RegexValidator(r'^[a-z0-9_]+$', "Use lowercase letters, digits and underscores only."),
+    ])
+    title = models.CharField(max_length=200)
+    title_translations = models.JSONField(default=dict, blank=True, help_text=TRANSLATIONS_HELP)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'pk']
+        constraints = [
+            models.UniqueConstraint(fields=['version', 'key'], name='questionnaire_unique_section_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} (v{self.version.number})"
+
+class QuestionnaireQuestion(models.Model):
+    section = models.ForeignKey(QuestionnaireSection, on_delete=models.CASCADE, related_name='questions')
+    text = models.TextField()
+    translations = models.JSONField(default=dict, blank=True, help_text=TRANSLATIONS_HELP)
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'pk']
+
+    def __str__(self):
+        return self.text[:80]
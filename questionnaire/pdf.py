@@ -0,0 +1,253 @@
+"""
+PDF generation for the questionnaire downloads.
+
+Kept out of views.py so that reportlab is only imported by workers that
+actually render a PDF.
+
+Compact mode (PDF_COMPACT_OUTPUT) writes the same documents smaller:
+streams are compressed without an ASCII85 layer, the header repeated on
+every page is one form XObject, all empty answer boxes share one
+appearance stream, and Latin header text uses the viewer's Helvetica
+rather than an embedded copy.
+
+A PDF in another language uses the questionnaire's translation and that
+language's fonts. The respondent header and document title stay in the
+default fonts, since they hold what the respondent typed in Section A.
+"""
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfdoc
+from reportlab.pdfgen import canvas
+
+from .definitions import get_questionnaire
+from .font_registry import (
+    BUILTIN_TEXT_FONT, DEFAULT_FONTS, TEXT_FONT, TITLE_FONT, fonts_for, has_language_fonts,
+)
+from .pdf_templates import SharedAppearanceForm, get_full_template, get_section_template
+
+# Document keywords identifying what a downloaded PDF contains, including
+# the questionnaire version its answer fields are numbered by
+def full_keywords(version):
+    return f'csr-questionnaire full version:{version}'
+
+
+def section_keywords(section_key, version):
+    return f'csr-questionnaire section:{section_key} version:{version}'
+
+
+# Bump whenever a change to the rendering code changes the output bytes, so
+# that ETags handed out by older code stop matching
+PDF_RENDER_VERSION = 7
+
+
+def pdf_questionnaire(questionnaire, language):
+    """
+    The questionnaire a PDF in `language` is rendered from: its translation
+    if there is one and the language's fonts are installed, else itself
+    """
+    translated = questionnaire.in_language(language)
+    if translated is not questionnaire and not has_language_fonts(language):
+        return questionnaire
+    return translated
+
+
+def pdf_etag(respondent, pdf_type, section_key=None, questionnaire=None):
+    """
+    Strong ETag for a questionnaire PDF, computed without rendering it.
+
+    Documents are rendered with reportlab's invariant mode, so the same
+    respondent header, questionnaire version and renderer always produce
+    the same bytes.
+    """
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    parts = [
+        PDF_RENDER_VERSION,
+        questionnaire.content_hash,
+        pdf_type,
+        section_key or '',
+        respondent.application_id,
+        respondent.name,
+        respondent.profession,
+        respondent.specialization,
+        respondent.state,
+        respondent.created_at.strftime('%d-%m-%Y'),
+        compact_output(),
+    ]
+    digest = hashlib.sha256('\x1f'.join(map(str, parts)).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def compact_output():
+    """Whether PDFs are written in compact mode (PDF_COMPACT_OUTPUT)"""
+    return getattr(settings, 'PDF_COMPACT_OUTPUT', False)
+
+
+def _new_canvas(buffer, compact):
+    if not compact:
+        return canvas.Canvas(buffer, pagesize=letter, invariant=1)
+
+    # reportlab wraps compressed page and form streams in ASCII85, which
+    # makes them 25% larger, unless the process-wide rl_config.useA85 is
+    # off. Pages and forms are therefore left to the document, which
+    # compresses every stream without its own filters with Flate only.
+    p = canvas.Canvas(buffer, pagesize=letter, invariant=1, pageCompression=0)
+    p._doc.setCompression(1)
+    p._doc.defaultStreamFilters = [pdfdoc.PDFZCompress]
+    SharedAppearanceForm.install(p)
+    return p
+
+
+def _text_font(compact, *texts):
+    """
+    Font for the respondent header: in compact mode the viewer's built-in
+    Helvetica, which adds no embedded font, unless the text needs glyphs
+    outside its encoding
+    """
+    if compact:
+        try:
+            for text in texts:
+                text.encode('cp1252')
+        except UnicodeEncodeError:
+            return TEXT_FONT
+        return BUILTIN_TEXT_FONT
+    return TEXT_FONT
+
+
+def _respondent_info(respondent):
+    return (
+        f"Name: {respondent.name} | Profession: {respondent.get_profession_display()} | "
+        f"Specialization: {respondent.get_specialization_display()} | "
+        f"State: {respondent.state} | Date: {respondent.created_at.strftime('%d-%m-%Y')}"
+    )
+
+
+def generate_full_pdf(respondent, questionnaire=None, compact=None):
+    """
+    Helper function to generate full PDF content (defaults to the active
+    questionnaire and to PDF_COMPACT_OUTPUT)
+    """
+    # Fonts are registered once per process (per language), before any canvas exists
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    if compact is None:
+        compact = compact_output()
+    fonts_for(questionnaire.language)
+    title_font = TITLE_FONT
+    
+    buffer = BytesIO()
+    p = _new_canvas(buffer, compact)
+    p.setKeywords(full_keywords(questionnaire.version))
+    width, height = letter
+    
+    # Question body and answer fields are laid out once per questionnaire version
+    template = get_full_template(letter, questionnaire)
+    app_id_text = f"Application ID: {respondent.application_id}"
+    respondent_info = _respondent_info(respondent)
+    text_font = _text_font(compact, respondent_info, app_id_text)
+    
+    def draw_header():
+        # Title and Application ID, the same on every page
+        p.setFont(title_font, 16)
+        p.drawCentredString(width/2, height-50, "Union-State Relations Questionnaire - Full")
+        p.setFont(text_font, 10)
+        p.drawString(50, height-100, app_id_text)
+    
+    if compact:
+        # Drawn once as a form XObject and placed on every page
+        p.beginForm('header')
+        draw_header()
+        p.endForm()
+    
+    for page_no in range(len(template.pages)):
+        if page_no > 0:
+            p.showPage()
+        if compact:
+            p.doForm('header')
+        else:
+            draw_header()
+        if page_no == 0:
+            # Respondent info on the first page
+            p.setFont(text_font, 10)
+            p.drawString(50, height-80, respondent_info)
+        
+        template.draw_page(p, page_no)
+    
+    p.save()
+    return buffer.getvalue()
+
+def generate_section_pdf(respondent, section_key, questionnaire=None, compact=None):
+    """
+    Helper function to generate section PDF content (defaults to the active
+    questionnaire and to PDF_COMPACT_OUTPUT)
+    """
+    # Fonts are registered once per process (per language), before any canvas exists
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    if compact is None:
+        compact = compact_output()
+    fonts = fonts_for(questionnaire.language) or DEFAULT_FONTS
+    title_font = TITLE_FONT
+    
+    buffer = BytesIO()
+    p = _new_canvas(buffer, compact)
+    width, height = letter
+    
+    # Section info
+    section_title = questionnaire.titles.get(section_key, section_key.replace('_', ' ').title())
+    # Field names in a section PDF do not name the section; this tells answer
+    # extraction which section an uploaded copy belongs to
+    p.setKeywords(section_keywords(section_key, questionnaire.version))
+    
+    # Question body and answer fields are laid out once per questionnaire version
+    template = get_section_template(section_key, letter, questionnaire)
+    app_id_text = f"Application ID: {respondent.application_id}"
+    respondent_info = _respondent_info(respondent)
+    text_font = _text_font(compact, respondent_info, app_id_text)
+    
+    def draw_continuation_header():
+        p.setFont(fonts.title, 16)
+        p.drawCentredString(width/2, height-50, f"{section_title} (Continued)", shaping=fonts.shaped)
+        p.setFont(text_font, 9)
+        p.drawString(40, height-100, app_id_text)
+    
+    if compact and len(template.pages) > 1:
+        # Drawn once as a form XObject and placed on every continuation page
+        p.beginForm('continuation')
+        draw_continuation_header()
+        p.endForm()
+    
+    for page_no in range(len(template.pages)):
+        if page_no == 0:
+            # Title
+            p.setFont(title_font, 16)
+            p.drawCentredString(width/2, height-50, "Union-State Relations Questionnaire")
+            p.setFont(fonts.title, 14)
+            p.drawString(40, height-80, section_title, shaping=fonts.shaped)
+            
+            # Respondent info and Application ID
+            p.setFont(text_font, 9)
+            p.drawString(40, height-100, respondent_info)
+            p.drawString(40, height-120, app_id_text)
+        else:
+            p.showPage()
+            if compact:
+                p.doForm('continuation')
+            else:
+                draw_continuation_header()
+        
+        template.draw_page(p, page_no)
+    
+    p.save()
+    return buffer.getvalue()
+
+
+def render_pdf(respondent, pdf_type, section_key=None, version=None, language=None):
+    """Render the full or a section PDF; entry point for the render service"""
+    questionnaire = pdf_questionnaire(get_questionnaire(version), language)
+    if pdf_type == 'full':
+        return generate_full_pdf(respondent, questionnaire)
+    return generate_section_pdf(respondent, section_key, questionnaire)
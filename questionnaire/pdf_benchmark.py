@@ -0,0 +1,167 @@
+"""
+Micro-benchmarks for questionnaire PDF rendering.
+
+Each case renders the full questionnaire or its largest section for a
+question set scaled from SECTION_B_QUESTIONS: 1x is the real questionnaire,
+larger scales repeat every section's questions and lengthen every other one
+so that wrapping and page breaks get exercised. A case is measured twice:
+"cold" includes laying out the question body (template cache cleared), and
+"warm" is the steady state where only the respondent header is new.
+Timings use the configured PDF_COMPACT_OUTPUT; the output size is reported
+for both the regular and the compact mode.
+
+Results can be saved as a baseline and later runs compared against it; see
+the `benchmark_pdf` management command. Baselines are only meaningful on
+the machine that recorded them.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from .constants import SECTION_B_QUESTIONS, SECTION_TITLES
+from .definitions import Questionnaire
+from .models import Respondent
+
+DEFAULT_SCALES = (1, 10, 100)
+
+# Timings compared against the baseline
+TIMING_KEYS = ('cold_ms', 'warm_ms')
+
+
+def scaled_questions(scale):
+    """SECTION_B_QUESTIONS with every section repeated `scale` times"""
+    if scale == 1:
+        return SECTION_B_QUESTIONS
+    questions = {}
+    for section_key, section_questions in SECTION_B_QUESTIONS.items():
+        scaled = []
+        for copy in range(scale):
+            for index, question in enumerate(section_questions):
+                if (copy + index) % 2:
+                    # Long question spanning several wrapped lines
+                    question = f"{question} {question} Please elaborate with examples: {question}"
+                scaled.append(f"[{copy + 1}] {question}")
+        questions[section_key] = scaled
+    return questions
+
+
+def benchmark_respondent():
+    return Respondent(
+        application_id='12345678',
+        name='Benchmark Respondent With A Fairly Long Name',
+        profession='Government Official',
+        specialization='Public Administration',
+        state='Andaman and Nicobar Islands',
+        created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _largest_section():
+    return max(SECTION_B_QUESTIONS, key=lambda key: len(SECTION_B_QUESTIONS[key]))
+
+
+def cases(scales=DEFAULT_SCALES):
+    """(name, pdf_type, section_key, questions) for every benchmark case"""
+    section_key = _largest_section()
+    for scale in scales:
+        questions = scaled_questions(scale)
+        yield f'full_{scale}x', 'full', None, questions
+        yield f'section_{scale}x', 'section', section_key, questions
+
+
+def _render(pdf_type, section_key, questionnaire, respondent, compact=None):
+    from .pdf import generate_full_pdf, generate_section_pdf
+
+    if pdf_type == 'full':
+        return generate_full_pdf(respondent, questionnaire, compact)
+    return generate_section_pdf(respondent, section_key, questionnaire, compact)
+
+
+def _page_count(pdf_type, section_key, questionnaire):
+    from .pdf_templates import get_full_template, get_section_template
+
+    if pdf_type == 'full':
+        return len(get_full_template(questionnaire=questionnaire).pages)
+    return len(get_section_template(section_key, questionnaire=questionnaire).pages)
+
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run_case(pdf_type, section_key, questions, repeat=5):
+    """Measure one case; times are medians in milliseconds"""
+    from .font_registry import ensure_fonts
+    from .pdf_templates import template_cache
+
+    ensure_fonts()
+    respondent = benchmark_respondent()
+    questionnaire = Questionnaire.from_dict(questions, SECTION_TITLES)
+
+    def cold():
+        template_cache.clear()
+        return _render(pdf_type, section_key, questionnaire, respondent)
+
+    def warm():
+        return _render(pdf_type, section_key, questionnaire, respondent)
+
+    cold_ms = _timed(cold, repeat)
+    warm()
+    warm_ms = _timed(warm, repeat)
+    # Output size with and without PDF_COMPACT_OUTPUT
+    size = len(_render(pdf_type, section_key, questionnaire, respondent, compact=False))
+    compact_size = len(_render(pdf_type, section_key, questionnaire, respondent, compact=True))
+    pages = _page_count(pdf_type, section_key, questionnaire)
+
+    # Peak memory of a cold render, measured separately as tracing slows it down
+    template_cache.clear()
+    tracemalloc.start()
+    try:
+        _render(pdf_type, section_key, questionnaire, respondent)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'pages': pages,
+        'bytes': size,
+        'compact_bytes': compact_size,
+        'cold_ms': round(cold_ms, 3),
+        'warm_ms': round(warm_ms, 3),
+        'pages_per_second': round(pages / (warm_ms / 1000), 1) if warm_ms else None,
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, repeat=5):
+    results = {}
+    for name, pdf_type, section_key, questions in cases(scales):
+        results[name] = run_case(pdf_type, section_key, questions, repeat)
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """
+    Return (case, metric, baseline, current, percent slower) for every
+    timing more than `max_regression` percent above the baseline.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in TIMING_KEYS:
+            if not previous.get(key):
+                continue
+            change = (current[key] - previous[key]) / previous[key] * 100
+            if change > max_regression:
+                regressions.append((name, key, previous[key], current[key], round(change, 1)))
+    return regressions
@@ -0,0 +1,87 @@
+"""
+Reader for the form fields of a filled-in questionnaire PDF.
+
+Parsing is left to pypdf, which reads the cross-reference table (or
+rebuilds it for a damaged file) instead of scanning the whole file for
+objects, resolves incremental updates and compressed object streams, and
+fails on the first malformed token. Uploads are untrusted: pypdf also caps
+how far a stream may decompress (pypdf.filters.ZLIB_MAX_OUTPUT_LENGTH),
+and a file that reaches one of its limits is rejected as a whole.
+Encrypted files are not supported.
+
+This module does not import Django, so it can run in worker processes that
+never set Django up.
+"""
+import logging
+from collections import namedtuple
+
+from pypdf import PdfReader
+from pypdf.errors import LimitReachedError, PyPdfError
+from pypdf.generic import NameObject
+
+ParsedForm = namedtuple('ParsedForm', 'fields keywords markers')
+
+# pypdf reports every repair it makes to a damaged file; uploads are often
+# damaged, and a file that cannot be repaired raises anyway
+logging.getLogger('pypdf').setLevel(logging.ERROR)
+
+
+class PDFFormError(Exception):
+    pass
+
+
+class PDFLimitError(PDFFormError):
+    """The file exceeds a size or nesting limit; it is not read any further"""
+
+
+def _field_value(value):
+    """A text field's value as a string, None if unfilled, or False to skip the field"""
+    if value is None:
+        return None
+    if isinstance(value, NameObject):
+        return str(value)[1:]
+    if isinstance(value, str):
+        return str(value)
+    return False
+
+
+def _page_markers(reader, markers):
+    """Which of `markers` are drawn as a literal string in the page content"""
+    wanted = {marker: f'({marker})'.encode('latin-1') for marker in markers}
+    found = set()
+    for page in reader.pages:
+        contents = page.get_contents()
+        if contents is None:
+            continue
+        data = contents.get_data()
+        found.update(marker for marker, needle in wanted.items() if needle in data)
+        if len(found) == len(wanted):
+            break
+    return found
+
+
+def parse_form(path, markers=()):
+    """
+    Read a PDF's form fields. Returns ParsedForm(fields, keywords, markers):
+    field name -> value (None if unfilled), the document /Keywords, and which
+    of `markers` were drawn as a string anywhere in the page content.
+    Raises PDFFormError for files that cannot or may not be read.
+    """
+    try:
+        reader = PdfReader(path, strict=False)
+        if reader.is_encrypted:
+            raise PDFFormError("Encrypted PDFs are not supported")
+        fields = {}
+        for name, field in (reader.get_fields() or {}).items():
+            value = _field_value(field.get('/V'))
+            if value is not False:
+                fields[name] = value
+        keywords = (reader.metadata or {}).get('/Keywords')
+        found = _page_markers(reader, markers) if markers else set()
+    except LimitReachedError as exc:
+        raise PDFLimitError(str(exc)) from exc
+    except (MemoryError, RecursionError) as exc:
+        raise PDFLimitError(f"File too complex to read ({type(exc).__name__})") from exc
+    except (PyPdfError, ValueError, TypeError, KeyError, AttributeError) as exc:
+        raise PDFFormError(str(exc) or "Not a readable PDF file") from exc
+    return ParsedForm(fields, str(keywords) if isinstance(keywords, str) else '', found)
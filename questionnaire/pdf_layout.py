@@ -0,0 +1,188 @@
+"""
+Page layout shared by the full and section questionnaire PDFs.
+
+Layout is pure data: every text line and answer field gets its page and
+coordinates up front, so the renderers only have to replay it onto a
+canvas. Line breaking measures each word once and keeps a running line
+width, which keeps wrapping linear in the length of the question.
+
+For fonts that are shaped, words are measured as shaped, and an overlong
+word is only broken between grapheme clusters, never between a consonant
+and its vowel sign or virama.
+"""
+import unicodedata
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen.textobject import bidiShapedText
+
+from .font_registry import DEFAULT_FONTS
+
+MARGIN = 50
+QUESTION_SIZE = 11
+QUESTION_LEADING = 15
+HEADING_SIZE = 14
+HEADING_SPACING = 30
+FIELD_HEIGHT = 80
+FIELD_GAP = 10
+QUESTION_SPACING = 30
+BOTTOM_MARGIN = 100
+# Distance from the top edge to the body on each kind of page; the first
+# page headers carry respondent details, continuation pages only the title
+# and application ID
+FULL_TOP = 130
+SECTION_TOP = 150
+CONTINUATION_TOP = 130
+
+TextLine = namedtuple('TextLine', 'x y font size text')
+AnswerField = namedtuple('AnswerField', 'name tooltip x y width height')
+
+# Entries fed to layout_questions()
+Heading = namedtuple('Heading', 'text')
+Question = namedtuple('Question', 'text field_name tooltip')
+
+
+def text_width(text, font, size, shaped=False):
+    """Width of `text` as drawn; measured after shaping for shaped fonts"""
+    if shaped:
+        return bidiShapedText(text, None, fontName=font, fontSize=size, shaping=True)[1]
+    return pdfmetrics.stringWidth(text, font, size)
+
+
+_ZERO_WIDTH_JOINERS = ('\u200c', '\u200d')
+
+
+def _clusters(word):
+    """Split a word into grapheme clusters: marks, viramas and joiners stay attached"""
+    clusters = []
+    for char in word:
+        joined = clusters and (
+            unicodedata.category(char) in ('Mn', 'Mc', 'Me')
+            or char in _ZERO_WIDTH_JOINERS
+            or clusters[-1][-1] in _ZERO_WIDTH_JOINERS
+            # A virama joins the next consonant into a conjunct
+            or unicodedata.combining(clusters[-1][-1]) == 9
+        )
+        if joined:
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def _split_long_word(word, font, size, max_width, shaped=False):
+    """Break a single word that is wider than the line into fitting chunks"""
+    chunks = []
+    current = ''
+    current_width = 0.0
+    for cluster in _clusters(word):
+        cluster_width = text_width(cluster, font, size, shaped)
+        if current and current_width + cluster_width > max_width:
+            chunks.append(current)
+            current = ''
+            current_width = 0.0
+        current += cluster
+        current_width += cluster_width
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def wrap_text(text, font, size, max_width, shaped=False):
+    """Split text into lines no wider than max_width"""
+    space_width = text_width(' ', font, size, shaped)
+    lines = []
+    current_line = []
+    current_width = 0.0
+
+    for word in text.split():
+        word_width = text_width(word, font, size, shaped)
+
+        if word_width > max_width:
+            # Too wide for any line: flush and hard-break it instead of
+            # emitting an empty line
+            if current_line:
+                lines.append(' '.join(current_line))
+            chunks = _split_long_word(word, font, size, max_width, shaped)
+            lines.extend(chunks[:-1])
+            current_line = [chunks[-1]]
+            current_width = text_width(chunks[-1], font, size, shaped)
+        elif not current_line:
+            current_line = [word]
+            current_width = word_width
+        elif current_width + space_width + word_width <= max_width:
+            current_line.append(word)
+            current_width += space_width + word_width
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+            current_width = word_width
+
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def layout_questions(entries, top, pagesize=letter, fonts=DEFAULT_FONTS):
+    """
+    Place headings, wrapped question text and answer fields on pages, in
+    the title face of `fonts` (a font_registry.FontSet).
+
+    Returns a list of pages, each a list of TextLine and AnswerField items.
+    The first page body starts `top` points below the page edge.
+    """
+    width, height = pagesize
+    max_width = width - 2 * MARGIN
+    question_indexes = [i for i, entry in enumerate(entries) if isinstance(entry, Question)]
+    last_question = question_indexes[-1] if question_indexes else -1
+
+    pages = [[]]
+    items = pages[0]
+    y_position = height - top
+
+    for idx, entry in enumerate(entries):
+        if isinstance(entry, Heading):
+            items.append(TextLine(MARGIN, y_position, fonts.title, HEADING_SIZE, entry.text))
+            y_position -= HEADING_SPACING
+            continue
+
+        text_y = y_position
+        for line in wrap_text(entry.text, fonts.title, QUESTION_SIZE, max_width, fonts.shaped):
+            items.append(TextLine(MARGIN, text_y, fonts.title, QUESTION_SIZE, line))
+            text_y -= QUESTION_LEADING
+
+        field_y = text_y - FIELD_HEIGHT - FIELD_GAP
+        items.append(AnswerField(entry.field_name, entry.tooltip, MARGIN, field_y, max_width, FIELD_HEIGHT))
+        y_position = field_y - QUESTION_SPACING
+
+        # Page break if needed
+        if y_position < BOTTOM_MARGIN and idx < last_question:
+            items = []
+            pages.append(items)
+            y_position = height - CONTINUATION_TOP
+
+    return pages
+
+
+def full_entries(sections):
+    """Layout entries for the full questionnaire (definitions.Section items)"""
+    entries = []
+    for section_idx, section in enumerate(sections):
+        section_number = section_idx + 1
+        entries.append(Heading(f"{section_number}. {section.title}"))
+        for q_idx, question in enumerate(section.questions):
+            entries.append(Question(
+                f"{q_idx+1}. {question}",
+                f"answer_{section.key}_{q_idx}",
+                f"Answer for question {section_number}.{q_idx+1}",
+            ))
+    return entries
+
+
+def section_entries(questions):
+    """Layout entries for a single-section questionnaire"""
+    return [
+        Question(f"{i+1}. {question}", f"answer_{i}", f"Answer for question {i+1}")
+        for i, question in enumerate(questions)
+    ]
@@ -0,0 +1,224 @@
+"""
+Out-of-process PDF rendering.
+
+reportlab rendering is CPU-bound pure Python, so running it on the request
+thread lets a burst of downloads occupy every WSGI worker. The render
+service hands jobs to a pool of worker processes instead. At most
+PDF_RENDER_WORKERS + PDF_RENDER_QUEUE_SIZE jobs are accepted at once; beyond
+that callers get RenderQueueFull straight away so the view can answer 503
+rather than pile up requests. Setting PDF_RENDER_WORKERS to 0 renders
+inline on the request thread, still bounded by the same queue limit but
+without the timeout: a slow inline render holds its thread and slot until
+it finishes.
+
+A job that times out may be stuck for good, so the pool is recycled: its
+worker processes are terminated and the next job starts a fresh pool.
+Jobs running on the old pool at that moment fail and get a 503 as well.
+"""
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class PDFRenderError(Exception):
+    """The PDF could not be rendered right now; the client should retry"""
+
+
+class RenderQueueFull(PDFRenderError):
+    pass
+
+
+class RenderTimeout(PDFRenderError):
+    pass
+
+
+def _init_worker(pids):
+    # Tells the service which processes to kill if this pool has to go
+    pids.put(os.getpid())
+
+    # Worker processes are spawned, so Django has to be set up again
+    import django
+    django.setup()
+
+    from .font_registry import ensure_fonts
+    ensure_fonts()
+
+
+def _render(respondent, pdf_type, section_key, version, language):
+    from .pdf import render_pdf
+    return render_pdf(respondent, pdf_type, section_key, version, language)
+
+
+class PDFRenderService:
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        # Executor -> queue its workers report their PIDs on
+        self._worker_pids = {}
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            workers=getattr(settings, 'PDF_RENDER_WORKERS', 0),
+            queue_size=getattr(settings, 'PDF_RENDER_QUEUE_SIZE', 8),
+            timeout=getattr(settings, 'PDF_RENDER_TIMEOUT', 30),
+        )
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                context = multiprocessing.get_context('spawn')
+                pids = context.Queue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(pids,),
+                )
+                self._worker_pids[self._executor] = pids
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+            self._worker_pids.pop(executor, None)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise RenderQueueFull("PDF render queue is full")
+
+    def _submit(self, respondent, pdf_type, section_key, version, language):
+        """Queue a job on the pool; the caller must already hold a slot"""
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_render, respondent, pdf_type, section_key, version, language)
+        except (BrokenProcessPool, RuntimeError) as exc:
+            self._slots.release()
+            self._reset_executor(executor)
+            raise PDFRenderError("PDF render pool unavailable") from exc
+
+        # The slot is only freed once the worker is done with the job, even
+        # if the caller has given up on it
+        future.add_done_callback(lambda f: self._slots.release())
+        return executor, future
+
+    def _worker_processes(self, executor):
+        """The live worker processes of `executor`, going by the PIDs they reported"""
+        with self._executor_lock:
+            pids = self._worker_pids.get(executor)
+        reported = set()
+        while pids is not None:
+            try:
+                reported.add(pids.get_nowait())
+            except queue.Empty:
+                break
+        # Only unreaped children are listed, so a reused PID cannot match
+        return [process for process in multiprocessing.active_children() if process.pid in reported]
+
+    def _recycle(self, executor):
+        """Drop the pool and kill its workers, freeing the slots they hold"""
+        processes = self._worker_processes(executor)
+        self._reset_executor(executor)
+        # The pool notices its dead workers and fails their futures, which
+        # releases the slots
+        for process in processes:
+            process.terminate()
+
+    def _timed_out(self, executor, pdf_type, section_key):
+        logger.warning("PDF render timed out after %ss (%s %s), restarting pool",
+                       self.timeout, pdf_type, section_key or '')
+        self._recycle(executor)
+        return RenderTimeout("PDF render timed out")
+
+    def _broken(self, executor):
+        logger.error("PDF render worker died, restarting pool")
+        self._reset_executor(executor)
+        return PDFRenderError("PDF render pool broke")
+
+    def render(self, respondent, pdf_type, section_key=None, version=None, language=None):
+        """
+        Render a PDF of questionnaire `version` (default: the active one) in
+        `language`, raising PDFRenderError when saturated or too slow
+        """
+        self._acquire()
+
+        if self.workers <= 0:
+            try:
+                return _render(respondent, pdf_type, section_key, version, language)
+            finally:
+                self._slots.release()
+
+        executor, future = self._submit(respondent, pdf_type, section_key, version, language)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise self._timed_out(executor, pdf_type, section_key)
+        except BrokenProcessPool as exc:
+            raise self._broken(executor) from exc
+
+    async def arender(self, respondent, pdf_type, section_key=None, version=None, language=None):
+        """Async counterpart of render() that never blocks the event loop"""
+        self._acquire()
+
+        if self.workers <= 0:
+            try:
+                return await sync_to_async(_render, thread_sensitive=False)(
+                    respondent, pdf_type, section_key, version, language)
+            finally:
+                self._slots.release()
+
+        executor, future = self._submit(respondent, pdf_type, section_key, version, language)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out(executor, pdf_type, section_key)
+        except BrokenProcessPool as exc:
+            raise self._broken(executor) from exc
+
+    def shutdown(self):
+        with self._executor_lock:
+            executor = self._executor
+        if executor is not None:
+            self._reset_executor(executor)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_render_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PDFRenderService.from_settings()
+            atexit.register(_service.shutdown)
+        return _service
+
+
+@receiver(setting_changed)
+def _reset_render_service(setting, **kwargs):
+    # Lets override_settings() change the pool size, e.g. to render inline
+    global _service
+    if setting.startswith('PDF_RENDER_'):
+        with _service_lock:
+            if _service is not None:
+                _service.shutdown()
+            _service = None
@@ -0,0 +1,157 @@
+"""
+Cache of pre-rendered question bodies for the questionnaire PDFs.
+
+Only the respondent header differs between two downloads of the same
+section, so the question text, its wrapping and the AcroForm answer fields
+are laid out once per questionnaire version and replayed onto each new
+canvas.  Templates are keyed by the content hash of the compiled
+questionnaire (see definitions.py), so publishing a new version produces a
+new key and the stale entries age out of the LRU.  Each translation has
+its own hash, so a language is laid out, shaped and wrapped once per
+process like English is.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.acroform import AcroForm, PDFFromString
+
+from .definitions import get_questionnaire
+from .font_registry import DEFAULT_FONTS, fonts_for
+from .pdf_layout import (
+    AnswerField, FULL_TOP, SECTION_TOP, full_entries, layout_questions, section_entries,
+)
+
+
+class SharedAppearanceForm(AcroForm):
+    """
+    AcroForm writing one appearance stream for all identical fields.
+
+    reportlab already reuses a field appearance whose stream and resources
+    it has seen before, but it writes a new font dictionary for every field
+    and its lookup key includes object reprs, so every empty answer box of
+    the same size got its own copy of both.
+    """
+
+    def __init__(self, canv, **kwargs):
+        super().__init__(canv, **kwargs)
+        self._font_refs = {}
+
+    def makeFont(self, fontName):
+        if fontName not in self._font_refs:
+            self._font_refs[fontName] = super().makeFont(fontName)
+        return self._font_refs[fontName]
+
+    def makeStream(self, width, height, stream, **D):
+        s = super().makeStream(width, height, stream, **D)
+        resources = [f'{k}={v._s if isinstance(v, PDFFromString) else v}' for k, v in sorted(D.items())]
+        s._af_refstr = '\n'.join([stream, f'{width} {height}'] + resources)
+        return s
+
+    @classmethod
+    def install(cls, canv):
+        """Use for `canv`'s form fields; call before the first field is drawn"""
+        canv._doc._catalog.AcroForm = canv.AcroForm = cls(canv)
+
+
+class BodyTemplate:
+    """Laid-out question body: one list of TextLine/AnswerField items per page"""
+
+    def __init__(self, version, pages, shaped=False):
+        self.version = version
+        self.pages = pages
+        self.shaped = shaped
+
+    def draw_page(self, p, page_no):
+        form = p.acroForm
+        current_font = None
+        for item in self.pages[page_no]:
+            if isinstance(item, AnswerField):
+                form.textfield(
+                    name=item.name,
+                    tooltip=item.tooltip,
+                    x=item.x,
+                    y=item.y,
+                    width=item.width,
+                    height=item.height,
+                    borderColor=colors.black,
+                    fillColor=colors.white,
+                    textColor=colors.black,
+                    fontSize=10,
+                    borderWidth=1,
+                    fieldFlags=4096  # Multi-line flag
+                )
+                continue
+            if (item.font, item.size) != current_font:
+                current_font = (item.font, item.size)
+                p.setFont(item.font, item.size)
+            p.drawString(item.x, item.y, item.text, shaping=self.shaped)
+
+
+class TemplateCache:
+    """Thread-safe LRU cache of BodyTemplate objects"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, builder):
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                return template
+
+        # Build outside the lock; a concurrent duplicate build is harmless
+        template = builder()
+
+        with self._lock:
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+template_cache = TemplateCache(getattr(settings, 'PDF_TEMPLATE_CACHE_SIZE', 32))
+
+
+def _fonts(questionnaire):
+    return fonts_for(questionnaire.language) or DEFAULT_FONTS
+
+
+def get_full_template(pagesize=letter, questionnaire=None):
+    """Body of the full questionnaire PDF, built once per questionnaire version and language"""
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    fonts = _fonts(questionnaire)
+    version = questionnaire.content_hash
+    return template_cache.get_or_build(
+        ('full', None, version, pagesize),
+        lambda: BodyTemplate(version, layout_questions(
+            full_entries(questionnaire.sections), FULL_TOP, pagesize, fonts), fonts.shaped),
+    )
+
+
+def get_section_template(section_key, pagesize=letter, questionnaire=None):
+    """Body of a single-section PDF, built once per questionnaire version and language"""
+    if questionnaire is None:
+        questionnaire = get_questionnaire()
+    fonts = _fonts(questionnaire)
+    version = questionnaire.content_hash
+    return template_cache.get_or_build(
+        ('section', section_key, version, pagesize),
+        lambda: BodyTemplate(version, layout_questions(
+            section_entries(questionnaire.questions.get(section_key, ())), SECTION_TOP, pagesize, fonts),
+            fonts.shaped),
+    )
@@ -0,0 +1,115 @@
+"""
+Content-addressed storage for uploaded response PDFs.
+
+Files are named by the SHA-256 of their content and spread over two levels
+of hash-prefix directories, e.g. response_pdfs/ab/cd/abcd...ef.pdf, so no
+directory grows past a few hundred entries even with millions of uploads.
+Every write goes to a temp file under <upload dir>/.incoming and is renamed
+into place, which is atomic on one filesystem; content that is already
+stored is not written again.
+
+Names written before this layout (response_pdfs/<original name>) still
+resolve, as the storage root is unchanged. The migrate_response_pdfs
+command moves them into the sharded layout.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+INCOMING_DIR = '.incoming'
+
+SHARDED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.[A-Za-z0-9]+$')
+
+
+def sharded_name(directory, digest, extension='.pdf'):
+    return posixpath.join(directory, digest[:2], digest[2:4], f'{digest}{extension}')
+
+
+def is_sharded(name):
+    return SHARDED_NAME_RE.search(name) is not None
+
+
+class ShardedContentStorage(FileSystemStorage):
+    """FileSystemStorage that files content under its SHA-256"""
+
+    def incoming_path(self, directory):
+        """Directory for temp files that will be renamed into `directory`"""
+        path = self.path(posixpath.join(directory, INCOMING_DIR))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(); identical
+        # content maps to the same file instead of getting a suffix
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower() or '.pdf'
+        digest = getattr(content, 'sha256', None)
+
+        if digest and hasattr(content, 'temporary_file_path'):
+            # Streamed upload, already hashed on disk: move it in place
+            temp_path = content.temporary_file_path()
+            if os.path.dirname(temp_path) != self.incoming_path(directory):
+                temp_path = None
+        else:
+            temp_path = None
+
+        if temp_path is None:
+            temp_path, digest = self._write_temp(directory, content)
+            owned = True
+        else:
+            owned = False
+
+        name = sharded_name(directory, digest, extension)
+        path = self.path(name)
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                # Atomic; a concurrent write of the same content is harmless
+                os.replace(temp_path, path)
+                owned = False
+        finally:
+            if owned:
+                os.unlink(temp_path)
+        return name
+
+    def _write_temp(self, directory, content):
+        """Copy content to a temp file, returning its path and SHA-256"""
+        hasher = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=self.incoming_path(directory), suffix='.upload',
+                                         delete=False) as temp:
+            try:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    hasher.update(chunk)
+                    temp.write(chunk)
+                temp.flush()
+                os.fsync(temp.fileno())
+            except BaseException:
+                temp.close()
+                os.unlink(temp.name)
+                raise
+        return temp.name, hasher.hexdigest()
+
+
+response_pdf_storage = ShardedContentStorage(
+    file_permissions_mode=getattr(settings, 'FILE_UPLOAD_PERMISSIONS', None) or 0o644,
+)
+
+
+def get_response_pdf_storage():
+    # Referenced by the model as a callable so migrations do not capture
+    # the storage's settings
+    return response_pdf_storage
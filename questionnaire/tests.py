@@ -1,3 +1,1456 @@
-from django.test import TestCase
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Q
+from django.core import signing
+from django.core.cache import cache
+from django.test import Client, LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import application_ids, font_registry
+from .constants import SECTION_B_QUESTIONS, SECTION_TITLES
+from .definitions import copy_version, get_questionnaire, publish_version, registry
+from .download_tokens import SALT, make_download_token, read_download_token
+from .loadtest import percentile, run_load_test
+from .pdf_benchmark import compare, run_case, scaled_questions
+from .pdf_forms import PDFFormError, PDFLimitError, parse_form
+from .pdf_service import PDFRenderError, PDFRenderService, RenderQueueFull, RenderTimeout
+from .pdf_templates import TemplateCache, get_full_template, get_section_template, template_cache
+from .models import (
+    AnalyticsSummary, Answer, ApplicationIdCounter, QuestionnaireVersion, Respondent, ResponsePDF,
+)
+
+
+def make_respondent(**kwargs):
+    fields = {
+        'name': 'Test Respondent',
+        'gender': 'Female',
+        'mobile_number': '9876543210',
+        'state': 'Tamil Nadu',
+        'place_of_residence': 'Chennai',
+        'profession': 'Academician',
+        'specialization': 'Constitutional Law',
+    }
+    fields.update(kwargs)
+    return Respondent.objects.create(**fields)
+
+
+def slow_render(seconds, *args):
+    # Stands in for pdf_service._render; runs in a spawned render worker
+    time.sleep(seconds)
+    return b'%PDF-'
+
+
+class TemporaryMediaMixin:
+    """Stores the test class's uploads in a directory of its own, removed afterwards"""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+
+class ApplicationIdTests(TestCase):
+    def next_counter_value(self):
+        counter = ApplicationIdCounter.objects.filter(name=application_ids.COUNTER_NAME).first()
+        return counter.value if counter else 0
+
+    def test_permutation_is_unique_and_eight_digits(self):
+        key = application_ids._permutation_key()
+        ids = [application_ids.counter_to_id(value, key) for value in range(5000)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(len(app_id) == 8 and app_id.isdigit() and app_id[0] != '0' for app_id in ids))
+        last = application_ids.counter_to_id(application_ids.ID_SPACE - 1, key)
+        self.assertEqual(len(last), 8)
+        with self.assertRaises(application_ids.ApplicationIdsExhausted):
+            application_ids.counter_to_id(application_ids.ID_SPACE, key)
+
+    def test_cycle_walking_stays_in_range(self):
+        key = application_ids._permutation_key()
+        # Counter values whose first pass lands beyond the 8-digit range
+        walked = [value for value in range(2000)
+                  if application_ids._feistel(key, value) >= application_ids.ID_SPACE][:20]
+        self.assertTrue(walked)
+        for value in walked:
+            app_id = int(application_ids.counter_to_id(value, key))
+            self.assertTrue(application_ids.ID_MIN <= app_id < application_ids.ID_MIN + application_ids.ID_SPACE)
+        for value in (0, 1, 2 ** 27, 2 ** 28 - 1):
+            self.assertLess(application_ids._feistel(key, value), 2 ** 28)
+
+    def test_bulk_allocation_skips_taken_ids(self):
+        start = self.next_counter_value()
+        taken = application_ids.counter_to_id(start + 1)
+        make_respondent(application_id=taken)
+        ids = application_ids.allocate_application_ids(3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertNotIn(taken, ids)
+        # One extra counter value replaced the taken ID
+        self.assertEqual(self.next_counter_value(), start + 4)
+
+        ids = application_ids.allocate_application_ids(1200)
+        self.assertEqual(len(set(ids)), 1200)
+        self.assertEqual(self.next_counter_value(), start + 1204)
+
+    def test_no_block_cached_inside_a_transaction(self):
+        allocator = application_ids.ApplicationIdAllocator(block_size=10)
+        start = self.next_counter_value()
+        allocator.next_id()
+        allocator.next_id()
+        self.assertEqual(allocator._ids, [])
+        self.assertEqual(self.next_counter_value(), start + 2)
+
+
+class ApplicationIdAllocatorTests(TransactionTestCase):
+    def test_blocks_are_unique_across_boundaries(self):
+        allocator = application_ids.ApplicationIdAllocator(block_size=3)
+        ids = [allocator.next_id() for _ in range(10)]
+        self.assertEqual(len(set(ids)), 10)
+        # Four blocks of three reserved, two IDs left in memory
+        self.assertEqual(ApplicationIdCounter.objects.get().value, 12)
+        self.assertEqual(len(allocator._ids), 2)
+        self.assertEqual(ids[:3], [application_ids.counter_to_id(value) for value in range(3)])
+
+        allocator.reset()
+        self.assertNotIn(allocator.next_id(), ids)
+
+
+class RespondentLookupTests(TestCase):
+    """Each verification flow resolves the respondent in one indexed query"""
+
+    def respondent_queries(self, queries):
+        return [q['sql'] for q in queries if 'questionnaire_respondent' in q['sql']]
+
+    def test_verify_mobile_single_query(self):
+        respondent = make_respondent()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('verify_mobile'), {'mobile_number': respondent.mobile_number})
+        self.assertRedirects(response, reverse('download_options', args=[respondent.application_id]),
+                             fetch_redirect_response=False)
+        self.assertEqual(len(self.respondent_queries(ctx.captured_queries)), 1)
+
+    def test_verify_mobile_duplicate_number_uses_latest(self):
+        make_respondent()
+        latest = make_respondent()
+        response = self.client.post(reverse('verify_mobile'), {'mobile_number': latest.mobile_number})
+        self.assertRedirects(response, reverse('download_options', args=[latest.application_id]),
+                             fetch_redirect_response=False)
+
+    def test_verify_mobile_unknown_number(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('verify_mobile'), {'mobile_number': '0000000000'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertEqual(len(self.respondent_queries(ctx.captured_queries)), 1)
+
+    def test_upload_start_single_query(self):
+        respondent = make_respondent()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('upload_start'), {
+                'application_id': respondent.application_id,
+                'mobile_number': respondent.mobile_number,
+            })
+        self.assertRedirects(response, reverse('upload_pdf', args=[respondent.application_id]),
+                             fetch_redirect_response=False)
+        self.assertEqual(len(self.respondent_queries(ctx.captured_queries)), 1)
+
+    def test_upload_start_errors_single_query(self):
+        respondent = make_respondent()
+        for data, field in [
+            ({'application_id': '00000000', 'mobile_number': respondent.mobile_number}, 'application_id'),
+            ({'application_id': respondent.application_id, 'mobile_number': '0000000000'}, 'mobile_number'),
+        ]:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(reverse('upload_start'), data)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(field, response.context['form'].errors)
+            self.assertEqual(len(self.respondent_queries(ctx.captured_queries)), 1)
+
+    def test_download_options_single_query(self):
+        respondent = make_respondent()
+        session = self.client.session
+        session['verified_mobile'] = respondent.mobile_number
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('download_options', args=[respondent.application_id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.respondent_queries(ctx.captured_queries)), 1)
+
+    def test_mobile_lookup_uses_index(self):
+        queryset = Respondent.objects.filter(mobile_number='9876543210').order_by('-id')
+        with connection.cursor() as cursor:
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+        self.assertIn('respondent_mobile_idx', plan)
+
+
+class SessionQueryTests(TestCase):
+    """Page views never query the database for session data"""
+
+    def test_pages_make_no_session_queries(self):
+        respondent = make_respondent()
+        self.client.post(reverse('verify_mobile'), {'mobile_number': respondent.mobile_number})
+        self.client.get(reverse('set_language', args=['ta']))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+            self.assertEqual(self.client.get(reverse('download_options', args=[respondent.application_id])).status_code, 200)
+        session_queries = [q['sql'] for q in ctx.captured_queries if 'django_session' in q['sql']]
+        self.assertEqual(session_queries, [])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class MetricsTests(TestCase):
+    def test_metrics_requires_staff(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_request_latency_and_queries_recorded(self):
+        respondent = make_respondent()
+        self.client.get(reverse('final_page', args=[respondent.application_id]))
+
+        staff = User.objects.create_user('admin', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('metrics'))
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csr_request_duration_seconds_count{view="final_page",method="GET"}', body)
+        self.assertIn('csr_request_db_queries_sum{view="final_page"} 1.0\n', body)
+
+    def test_unknown_methods_share_one_label(self):
+        respondent = make_respondent()
+        for method in ('BREW', 'PROPFIND'):
+            self.client.generic(method, reverse('final_page', args=[respondent.application_id]))
+
+        self.client.force_login(User.objects.create_user('admin', password='pw', is_staff=True))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('csr_request_duration_seconds_count{view="final_page",method="other"} 2', body)
+        self.assertNotIn('BREW', body)
+
+
+class DownloadStateTests(TestCase):
+    """Download clicks are recorded with one conditional, column-scoped UPDATE"""
+
+    def test_full_download_claimed_once(self):
+        respondent = make_respondent()
+        url = reverse('download_full', args=[respondent.application_id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "questionnaire_respondent"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"name"', updates[0])
+
+        self.assertEqual(self.client.get(url).status_code, 403)
+        respondent.refresh_from_db()
+        self.assertTrue(respondent.full_downloaded)
+
+    def test_section_downloads_do_not_overwrite_each_other(self):
+        respondent = make_respondent()
+        for section_key in ('legislative', 'financial'):
+            response = self.client.get(reverse('download_section', args=[respondent.application_id, section_key]))
+            self.assertEqual(response.status_code, 302)
+
+        respondent.refresh_from_db()
+        self.assertEqual(respondent.sections_downloaded, {'legislative': True, 'financial': True})
+
+        response = self.client.get(reverse('download_section', args=[respondent.application_id, 'financial']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_download_unknown_respondent_or_section(self):
+        self.assertEqual(self.client.get(reverse('download_full', args=['00000000'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('download_section', args=['00000000', 'financial'])).status_code, 404)
+        respondent = make_respondent()
+        response = self.client.get(reverse('download_section', args=[respondent.application_id, 'nope']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PDF_RENDER_WORKERS=0)
+class DownloadTokenTests(TestCase):
+    """serve_pdf works from a signed token alone"""
+
+    def trigger_url(self, respondent):
+        self.client.get(reverse('download_section', args=[respondent.application_id, 'financial']))
+        response = self.client.get(reverse('download_trigger_section',
+                                           args=[respondent.application_id, 'section', 'financial']))
+        self.assertEqual(response.status_code, 200)
+        return response.context['download_url']
+
+    def test_serve_pdf_needs_no_queries(self):
+        respondent = make_respondent()
+        url = self.trigger_url(respondent)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertIn(f'CSR_financial_{respondent.application_id}.pdf', response['Content-Disposition'])
+
+    def test_head_answered_without_rendering(self):
+        url = self.trigger_url(make_respondent())
+        with mock.patch('questionnaire.pdf_service.PDFRenderService.arender') as arender:
+            response = self.client.head(url)
+        arender.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['ETag'], self.client.get(url)['ETag'])
+
+    def test_saturated_pool_answers_503(self):
+        url = self.trigger_url(make_respondent())
+        with mock.patch('questionnaire.pdf_service.PDFRenderService.arender', side_effect=RenderQueueFull):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.PDF_RENDER_RETRY_AFTER))
+
+    def test_token_matches_database_render(self):
+        from .pdf import pdf_etag, render_pdf
+
+        respondent = make_respondent()
+        token = make_download_token(respondent, 'full')
+        response = self.client.get(reverse('serve_pdf', args=[token]))
+        self.assertEqual(response['ETag'], pdf_etag(respondent, 'full'))
+        self.assertEqual(response.content, render_pdf(respondent, 'full'))
+
+    def test_token_names_the_pdf_only(self):
+        respondent = make_respondent()
+        token = make_download_token(respondent, 'section', 'financial', language='ta')
+        value = signing.loads(token, salt=SALT)
+        self.assertEqual(value, [respondent.application_id, 'financial', get_questionnaire().version, 'ta'])
+        self.assertLess(len(reverse('serve_pdf', args=[token])), 120)
+        self.assertEqual(read_download_token(make_download_token(respondent, 'full')),
+                         (respondent.application_id, 'full', None, get_questionnaire().version, None))
+
+    def test_any_session_language_survives_the_token(self):
+        respondent = make_respondent()
+        self.client.get(reverse('set_language', args=['pt.BR']))
+        url = self.trigger_url(respondent)
+        self.assertEqual(read_download_token(url.split('/')[-2])[4], 'pt.BR')
+        # No such translation, so the claimed download is rendered in English
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+    def test_header_read_from_database_on_cache_miss(self):
+        from .pdf import pdf_etag
+
+        respondent = make_respondent()
+        url = self.trigger_url(respondent)
+        cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], pdf_etag(respondent, 'section', 'financial'))
+
+        respondent.delete()
+        cache.clear()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_trigger_requires_claimed_download(self):
+        respondent = make_respondent()
+        response = self.client.get(reverse('download_trigger', args=[respondent.application_id, 'full']))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('download_trigger_section',
+                                           args=[respondent.application_id, 'section', 'financial']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_tampered_and_expired_tokens_rejected(self):
+        respondent = make_respondent()
+        token = make_download_token(respondent, 'full')
+        forged = signing.dumps(['12345678', None, 1, None], key='wrong key', salt=SALT)
+        self.assertEqual(self.client.get(reverse('serve_pdf', args=[forged])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('serve_pdf', args=[token[:-2] + 'xx'])).status_code, 404)
+        with override_settings(PDF_DOWNLOAD_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.client.get(reverse('serve_pdf', args=[token])).status_code, 403)
+
+
+class PDFRenderServiceTests(TestCase):
+    """Load shedding and timeouts of the render worker pool"""
+
+    def render_concurrently(self, service, callers, seconds):
+        barrier = threading.Barrier(callers)
+        results = []
+
+        def call():
+            barrier.wait()
+            try:
+                results.append(service.render(seconds, 'full'))
+            except PDFRenderError as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_jobs_beyond_workers_and_queue_are_rejected(self):
+        service = PDFRenderService(workers=1, queue_size=1, timeout=60)
+        self.addCleanup(service.shutdown)
+        with mock.patch('questionnaire.pdf_service._render', slow_render):
+            results = self.render_concurrently(service, 6, 0.5)
+        self.assertEqual(sum(isinstance(result, RenderQueueFull) for result in results), 4)
+        self.assertEqual(results.count(b'%PDF-'), 2)
+
+    def test_timeout_recycles_the_pool(self):
+        service = PDFRenderService(workers=1, queue_size=0, timeout=1)
+        self.addCleanup(service.shutdown)
+        with mock.patch('questionnaire.pdf_service._render', slow_render):
+            with self.assertRaises(RenderTimeout):
+                service.render(600, 'full')
+            # The hung worker is killed, which frees its slot
+            self.assertTrue(service._slots.acquire(timeout=10))
+            service._slots.release()
+            self.assertEqual(service.render(0, 'full'), b'%PDF-')
+
+
+@override_settings(PDF_RENDER_WORKERS=0)
+class ConditionalPDFTests(TestCase):
+    """ETag revalidation and byte ranges on serve_pdf"""
+
+    def setUp(self):
+        token = make_download_token(make_respondent(), 'section', 'financial')
+        self.url = reverse('serve_pdf', args=[token])
+        response = self.client.get(self.url)
+        self.body, self.etag = response.content, response['ETag']
+
+    def test_full_response_and_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), len(self.body))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_byte_ranges(self):
+        size = len(self.body)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.body[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{size}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-100')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.body[-100:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.content, self.body[100:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+        # Ranges that cannot be honoured as one part get the whole document
+        for header in ('bytes=0-1,5-6', 'items=0-1', 'bytes=x-y'):
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, self.body)
+
+    def test_if_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.body)
+
+
+class PDFTemplateTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        template_cache.clear()
+        self.addCleanup(template_cache.clear)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = TemplateCache(2)
+        builds = []
+
+        def builder(key):
+            return lambda: builds.append(key) or key
+
+        cache.get_or_build('a', builder('a'))
+        cache.get_or_build('b', builder('b'))
+        self.assertEqual(cache.get_or_build('a', builder('a')), 'a')
+        cache.get_or_build('c', builder('c'))
+        self.assertEqual(len(cache), 2)
+        # 'b' was the least recently used entry and has to be built again
+        cache.get_or_build('a', builder('a'))
+        cache.get_or_build('b', builder('b'))
+        self.assertEqual(builds, ['a', 'b', 'c', 'b'])
+
+    def test_keyed_by_content_hash_and_pagesize(self):
+        from reportlab.lib.pagesizes import A4
+
+        template = get_full_template()
+        self.assertIs(get_full_template(), template)
+        self.assertIs(get_section_template('financial'), get_section_template('financial'))
+        self.assertIsNot(get_section_template('legislative'), get_section_template('financial'))
+        self.assertEqual(template.version, get_questionnaire().content_hash)
+
+        a4 = get_full_template(A4)
+        self.assertIsNot(a4, template)
+        self.assertNotEqual(a4.pages[0][0].y, template.pages[0][0].y)
+
+        draft = copy_version(QuestionnaireVersion.objects.get(is_active=True))
+        draft.sections.filter(key='legislative').update(title='Lawmaking Powers')
+        publish_version(draft)
+        updated = get_full_template()
+        self.assertIsNot(updated, template)
+        self.assertEqual(updated.version, get_questionnaire().content_hash)
+        self.assertNotEqual(updated.version, template.version)
+
+
+class PDFLayoutTests(TestCase):
+    def test_wrapped_lines_fit(self):
+        from .pdf_layout import text_width, wrap_text
+
+        text = ' '.join(SECTION_B_QUESTIONS['legislative'])
+        lines = wrap_text(text, 'Helvetica', 11, 200)
+        self.assertGreater(len(lines), 10)
+        self.assertEqual(' '.join(lines), ' '.join(text.split()))
+        for line in lines:
+            self.assertLessEqual(text_width(line, 'Helvetica', 11), 200)
+
+    def test_overlong_word_is_hard_broken(self):
+        from .pdf_layout import text_width, wrap_text
+
+        word = 'x' * 43
+        lines = wrap_text(f'short {word} tail', 'Helvetica', 10, 50)
+        self.assertEqual(lines[0], 'short')
+        self.assertTrue(all(lines))
+        self.assertEqual(''.join(lines[1:]).replace(' ', ''), word + 'tail')
+        for line in lines:
+            self.assertLessEqual(text_width(line, 'Helvetica', 10), 50)
+        # The last piece of the word shares its line with the next word
+        self.assertTrue(lines[-1].endswith(' tail'))
+        self.assertEqual(wrap_text(word, 'Helvetica', 10, 1), list(word))
+
+
+class FontRegistryTests(TestCase):
+    def setUp(self):
+        report = mock.patch.dict(font_registry.startup_report)
+        report.start()
+        self.addCleanup(report.stop)
+
+    def test_text_font_loaded_after_builtin_helvetica_was_used(self):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        # Canvases use the built-in Helvetica by default, possibly before
+        # the fonts are loaded
+        pdfmetrics.getFont('Helvetica')
+        with mock.patch.object(font_registry, '_loaded', False), override_settings(PDF_LANGUAGE_FONTS={}), \
+                self.assertNoLogs('questionnaire.font_registry', 'WARNING'):
+            font_registry.ensure_fonts()
+        self.assertIsInstance(pdfmetrics.getFont(font_registry.TEXT_FONT), TTFont)
+        self.assertEqual(font_registry.startup_report['embedded_fonts'], [font_registry.TEXT_FONT])
+        self.assertNotIsInstance(pdfmetrics.getFont('Helvetica'), TTFont)
+
+    def test_missing_font_file_falls_back_to_builtin(self):
+        from reportlab.pdfbase import pdfmetrics
+
+        files = {'Questionnaire-Missing': ('Missing.ttf', 'Helvetica')}
+        with mock.patch.object(font_registry, '_loaded', False), \
+                mock.patch.object(font_registry, 'FONT_FILES', files):
+            font_registry.ensure_fonts()
+        font = pdfmetrics.getFont('Questionnaire-Missing')
+        self.assertEqual(font.face.name, 'Helvetica')
+        self.assertEqual(font_registry.startup_report['embedded_fonts'], [])
+        self.assertEqual(pdfmetrics.stringWidth('abc', 'Questionnaire-Missing', 10),
+                         pdfmetrics.stringWidth('abc', 'Helvetica', 10))
+
+    def test_missing_language_support_is_reported(self):
+        # Loading the fonts, as every render worker does, stays quiet
+        with mock.patch.object(font_registry, '_loaded', False), \
+                self.assertNoLogs('questionnaire.font_registry', 'WARNING'):
+            font_registry.ensure_fonts()
+
+        with self.assertLogs('questionnaire.font_registry', 'WARNING') as logs:
+            font_registry.check_language_support()
+        self.assertEqual(font_registry.startup_report['missing_language_fonts'], ['hi', 'ta'])
+        self.assertIn('hi, ta', logs.output[0])
+
+        with mock.patch.object(font_registry, 'shaping_available', return_value=False), \
+                override_settings(PDF_LANGUAGE_FONTS=TEST_LANGUAGE_FONTS), \
+                self.assertLogs('questionnaire.font_registry', 'WARNING') as logs:
+            font_registry.check_language_support()
+        self.assertEqual(font_registry.startup_report['missing_language_fonts'], [])
+        self.assertFalse(font_registry.startup_report['text_shaping'])
+        self.assertIn('without shaping', logs.output[0])
+
+        with mock.patch.object(font_registry, 'shaping_available', return_value=False), \
+                override_settings(PDF_LANGUAGE_FONTS={}), \
+                self.assertNoLogs('questionnaire.font_registry', 'WARNING'):
+            font_registry.check_language_support()
+
+
+class PDFBenchmarkTests(TestCase):
+    def test_scaled_questions(self):
+        self.assertIs(scaled_questions(1), SECTION_B_QUESTIONS)
+        scaled = scaled_questions(3)
+        self.assertEqual(list(scaled), list(SECTION_B_QUESTIONS))
+        for section_key, questions in SECTION_B_QUESTIONS.items():
+            self.assertEqual(len(scaled[section_key]), 3 * len(questions))
+
+    def test_run_case_reports_pdf(self):
+        result = run_case('section', 'financial', scaled_questions(2), repeat=1)
+        self.assertGreaterEqual(result['pages'], 1)
+        self.assertGreater(result['bytes'], 0)
+        self.assertLess(result['compact_bytes'], result['bytes'])
+        self.assertGreater(result['peak_memory_kb'], 0)
+
+    def test_compare_flags_regressions_only(self):
+        baseline = {'full_1x': {'cold_ms': 100.0, 'warm_ms': 50.0}}
+        results = {'full_1x': {'cold_ms': 110.0, 'warm_ms': 70.0}, 'full_10x': {'cold_ms': 1.0, 'warm_ms': 1.0}}
+        self.assertEqual(compare(results, baseline, 20), [('full_1x', 'warm_ms', 50.0, 70.0, 40.0)])
+        self.assertEqual(compare(results, baseline, 50), [])
+
+
+@override_settings(RESPONSE_PDF_MAX_SIZE=64 * 1024)
+class ResponseUploadTests(TemporaryMediaMixin, TestCase):
+    """Uploads are streamed to a content-addressed file and validated"""
+
+    PDF = b'%PDF-1.4\n' + b'x' * 200_000 + b'\n%%EOF\n'
+
+    def setUp(self):
+        self.respondent = make_respondent()
+        self.client.post(reverse('upload_start'), {
+            'application_id': self.respondent.application_id,
+            'mobile_number': self.respondent.mobile_number,
+        })
+        self.url = reverse('upload_pdf', args=[self.respondent.application_id])
+
+    def upload(self, content, name='response.pdf'):
+        return self.client.post(self.url, {'pdf_file': SimpleUploadedFile(name, content, 'application/pdf')})
+
+    @override_settings(RESPONSE_PDF_MAX_SIZE=1024 * 1024)
+    def test_upload_stored_under_hash_and_deduplicated(self):
+        for _ in range(2):
+            response = self.upload(self.PDF)
+            self.assertRedirects(response, reverse('upload_success', args=[self.respondent.application_id]),
+                                 fetch_redirect_response=False)
+
+        digest = hashlib.sha256(self.PDF).hexdigest()
+        uploads = ResponsePDF.objects.filter(respondent=self.respondent)
+        self.assertEqual(len(uploads), 2)
+        self.assertEqual({u.pdf_file.name for u in uploads}, {f'response_pdfs/{digest[:2]}/{digest[2:4]}/{digest}.pdf'})
+        self.assertEqual({u.sha256 for u in uploads}, {digest})
+        with uploads[0].pdf_file.open('rb') as f:
+            self.assertEqual(f.read(), self.PDF)
+        incoming = os.path.join(settings.MEDIA_ROOT, 'response_pdfs', '.incoming')
+        self.assertEqual(os.listdir(incoming), [])
+
+    def test_non_pdf_rejected(self):
+        response = self.upload(b'GIF89a not a pdf', name='response.pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors['pdf_file'], ["The uploaded file is not a PDF document."])
+        self.assertFalse(ResponsePDF.objects.exists())
+
+    def test_oversized_upload_rejected(self):
+        from django.http import HttpRequest
+
+        # The declared length rules the body out before any of it is read
+        with mock.patch.object(HttpRequest, 'read', autospec=True) as read:
+            response = self.upload(self.PDF)
+        read.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('too large', response.context['form'].errors['pdf_file'][0])
+        self.assertFalse(ResponsePDF.objects.exists())
+
+        # A file over the limit in a body small enough to be read
+        with override_settings(RESPONSE_PDF_MAX_SIZE=150_000):
+            response = self.upload(self.PDF)
+        self.assertIn('too large', response.context['form'].errors['pdf_file'][0])
+        self.assertFalse(ResponsePDF.objects.exists())
+
+    @override_settings(RESPONSE_PDF_MAX_SIZE=1024 * 1024)
+    def test_csrf_checked_before_the_file_is_read(self):
+        from .uploads import ResponsePDFUploadHandler
+
+        client = Client(enforce_csrf_checks=True)
+        client.cookies = self.client.cookies
+
+        def pdf_file():
+            return SimpleUploadedFile('response.pdf', self.PDF, 'application/pdf')
+
+        with mock.patch.object(ResponsePDFUploadHandler, 'receive_data_chunk') as receive:
+            # No CSRF cookie yet
+            self.assertEqual(client.post(self.url, {'pdf_file': pdf_file()}).status_code, 403)
+            token = client.get(self.url).context['csrf_token']
+            response = client.post(self.url, {'csrfmiddlewaretoken': token, 'pdf_file': pdf_file()},
+                                   headers={'Origin': 'https://elsewhere.example'})
+            self.assertEqual(response.status_code, 403)
+        receive.assert_not_called()
+
+        response = client.post(self.url, {'csrfmiddlewaretoken': token, 'pdf_file': pdf_file()})
+        self.assertRedirects(response, reverse('upload_success', args=[self.respondent.application_id]),
+                             fetch_redirect_response=False)
+
+
+class ShardedStorageTests(TemporaryMediaMixin, TestCase):
+    def legacy_upload(self, respondent, filename, content):
+        path = os.path.join(settings.MEDIA_ROOT, 'response_pdfs', filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return ResponsePDF.objects.create(respondent=respondent, pdf_file=f'response_pdfs/{filename}')
+
+    def test_migrate_response_pdfs(self):
+        respondent = make_respondent()
+        first = self.legacy_upload(respondent, 'first.pdf', b'%PDF-1.4 same')
+        second = self.legacy_upload(respondent, 'second.pdf', b'%PDF-1.4 same')
+        other = self.legacy_upload(respondent, 'other.pdf', b'%PDF-1.4 other')
+
+        call_command('migrate_response_pdfs', batch_size=1, stdout=io.StringIO())
+
+        digest = hashlib.sha256(b'%PDF-1.4 same').hexdigest()
+        for response_pdf in (first, second):
+            response_pdf.refresh_from_db()
+            self.assertEqual(response_pdf.pdf_file.name, f'response_pdfs/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+            self.assertEqual(response_pdf.sha256, digest)
+        other.refresh_from_db()
+        with other.pdf_file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 other')
+        self.assertEqual(sorted(os.listdir(os.path.join(settings.MEDIA_ROOT, 'response_pdfs'))),
+                         sorted(['.incoming', digest[:2], other.sha256[:2]]))
+
+
+def filled_pdf(values, keywords=''):
+    """A PDF with text fields filled in, as a viewer would save it"""
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer)
+    p.setKeywords(keywords)
+    p.drawString(50, 750, "Filled questionnaire")
+    for i, (name, value) in enumerate(values.items()):
+        p.acroForm.textfield(name=name, value=value, x=50, y=650 - 60 * i, width=300, height=50)
+    p.save()
+    return buffer.getvalue()
+
+
+class PDFFormTests(TestCase):
+    def parse(self, content, **kwargs):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(content)
+            f.flush()
+            return parse_form(f.name, **kwargs)
+
+    def test_incremental_update(self):
+        from pypdf import PdfReader, PdfWriter
+
+        original = filled_pdf({'answer_0': 'old', 'answer_1': ''})
+        writer = PdfWriter(io.BytesIO(original), incremental=True)
+        writer.update_page_form_field_values(writer.pages[0], {'answer_0': 'new (line)', 'answer_1': 'Hi'},
+                                             auto_regenerate=False)
+        updated = io.BytesIO()
+        writer.write(updated)
+        self.assertTrue(updated.getvalue().startswith(original))
+
+        form = self.parse(updated.getvalue())
+        self.assertEqual(form.fields, {'answer_0': 'new (line)', 'answer_1': 'Hi'})
+        self.assertEqual(PdfReader(io.BytesIO(original)).get_fields()['answer_0']['/V'], 'old')
+
+    def test_reads_generated_questionnaire(self):
+        from .pdf import generate_section_pdf
+
+        form = self.parse(generate_section_pdf(make_respondent(), 'financial'),
+                          markers=['Financial Relations', 'Legislative Relations'])
+        self.assertEqual(set(form.fields), {'answer_0', 'answer_1', 'answer_2'})
+        self.assertEqual(form.markers, {'Financial Relations'})
+        self.assertIn('section:financial', form.keywords)
+        self.assertIn(f'version:{get_questionnaire().version}', form.keywords)
+
+    def test_hostile_input_is_rejected(self):
+        from pypdf import PdfWriter
+        from pypdf.generic import NameObject, StreamObject
+
+        # Unterminated strings used to be rescanned to the end of the file
+        unterminated = b'%PDF-1.7\n' + b'1 0 obj (' * (1024 * 1024 // 9)
+        started = time.perf_counter()
+        with self.assertRaises(PDFFormError):
+            self.parse(unterminated)
+        self.assertLess(time.perf_counter() - started, 5)
+
+        # Page content that decompresses beyond pypdf's limit
+        writer = PdfWriter()
+        page = writer.add_blank_page(100, 100)
+        bomb = StreamObject()
+        bomb.set_data(zlib.compress(b'\0' * 80_000_000))
+        bomb[NameObject('/Filter')] = NameObject('/FlateDecode')
+        page.replace_contents(bomb)
+        content = io.BytesIO()
+        writer.write(content)
+        with self.assertRaises(PDFLimitError):
+            self.parse(content.getvalue(), markers=['Financial Relations'])
+
+        for content in (b'', b'not a pdf', b'%PDF-1.7\n5 0 obj'):
+            with self.assertRaises(PDFFormError):
+                self.parse(content)
+
+    def test_parse_upload_reports_errors(self):
+        from .answer_extraction import parse_upload
+
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(b'%PDF-1.7\n' + b'1 0 obj (' * 1000)
+            f.flush()
+            form, error = parse_upload(f.name, [])
+        self.assertIsNone(form)
+        self.assertTrue(error)
+
+    def test_compact_output_has_the_same_form(self):
+        from .pdf import generate_full_pdf, generate_section_pdf, pdf_etag
+
+        respondent = make_respondent()
+        regular = generate_full_pdf(respondent, compact=False)
+        compact = generate_full_pdf(respondent, compact=True)
+        self.assertLess(len(compact), len(regular))
+        self.assertEqual(self.parse(compact).fields, self.parse(regular).fields)
+        self.assertEqual(self.parse(compact).keywords, self.parse(regular).keywords)
+        # One header XObject plus one appearance shared by every answer box
+        self.assertEqual(compact.count(b'/Subtype /Form'), 2)
+        self.assertNotIn(b'/FontFile', compact)
+        self.assertNotIn(b'ASCII85Decode', compact)
+        self.assertIn(b'/Filter [ /FlateDecode ]', compact)
+        # The ASCII85 choice is per document; regular output keeps it
+        self.assertIn(b'ASCII85Decode', regular)
+        self.assertIn(b'ASCII85Decode', generate_full_pdf(respondent, compact=False))
+
+        form = self.parse(generate_section_pdf(respondent, 'financial', compact=True),
+                          markers=['Financial Relations'])
+        self.assertEqual(form.markers, {'Financial Relations'})
+
+        with override_settings(PDF_COMPACT_OUTPUT=False):
+            etag = pdf_etag(respondent, 'full')
+        self.assertNotEqual(pdf_etag(respondent, 'full'), etag)
+
+
+@override_settings(ANSWER_EXTRACTION_WORKERS=0)
+class AnswerExtractionTests(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        self.respondent = make_respondent()
+
+    def upload(self, content):
+        self.client.post(reverse('upload_start'), {
+            'application_id': self.respondent.application_id,
+            'mobile_number': self.respondent.mobile_number,
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('upload_pdf', args=[self.respondent.application_id]), {
+                'pdf_file': SimpleUploadedFile('response.pdf', content, 'application/pdf'),
+            })
+        self.assertEqual(response.status_code, 302)
+        return ResponsePDF.objects.latest('pk')
+
+    def answers(self):
+        return {(a.section, a.question_index): a.text
+                for a in Answer.objects.filter(respondent=self.respondent)}
+
+    def test_upload_extracts_full_and_section_answers(self):
+        self.upload(filled_pdf({
+            'answer_legislative_0': 'Union, State and Concurrent lists',
+            'answer_financial_articles_1': 'Article 280',
+            'answer_legislative_1': '',
+        }))
+        self.assertEqual(self.answers(), {
+            ('legislative', 0): 'Union, State and Concurrent lists',
+            ('financial_articles', 1): 'Article 280',
+        })
+
+        # A later section upload replaces the earlier answer
+        response_pdf = self.upload(filled_pdf({'answer_0': 'Seventh Schedule'},
+                                              keywords='csr-questionnaire section:legislative'))
+        self.assertEqual(self.answers()[('legislative', 0)], 'Seventh Schedule')
+        self.assertEqual(Answer.objects.get(section='legislative', question_index=0).response_pdf, response_pdf)
+        response_pdf.refresh_from_db()
+        self.assertIsNotNone(response_pdf.answers_extracted_at)
+
+    def test_unknown_section_recorded_as_error(self):
+        response_pdf = self.upload(filled_pdf({'answer_0': 'Orphan answer'}))
+        response_pdf.refresh_from_db()
+        self.assertIn('section', response_pdf.extraction_error)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_answers_use_the_downloaded_version(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        downloaded = get_questionnaire().version
+        draft = copy_version(QuestionnaireVersion.objects.get(is_active=True))
+        draft.sections.filter(key='examples').delete()
+        publish_version(draft)
+
+        # The section no longer exists in the active version
+        self.upload(filled_pdf({'answer_1': 'Old copy'},
+                               keywords=f'csr-questionnaire section:examples version:{downloaded}'))
+        answer = Answer.objects.get(respondent=self.respondent)
+        self.assertEqual((answer.questionnaire_version, answer.section, answer.question_index),
+                         (downloaded, 'examples', 1))
+
+        # Answers to the same question in another version are kept apart
+        self.upload(filled_pdf({'answer_1': 'New copy'},
+                               keywords=f'csr-questionnaire section:financial version:{draft.number}'))
+        self.upload(filled_pdf({'answer_1': 'Old copy'},
+                               keywords=f'csr-questionnaire section:financial version:{downloaded}'))
+        self.assertEqual(
+            set(Answer.objects.filter(section='financial').values_list('questionnaire_version', 'text')),
+            {(draft.number, 'New copy'), (downloaded, 'Old copy')})
+
+        response_pdf = self.upload(filled_pdf({'answer_1': 'Lost'},
+                                              keywords='csr-questionnaire section:financial version:99'))
+        response_pdf.refresh_from_db()
+        self.assertIn('version', response_pdf.extraction_error)
+
+    def test_backfill_command(self):
+        with override_settings(ANSWER_EXTRACTION_WORKERS=1):
+            # Uploaded while extraction was off or broken
+            for section_key in ('financial', 'examples'):
+                self.upload(filled_pdf({'answer_1': f'About {section_key}'},
+                                       keywords=f'csr-questionnaire section:{section_key}'))
+        ResponsePDF.objects.update(answers_extracted_at=None)
+        Answer.objects.all().delete()
+
+        call_command('extract_answers', workers=2, batch_size=1, stdout=io.StringIO())
+        self.assertEqual(self.answers(), {('financial', 1): 'About financial', ('examples', 1): 'About examples'})
+        self.assertFalse(ResponsePDF.objects.filter(answers_extracted_at__isnull=True).exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.chennai = make_respondent(name='Chennai Respondent')
+        self.pune = make_respondent(name='Pune Respondent', state='Maharashtra', profession='Journalists')
+        self.old = make_respondent(name='Old Respondent')
+        Respondent.objects.filter(pk=self.old.pk).update(
+            created_at=datetime.datetime(2024, 1, 15, tzinfo=datetime.timezone.utc))
+        ResponsePDF.objects.create(respondent=self.chennai, pdf_file='response_pdfs/aa/bb/chennai.pdf')
+        ResponsePDF.objects.create(respondent=self.pune, pdf_file='response_pdfs/cc/dd/pune.pdf')
+        self.client.force_login(User.objects.create_user('admin', password='pw', is_staff=True))
+
+    def test_requires_staff(self):
+        self.client.logout()
+        response = self.client.get(reverse('export_data', args=['respondents']))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_filtered_by_state_and_date(self):
+        response = self.client.get(reverse('export_data', args=['respondents']),
+                                   {'state': 'Tamil Nadu', 'date_from': '2024-02-01'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="respondents-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['name'] for row in rows], ['Chennai Respondent'])
+        self.assertEqual(rows[0]['application_id'], self.chennai.application_id)
+        self.assertEqual(rows[0]['full_downloaded'], 'false')
+
+        response = self.client.get(reverse('export_data', args=['respondents']), {'date_to': '2024-01-15'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['name'] for row in rows], ['Old Respondent'])
+
+    def test_csv_formulas_are_escaped(self):
+        for name in ('=HYPERLINK("http://x")', '+1+1', '-2+3', '@SUM(A1)'):
+            make_respondent(name=name, state='Goa')
+        response = self.client.get(reverse('export_data', args=['respondents']), {'state': 'Goa'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['name'] for row in rows],
+                         ["'=HYPERLINK(\"http://x\")", "'+1+1", "'-2+3", "'@SUM(A1)"])
+
+        response = self.client.get(reverse('export_data', args=['respondents']),
+                                   {'state': 'Goa', 'format': 'jsonl'})
+        first = json.loads(b''.join(response.streaming_content).splitlines()[0])
+        self.assertEqual(first['name'], '=HYPERLINK("http://x")')
+
+    def test_jsonl_responses_joined_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('export_data', args=['responses']),
+                                       {'format': 'jsonl', 'profession': 'Journalists'})
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        selects = [q for q in ctx.captured_queries if 'questionnaire_responsepdf' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['application_id'], self.pune.application_id)
+        self.assertEqual(rows[0]['pdf_file'], 'response_pdfs/cc/dd/pune.pdf')
+        self.assertIs(rows[0]['is_verified'], False)
+
+    def test_invalid_filters(self):
+        response = self.client.get(reverse('export_data', args=['respondents']),
+                                   {'profession': 'Astronaut', 'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'profession', 'format'})
+        response = self.client.get(reverse('export_data', args=['everything']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='admin'))
+        response = await self.async_client.get(reverse('export_data', args=['respondents']),
+                                               {'format': 'jsonl'})
+        self.assertTrue(response.is_async)
+        lines = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(b''.join(lines).decode().splitlines()), 3)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_data', 'responses', state='Maharashtra', chunk_size=1, stdout=out)
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['name'] for row in rows], ['Pune Respondent'])
+
+
+IMPORT_CSV = """Name,Gender,Mobile Number,Email,State,Place of Residence,Profession,Specialization
+Asha Rao,female,9000000001,,Karnataka,Mysuru,Academician,Economics
+Vikram Das,Male,9000000002,vikram@example.com,Odisha,Cuttack,journalists,Political Science
+Bad Row,Robot,9000000003,not-an-email,Goa,Panaji,Astronaut,Economics
+Meena Iyer,Female,9000000004,,Kerala,Kochi,Scholars,Other
+"""
+
+
+class RespondentImportTests(TestCase):
+    def write_csv(self, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'partners.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_command_imports_valid_rows_in_batches(self):
+        path = self.write_csv(IMPORT_CSV)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('import_respondents', path, batch_size=2, stdout=io.StringIO())
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "questionnaire_respondent"')]
+        self.assertEqual(len(inserts), 2)
+
+        respondents = {r.name: r for r in Respondent.objects.all()}
+        self.assertEqual(set(respondents), {'Asha Rao', 'Vikram Das', 'Meena Iyer'})
+        self.assertEqual(respondents['Asha Rao'].gender, 'Female')
+        self.assertIsNone(respondents['Asha Rao'].email)
+        self.assertEqual(respondents['Vikram Das'].profession, 'Journalists')
+        app_ids = {r.application_id for r in respondents.values()}
+        self.assertEqual(len(app_ids), 3)
+        self.assertTrue(all(len(app_id) == 8 and app_id.isdigit() for app_id in app_ids))
+
+        with open(f'{path}.errors.csv', encoding='utf-8') as f:
+            report = list(csv.DictReader(f))
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['line'], '4')
+        self.assertEqual(report[0]['name'], 'Bad Row')
+        for column in ('gender', 'email', 'profession'):
+            self.assertIn(f'{column}:', report[0]['errors'])
+
+    def test_dry_run_and_missing_columns(self):
+        call_command('import_respondents', self.write_csv(IMPORT_CSV), dry_run=True, stdout=io.StringIO())
+        self.assertFalse(Respondent.objects.exists())
+        with self.assertRaisesMessage(CommandError, 'Missing column(s): profession'):
+            call_command('import_respondents', self.write_csv(IMPORT_CSV.replace('Profession,', '')),
+                         stdout=io.StringIO())
+
+    def test_admin_upload_returns_error_report(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        url = reverse('admin:questionnaire_respondent_import')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        response = self.client.post(url, {'csv_file': SimpleUploadedFile('partners.csv', IMPORT_CSV.encode())})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('Bad Row', response.content.decode())
+        self.assertEqual(Respondent.objects.count(), 3)
+
+        clean = IMPORT_CSV.replace('Robot', 'Male').replace('not-an-email', '').replace('Astronaut', 'Others')
+        response = self.client.post(url, {'csv_file': SimpleUploadedFile('partners.csv', clean.encode('utf-8-sig'))})
+        self.assertRedirects(response, reverse('admin:questionnaire_respondent_changelist'))
+        self.assertEqual(Respondent.objects.count(), 7)
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        self.respondents = [make_respondent(name=f'Respondent {i}', mobile_number=f'98000000{i:02d}')
+                            for i in range(5)]
+        for respondent in self.respondents:
+            ResponsePDF.objects.create(respondent=respondent, pdf_file='response_pdfs/x.pdf')
+
+    def changelist(self, model, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f'admin:questionnaire_{model}_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_response_list_has_no_n_plus_one_or_full_count(self):
+        response, queries = self.changelist('responsepdf')
+        self.assertContains(response, 'Respondent 4')
+        self.assertFalse([sql for sql in queries if 'FROM "questionnaire_respondent"' in sql])
+        self.assertFalse([sql for sql in queries if sql.startswith('SELECT COUNT(*) AS "__count" FROM "questionnaire_responsepdf"')])
+
+        ResponsePDF.objects.create(respondent=self.respondents[0], pdf_file='response_pdfs/y.pdf')
+        _, more_queries = self.changelist('responsepdf')
+        self.assertEqual(len(more_queries), len(queries))
+
+    def test_search_is_an_index_range(self):
+        target = self.respondents[3]
+        response, queries = self.changelist('respondent', {'q': target.application_id[:5]})
+        self.assertContains(response, target.name)
+        search = [sql for sql in queries if 'questionnaire_respondent"."application_id" >=' in sql]
+        self.assertTrue(search)
+        self.assertNotIn('LIKE', search[-1])
+
+        response, _ = self.changelist('respondent', {'q': '9800000002'})
+        self.assertContains(response, 'Respondent 2')
+        self.assertNotContains(response, 'Respondent 3')
+
+        response, _ = self.changelist('responsepdf', {'q': target.application_id})
+        self.assertContains(response, target.name)
+
+    def test_prefix_without_a_following_character(self):
+        from .admin import prefix_filter
+
+        self.assertEqual(prefix_filter('name', 'ab'), Q(name__gte='ab', name__lt='ac'))
+        for term in ('a\U0010ffff', '\ud7ff'):
+            self.assertEqual(prefix_filter('name', term), Q(name__startswith=term))
+        respondent = make_respondent(name='Edge \U0010ffff case')
+        self.assertEqual(list(Respondent.objects.filter(prefix_filter('name', 'Edge \U0010ffff'))), [respondent])
+
+    def test_filters_and_estimated_count(self):
+        from .admin import EstimatedCountPaginator
+
+        Respondent.objects.filter(pk=self.respondents[0].pk).update(state='Kerala')
+        response, _ = self.changelist('respondent', {'state': 'Kerala'})
+        self.assertContains(response, 'Respondent 0')
+        self.assertNotContains(response, 'Respondent 1')
+        response, _ = self.changelist('responsepdf', {'is_verified__exact': '0'})
+        self.assertContains(response, 'Respondent 1')
+
+        class SmallPaginator(EstimatedCountPaginator):
+            COUNT_LIMIT = 2
+
+        respondents = Respondent.objects.order_by('pk')
+        self.assertEqual(SmallPaginator(respondents, 1).count, self.respondents[-1].pk)
+        self.assertEqual(SmallPaginator(respondents.filter(state='Tamil Nadu'), 1).count, 2)
+
+
+@override_settings(ANSWER_EXTRACTION_WORKERS=0)
+class AnalyticsTests(TemporaryMediaMixin, TestCase):
+    def summary(self):
+        return {
+            (row.state, row.profession, row.specialization, row.gender):
+                (row.respondents, row.full_downloads, row.section_downloads, row.uploads, row.verified_uploads)
+            for row in AnalyticsSummary.objects.all()
+        }
+
+    def register(self, **fields):
+        data = {
+            'name': 'Analytics Respondent', 'gender': 'Male', 'mobile_number': '9123456780',
+            'state': 'Kerala', 'place_of_residence': 'Kochi', 'profession': 'Scholars',
+            'specialization': 'Economics', **fields,
+        }
+        response = self.client.post(reverse('section_a'), data)
+        self.assertRedirects(response, reverse('home'))
+        return Respondent.objects.get(mobile_number=data['mobile_number'])
+
+    def test_events_update_summary_and_rebuild_matches(self):
+        first = self.register()
+        self.register(mobile_number='9123456781')
+        other = self.register(mobile_number='9123456782', state='Goa', gender='Female')
+
+        self.client.get(reverse('download_full', args=[first.application_id]))
+        self.client.get(reverse('download_full', args=[first.application_id]))  # already claimed
+        for section_key in ('legislative', 'financial', 'financial'):
+            self.client.get(reverse('download_section', args=[other.application_id, section_key]))
+
+        self.client.post(reverse('upload_start'), {
+            'application_id': first.application_id, 'mobile_number': first.mobile_number,
+        })
+        self.client.post(reverse('upload_pdf', args=[first.application_id]), {
+            'pdf_file': SimpleUploadedFile('response.pdf', b'%PDF-1.4 analytics', 'application/pdf'),
+        })
+        response_pdf = ResponsePDF.objects.get()
+        for _ in range(2):
+            self.client.get(reverse('verify_response', args=[response_pdf.verification_code]))
+
+        expected = {
+            ('Kerala', 'Scholars', 'Economics', 'Male'): (2, 1, 0, 1, 1),
+            ('Goa', 'Scholars', 'Economics', 'Female'): (1, 0, 2, 0, 0),
+        }
+        self.assertEqual(self.summary(), expected)
+
+        AnalyticsSummary.objects.all().delete()
+        call_command('rebuild_analytics', stdout=io.StringIO())
+        self.assertEqual(self.summary(), expected)
+
+    def test_download_counted_in_one_update(self):
+        from . import analytics
+
+        respondent = self.register()
+        with self.assertNumQueries(1):
+            analytics.record_download(respondent.application_id, full=True)
+        # A respondent without a summary row yet gets one
+        other = make_respondent(state='Goa', profession='Scholars', specialization='Economics')
+        analytics.record_download(other.application_id, full=False)
+        self.assertEqual(self.summary(), {
+            ('Kerala', 'Scholars', 'Economics', 'Male'): (1, 1, 0, 0, 0),
+            ('Goa', 'Scholars', 'Economics', 'Female'): (0, 0, 1, 0, 0),
+        })
+
+    def test_import_counts_registrations(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'partners.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(IMPORT_CSV)
+        call_command('import_respondents', path, stdout=io.StringIO())
+        self.assertEqual(sum(row[0] for row in self.summary().values()), 3)
+
+    def test_dashboard_reads_only_the_summary(self):
+        self.register()
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:questionnaire_analyticssummary_changelist'))
+        self.assertContains(response, 'Kerala')
+        self.assertEqual(response.context['totals']['respondents'], 1)
+        self.assertFalse([q for q in ctx.captured_queries
+                          if 'questionnaire_respondent"' in q['sql'] or 'questionnaire_responsepdf' in q['sql']])
+
+
+@override_settings(PDF_RENDER_WORKERS=0, QUESTIONNAIRE_REFRESH_INTERVAL=3600)
+class QuestionnaireDefinitionTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.respondent = make_respondent()
+
+    def definition_queries(self, queries):
+        return [q['sql'] for q in queries if 'questionnaire_questionnaire' in q['sql']]
+
+    def new_version(self, title='Legislative Powers', drop_section='examples'):
+        draft = copy_version(QuestionnaireVersion.objects.get(is_active=True))
+        draft.sections.filter(key='legislative').update(title=title)
+        draft.sections.filter(key=drop_section).delete()
+        return draft
+
+    def test_seeded_from_constants_and_compiled_once(self):
+        questionnaire = get_questionnaire()
+        self.assertEqual(questionnaire.version, 1)
+        self.assertEqual({key: list(q) for key, q in questionnaire.questions.items()}, SECTION_B_QUESTIONS)
+        self.assertEqual(dict(questionnaire.titles), SECTION_TITLES)
+        with self.assertRaises(AttributeError):
+            questionnaire.version = 2
+        with self.assertRaises(TypeError):
+            questionnaire.questions['legislative'] = []
+
+        url = reverse('section_b', args=[self.respondent.application_id])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(self.definition_queries(ctx.captured_queries), [])
+        self.assertContains(response, 'Articles Related to Financial Relations')
+        self.assertContains(response, f'{questionnaire.total_questions} Total Questions')
+
+    def test_new_version_is_picked_up_by_number(self):
+        self.assertEqual(get_questionnaire().version, 1)
+        draft = self.new_version()
+        # Activated by another process: seen once the refresh interval is up
+        QuestionnaireVersion.objects.update(is_active=False)
+        QuestionnaireVersion.objects.filter(pk=draft.pk).update(is_active=True, published_at=draft.created_at)
+        self.assertEqual(get_questionnaire().version, 1)
+        with override_settings(QUESTIONNAIRE_REFRESH_INTERVAL=0):
+            self.assertEqual(get_questionnaire().version, draft.number)
+
+    def test_links_keep_the_version_they_were_issued_for(self):
+        from .pdf import render_pdf
+
+        self.client.get(reverse('download_section', args=[self.respondent.application_id, 'legislative']))
+        response = self.client.get(reverse('download_trigger_section',
+                                           args=[self.respondent.application_id, 'section', 'legislative']))
+        old_url = response.context['download_url']
+        old_etag = self.client.get(old_url)['ETag']
+
+        publish_version(self.new_version())
+        response = self.client.get(old_url)
+        self.assertEqual(response['ETag'], old_etag)
+        self.assertEqual(response.content, render_pdf(self.respondent, 'section', 'legislative', version=1))
+
+        response = self.client.get(reverse('section_b', args=[self.respondent.application_id]))
+        self.assertContains(response, 'Legislative Powers')
+        self.assertNotContains(response, 'Specific Examples')
+        response = self.client.get(reverse('download_section', args=[self.respondent.application_id, 'examples']))
+        self.assertEqual(response.status_code, 404)
+
+        token = make_download_token(self.respondent, 'section', 'legislative')
+        self.assertNotEqual(self.client.get(reverse('serve_pdf', args=[token]))['ETag'], old_etag)
+
+    def test_published_versions_are_read_only_in_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='pw'))
+        active = QuestionnaireVersion.objects.get(is_active=True)
+        url = reverse('admin:questionnaire_questionnaireversion_change', args=[active.pk])
+        self.client.post(url, {'number': 1, 'note': 'Edited'})
+        active.refresh_from_db()
+        self.assertEqual(active.note, 'Initial questionnaire')
+
+        changelist = reverse('admin:questionnaire_questionnaireversion_changelist')
+        self.client.post(changelist, {'action': 'copy_as_draft', '_selected_action': [active.pk]})
+        draft = QuestionnaireVersion.objects.get(number=2)
+        self.assertEqual(draft.sections.count(), len(SECTION_B_QUESTIONS))
+        self.client.post(changelist, {'action': 'publish', '_selected_action': [draft.pk]})
+        self.assertEqual(get_questionnaire().version, 2)
+
+
+TEST_LANGUAGE_FONTS = {'ta': ('Helvetica.ttf', 'Helvetica.ttf')}
+
+
+@override_settings(PDF_RENDER_WORKERS=0, QUESTIONNAIRE_REFRESH_INTERVAL=3600,
+                   PDF_LANGUAGE_FONTS=TEST_LANGUAGE_FONTS)
+class PDFLanguageTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.respondent = make_respondent()
+        # Latin "translations", so the bundled font has the glyphs
+        draft = copy_version(QuestionnaireVersion.objects.get(is_active=True))
+        section = draft.sections.get(key='legislative')
+        section.title_translations = {'ta': 'Pouvoirs legislatifs'}
+        section.save()
+        section.questions.filter(position=0).update(translations={'ta': 'Premiere question traduite'})
+        publish_version(draft)
+
+    def download_url(self, language):
+        self.client.get(reverse('set_language', args=[language]))
+        self.client.get(reverse('download_section', args=[self.respondent.application_id, 'legislative']))
+        response = self.client.get(reverse('download_trigger_section',
+                                           args=[self.respondent.application_id, 'section', 'legislative']))
+        return response.context['download_url']
+
+    def test_translation_compiled_with_its_version(self):
+        questionnaire = get_questionnaire()
+        translated = questionnaire.in_language('ta')
+        self.assertEqual(translated.language, 'ta')
+        self.assertEqual(translated.titles['legislative'], 'Pouvoirs legislatifs')
+        self.assertEqual(translated.questions['legislative'][0], 'Premiere question traduite')
+        # Untranslated text stays English
+        self.assertEqual(translated.questions['legislative'][1], questionnaire.questions['legislative'][1])
+        self.assertEqual(translated.titles['financial'], questionnaire.titles['financial'])
+        self.assertNotEqual(translated.content_hash, questionnaire.content_hash)
+        self.assertIs(questionnaire.in_language('hi'), questionnaire)
+
+    def test_language_pdf_is_laid_out_once(self):
+        from .pdf import render_pdf
+
+        url = self.download_url('ta')
+        self.assertNotIn('ta', font_registry._language_fonts)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(font_registry._language_fonts['ta'].title, 'Questionnaire-ta-Bold')
+        body = response.content
+        self.assertEqual(body, render_pdf(self.respondent, 'section', 'legislative', language='ta'))
+        self.assertNotEqual(body, render_pdf(self.respondent, 'section', 'legislative'))
+        self.assertNotEqual(response['ETag'], self.client.get(self.download_url('en'))['ETag'])
+
+        cached = len(template_cache)
+        self.client.get(self.download_url('ta'))
+        self.assertEqual(len(template_cache), cached)
+
+    def test_language_without_fonts_falls_back_to_english(self):
+        from .pdf import render_pdf
+
+        english = render_pdf(self.respondent, 'section', 'legislative')
+        with override_settings(PDF_LANGUAGE_FONTS={}):
+            self.assertEqual(render_pdf(self.respondent, 'section', 'legislative', language='ta'), english)
+            self.assertEqual(render_pdf(self.respondent, 'section', 'legislative', language='xx'), english)
+
+    def test_long_words_break_between_clusters(self):
+        from .pdf_layout import _clusters, _split_long_word
+
+        self.assertEqual(_clusters('தமிழ்'), ['த', 'மி', 'ழ்'])
+        self.assertEqual(_clusters('க்ஷ'), ['க்ஷ'])
+        self.assertEqual(_clusters('हिन्दी'), ['हि', 'न्दी'])
+        self.assertEqual(_split_long_word('abcdef', 'Helvetica', 10, 12), ['ab', 'cd', 'ef'])
+
+
+class SQLiteConcurrencyTests(TransactionTestCase):
+    """Parallel registrations and downloads must not hit 'database is locked'"""
+
+    THREADS = 8
+    ROUNDS = 10
+
+    def test_parallel_registrations_and_downloads(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+        respondents = [make_respondent(mobile_number=f'90000000{i:02d}') for i in range(self.THREADS)]
+        section_keys = list(SECTION_B_QUESTIONS)
+        errors = []
+        start = threading.Barrier(self.THREADS)
+
+        def worker(index):
+            client = Client()
+            respondent = respondents[index]
+            try:
+                start.wait()
+                for round_no in range(self.ROUNDS):
+                    response = client.post(reverse('section_a'), {
+                        'name': f'Parallel {index}-{round_no}',
+                        'gender': 'Male',
+                        'mobile_number': f'8{index:02d}{round_no:07d}',
+                        'state': 'Kerala',
+                        'place_of_residence': 'Kochi',
+                        'profession': 'Researchers',
+                        'specialization': 'Economics',
+                    })
+                    if response.status_code != 302:
+                        errors.append(f'registration returned {response.status_code}')
+                    section_key = section_keys[round_no % len(section_keys)]
+                    client.get(reverse('download_section', args=[respondent.application_id, section_key]))
+                    client.get(reverse('download_full', args=[respondent.application_id]))
+                    client.post(reverse('verify_mobile'), {'mobile_number': respondent.mobile_number})
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Respondent.objects.filter(name__startswith='Parallel').count(), self.THREADS * self.ROUNDS)
+        ids = Respondent.objects.values_list('application_id', flat=True)
+        self.assertEqual(len(set(ids)), len(ids))
+        for respondent in respondents:
+            respondent.refresh_from_db()
+            self.assertTrue(respondent.full_downloaded)
+            self.assertEqual(len(respondent.sections_downloaded), min(self.ROUNDS, len(section_keys)))
+
+
+@override_settings(PDF_RENDER_WORKERS=0)
+class LoadTestHarnessTests(TemporaryMediaMixin, LiveServerTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_journeys_complete_without_errors(self):
+        errors = []
+        results = run_load_test(self.live_server_url, users=2, journeys=1, steps=4, seed=1,
+                                mix={'section_pdf': 1, 'full_pdf': 1, 'upload': 1}, errors=errors)
+        self.assertEqual(errors, [])
+        self.assertEqual(results['total']['journeys'], 2)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertEqual(results['endpoints']['POST section_a']['requests'], 2)
+        self.assertEqual(Respondent.objects.count(), 2)
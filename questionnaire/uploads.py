@@ -0,0 +1,121 @@
+"""
+Streaming upload of response PDFs.
+
+ResponsePDFUploadHandler replaces Django's default upload handlers on the
+upload form. Each chunk is written to a temp file next to its final
+location and fed to SHA-256 as it arrives, so memory use does not depend on
+the file size. A file that is larger than RESPONSE_PDF_MAX_SIZE, or that
+does not start with %PDF-, is dropped as soon as that is known. On save,
+the content-addressed storage renames the file into place under its hash
+(see storage.py), so uploading the same bytes again stores nothing new.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from .storage import response_pdf_storage
+
+PDF_MAGIC = b'%PDF-'
+UPLOAD_DIR = 'response_pdfs'
+
+# Room for the form fields and multipart framing around the file itself
+FORM_OVERHEAD = 64 * 1024
+
+
+def max_upload_size():
+    return getattr(settings, 'RESPONSE_PDF_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def request_too_large(request):
+    """
+    Whether the declared body size rules out an acceptable file. Checked
+    before anything reads request.POST or request.FILES, so such a body is
+    never read; the upload handler still enforces the limit on bodies that
+    declare no length or a false one.
+    """
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    return content_length > max_upload_size() + FORM_OVERHEAD
+
+
+def too_large_message():
+    return f"The file is too large. The maximum size is {max_upload_size() // (1024 * 1024)} MB."
+
+
+NOT_PDF_MESSAGE = "The uploaded file is not a PDF document."
+
+
+class HashedPDFUpload(TemporaryUploadedFile):
+    """Upload streamed to disk, with the SHA-256 of its content"""
+
+    def __init__(self, name, content_type, charset, content_type_extra=None):
+        # Created where the storage keeps its temp files, so saving it is a rename
+        file = tempfile.NamedTemporaryFile(
+            suffix='.upload', dir=response_pdf_storage.incoming_path(UPLOAD_DIR))
+        UploadedFile.__init__(self, file, name, content_type, 0, charset, content_type_extra)
+        self.sha256 = None
+
+
+class ResponsePDFUploadHandler(FileUploadHandler):
+    """Stream the pdf_file field to disk, hashing and validating on the way"""
+
+    field_name = 'pdf_file'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_size = max_upload_size()
+        self.error = None
+        self.upload = None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != self.field_name:
+            raise SkipFile()
+        self.upload = HashedPDFUpload(file_name, self.content_type, self.charset, self.content_type_extra)
+        self._hasher = hashlib.sha256()
+        self._head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += raw_data[:len(PDF_MAGIC) - len(self._head)]
+            if not PDF_MAGIC.startswith(self._head):
+                self._reject(NOT_PDF_MESSAGE)
+        if start + len(raw_data) > self.max_size:
+            self._reject(too_large_message())
+        self._hasher.update(raw_data)
+        self.upload.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.upload is None:
+            return None
+        if self._head != PDF_MAGIC:
+            self.error = NOT_PDF_MESSAGE
+            self._discard()
+            return None
+
+        # Flushed to disk before the storage renames it into place
+        self.upload.flush()
+        os.fsync(self.upload.fileno())
+        self.upload.seek(0)
+        self.upload.size = file_size
+        self.upload.sha256 = self._hasher.hexdigest()
+        return self.upload
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def _reject(self, message):
+        self.error = message
+        self._discard()
+        raise SkipFile()
+
+    def _discard(self):
+        if self.upload is not None:
+            self.upload.close()
+            self.upload = None
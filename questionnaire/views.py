@@ -1,28 +1,47 @@
 import os
 import uuid
-from io import BytesIO
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404, HttpResponseRedirect
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.http import (
+    HttpResponse, Http404, HttpResponseRedirect, JsonResponse, StreamingHttpResponse,
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header
 from .models import Respondent
 from .forms import RespondentForm
-from .constants import SECTION_B_QUESTIONS
+from .definitions import UnknownQuestionnaireVersion, aget_questionnaire, get_questionnaire
+from .db_functions import JSONSetKey
+from .uploads import ResponsePDFUploadHandler, request_too_large, too_large_message
+from .answer_extraction import schedule_extraction
+from .download_tokens import (
+    ExpiredDownloadToken, InvalidDownloadToken, aget_header_respondent, make_download_token,
+    read_download_token,
+)
 from django.urls import reverse
 from django.conf import settings
+from django.db import transaction
 import tempfile
 import shutil
-from .forms import UploadVerificationForm, ResponseUploadForm
+from .forms import ExportFilterForm, UploadVerificationForm, ResponseUploadForm
 from .models import ResponsePDF
 from django.contrib import messages
 import random
 import logging
+import time
+from django.contrib.admin.views.decorators import staff_member_required
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from . import analytics, exports, metrics
 
 logger = logging.getLogger(__name__)
 
+async def _arender(request, template_name, context=None):
+    """render() for async views; base.html reads the session, so load it first"""
+    await request.session.aget('language')
+    return render(request, template_name, context)
+
 def home(request):
     return render(request, 'questionnaire/home.html')
 
@@ -35,7 +54,9 @@ def section_a(request):
     if request.method == 'POST':
         form = RespondentForm(request.POST)
         if form.is_valid():
-            respondent = form.save()
+            with transaction.atomic():
+                respondent = form.save()
+                analytics.record_registrations([respondent])
             messages.success(request, "Registration successful! You can now access the questionnaire.")
             return redirect('home')
     else:
@@ -44,319 +65,93 @@ def section_a(request):
 
 
 
-def download_options(request, application_id):
+async def download_options(request, application_id):
     # Validate application ID format
     if not (application_id.isdigit() and len(application_id) == 8):
         raise Http404("Invalid application ID format")
     # Check mobile verification
-    verified_mobile = request.session.get('verified_mobile')
+    verified_mobile = await request.session.aget('verified_mobile')
     if not verified_mobile:
         messages.error(request, "Mobile verification required")
         return redirect('home')
     
-    respondent = get_object_or_404(Respondent, application_id=application_id)
+    respondent = await aget_object_or_404(Respondent, application_id=application_id)
     
     # Verify mobile matches respondent
     if respondent.mobile_number != verified_mobile:
         messages.error(request, "Mobile number doesn't match registration")
         return redirect('home')
     
-    return render(request, 'questionnaire/download_options.html', {
+    return await _arender(request, 'questionnaire/download_options.html', {
         'respondent': respondent
     })
 
 
-def verify_mobile(request):
+async def verify_mobile(request):
     if request.method == 'POST':
         mobile_number = request.POST.get('mobile_number')
         
-        try:
-            respondent = Respondent.objects.get(mobile_number=mobile_number)
-            request.session['verified_mobile'] = mobile_number
-            return redirect('download_options', application_id=respondent.application_id)
-            
-        except Respondent.DoesNotExist:
-            messages.error(request, "No registration found with this mobile number. Please check your number or register first.")
+        # One indexed query; if a number was registered more than once the
+        # latest registration wins
+        application_id = await (
+            Respondent.objects.filter(mobile_number=mobile_number)
+            .order_by('-id')
+            .values_list('application_id', flat=True)
+            .afirst()
+        )
+        if application_id is not None:
+            await request.session.aset('verified_mobile', mobile_number)
+            return redirect('download_options', application_id=application_id)
+        
+        messages.error(request, "No registration found with this mobile number. Please check your number or register first.")
     
     return redirect('home')
 
-def section_b(request, application_id):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
-    
-    sections = [
-        {'name': 'Legislative Relations', 'key': 'legislative'},
-        {'name': 'Administrative Relations', 'key': 'administrative'},
-        {'name': 'Financial Relations', 'key': 'financial'},
-        {'name': 'Role of Commissions and Councils', 'key': 'commissions'},
-        {'name': 'Constitutional and Judicial Influences', 'key': 'constitutional'},
-        {'name': 'Challenges and Issues', 'key': 'challenges'},
-        {'name': 'Specific Examples', 'key': 'examples'},
-        {'name': 'Important Articles', 'key': 'articles'},
-        {'name': 'Articles Related to Financial Relations', 'key': 'financial_articles'},
-    ]
+async def section_b(request, application_id):
+    respondent = await aget_object_or_404(Respondent, application_id=application_id)
+    # Compiled once per process; sections, titles and counts are precomputed
+    questionnaire = await aget_questionnaire()
     
-    # Add question count and download status to each section
-    for section in sections:
-        section_key = section['key']
-        section['count'] = len(SECTION_B_QUESTIONS.get(section_key, []))
-        section['downloaded'] = section_key in respondent.sections_downloaded
-    
-    return render(request, 'questionnaire/section_b.html', {
+    return await _arender(request, 'questionnaire/section_b.html', {
         'respondent': respondent,
-        'sections': sections
+        'sections': questionnaire.sections,
+        'full_questions_count': questionnaire.total_questions,
     })
 
-def generate_full_pdf(respondent):
-    """Helper function to generate full PDF content"""
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Set up fonts
-    try:
-        font_path = os.path.join(os.path.dirname(__file__), 'fonts/Helvetica.ttf')
-        pdfmetrics.registerFont(TTFont('Helvetica', font_path))
-        pdfmetrics.registerFont(TTFont('Helvetica-Bold', font_path))
-        title_font = "Helvetica-Bold"
-        text_font = "Helvetica"
-    except:
-        title_font = "Helvetica-Bold"
-        text_font = "Helvetica"
-    
-    # Title on first page
-    p.setFont(title_font, 16)
-    p.drawCentredString(width/2, height-50, "Union-State Relations Questionnaire - Full")
-    
-    # Respondent info and Application ID
-    p.setFont(text_font, 10)
-    respondent_info = (
-        f"Name: {respondent.name} | Profession: {respondent.get_profession_display()} | "
-        f"Specialization: {respondent.get_specialization_display()} | "
-        f"State: {respondent.state} | Date: {respondent.created_at.strftime('%d-%m-%Y')}"
-    )
-    p.drawString(50, height-80, respondent_info)
-    
-    app_id_text = f"Application ID: {respondent.application_id}"
-    p.drawString(50, height-100, app_id_text)
-    
-    form = p.acroForm
-    y_position = height - 130  # Start below header
-    section_keys = list(SECTION_B_QUESTIONS.keys())
-    
-    for section_idx, section_key in enumerate(section_keys):
-        section_number = section_idx + 1
-        questions = SECTION_B_QUESTIONS[section_key]
-        
-        # Section header
-        p.setFont(title_font, 14)
-        section_title = section_key.replace('_', ' ').title()
-        p.drawString(50, y_position, f"{section_number}. {section_title}")
-        y_position -= 30
-        
-        for q_idx, question in enumerate(questions):
-            # Question text
-            p.setFont(title_font, 11)
-            question_text = f"{q_idx+1}. {question}"
-            
-            # Wrap text
-            max_width = width - 100
-            words = question_text.split()
-            lines = []
-            current_line = []
-            
-            for word in words:
-                test_line = ' '.join(current_line + [word])
-                if p.stringWidth(test_line, title_font, 11) <= max_width:
-                    current_line.append(word)
-                else:
-                    lines.append(' '.join(current_line))
-                    current_line = [word]
-            
-            if current_line:
-                lines.append(' '.join(current_line))
-            
-            # Draw question
-            text_y = y_position
-            for line in lines:
-                p.drawString(50, text_y, line)
-                text_y -= 15
-            
-            # Create fillable field
-            field_name = f"answer_{section_key}_{q_idx}"
-            field_height = 80
-            form.textfield(
-                name=field_name,
-                tooltip=f"Answer for question {section_number}.{q_idx+1}",
-                x=50,
-                y=text_y - field_height - 10,
-                width=width-100,
-                height=field_height,
-                borderColor=colors.black,
-                fillColor=colors.white,
-                textColor=colors.black,
-                fontSize=10,
-                borderWidth=1,
-                fieldFlags=4096  # Multi-line flag
-            )
-            
-            y_position = text_y - field_height - 40
-            
-            # Page break if needed
-            if y_position < 100 and (section_idx < len(section_keys)-1 or q_idx < len(questions)-1):
-                p.showPage()
-                y_position = height - 50
-                # Simplified header for subsequent pages
-                p.setFont(title_font, 16)
-                p.drawCentredString(width/2, y_position, "Union-State Relations Questionnaire - Full")
-                y_position -= 50
-                p.setFont(text_font, 10)
-                p.drawString(50, y_position, app_id_text)
-                y_position -= 30
-    
-    p.save()
-    return buffer.getvalue()
-
-def generate_section_pdf(respondent, section_key):
-    """Helper function to generate section PDF content"""
-    questions = SECTION_B_QUESTIONS.get(section_key, [])
-    
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    # Set up fonts
-    try:
-        font_path = os.path.join(os.path.dirname(__file__), 'fonts/Helvetica.ttf')
-        pdfmetrics.registerFont(TTFont('Helvetica', font_path))
-        pdfmetrics.registerFont(TTFont('Helvetica-Bold', font_path))
-        title_font = "Helvetica-Bold"
-        text_font = "Helvetica"
-    except:
-        title_font = "Helvetica-Bold"
-        text_font = "Helvetica"
-    
-    # Title
-    p.setFont(title_font, 16)
-    p.drawCentredString(width/2, height-50, "Union-State Relations Questionnaire")
-    
-    # Section info
-    section_names = {
-        'legislative': 'Legislative Relations',
-        'administrative': 'Administrative Relations',
-        'financial': 'Financial Relations',
-        'commissions': 'Role of Commissions and Councils',
-        'constitutional': 'Constitutional and Judicial Influences',
-        'challenges': 'Challenges and Issues',
-        'examples': 'Specific Examples',
-        'articles': 'Important Articles',
-        'financial_articles': 'Articles Related to Financial Relations',
-    }
-    section_title = section_names.get(section_key, section_key.replace('_', ' ').title())
-    
-    p.setFont(title_font, 14)
-    p.drawString(40, height-80, section_title)
-    
-    # Respondent info and Application ID
-    p.setFont(text_font, 9)
-    respondent_info = (
-        f"Name: {respondent.name} | Profession: {respondent.get_profession_display()} | "
-        f"Specialization: {respondent.get_specialization_display()} | "
-        f"State: {respondent.state} | Date: {respondent.created_at.strftime('%d-%m-%Y')}"
-    )
-    p.drawString(40, height-100, respondent_info)
-    
-    app_id_text = f"Application ID: {respondent.application_id}"
-    p.drawString(40, height-120, app_id_text)
-    
-    # Initialize AcroForm
-    form = p.acroForm
-    
-    # Questions and answer fields
-    y_position = height - 150
-    for i, question in enumerate(questions):
-        # Question text
-        p.setFont(title_font, 11)
-        question_text = f"{i+1}. {question}"
-        
-        # Wrap text
-        max_width = width - 100
-        words = question_text.split()
-        lines = []
-        current_line = []
-        
-        for word in words:
-            test_line = ' '.join(current_line + [word])
-            if p.stringWidth(test_line, title_font, 11) <= max_width:
-                current_line.append(word)
-            else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-        
-        if current_line:
-            lines.append(' '.join(current_line))
-        
-        # Draw question
-        text_y = y_position
-        for line in lines:
-            p.drawString(50, text_y, line)
-            text_y -= 15
-        
-        # Create fillable field
-        field_name = f"answer_{i}"
-        field_height = 80
-        form.textfield(
-            name=field_name,
-            tooltip=f"Answer for question {i+1}",
-            x=50,
-            y=text_y - field_height - 10,
-            width=width-100,
-            height=field_height,
-            borderColor=colors.black,
-            fillColor=colors.white,
-            textColor=colors.black,
-            fontSize=10,
-            borderWidth=1,
-            fieldFlags=4096  # Multi-line flag
-        )
-        
-        y_position = text_y - field_height - 40
-        
-        # Page break if needed
-        if y_position < 100 and i < len(questions)-1:
-            p.showPage()
-            y_position = height - 50
-            p.setFont(title_font, 16)
-            p.drawCentredString(width/2, y_position, f"{section_title} (Continued)")
-            y_position -= 50
-            p.setFont(text_font, 9)
-            p.drawString(40, y_position, app_id_text)
-            y_position -= 30
-    
-    p.save()
-    return buffer.getvalue()
-
-
 def download_full_pdf(request, application_id):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
-    if respondent.full_downloaded:
+    # Compare-and-set in a single UPDATE that only touches full_downloaded
+    with transaction.atomic():
+        claimed = Respondent.objects.filter(
+            application_id=application_id, full_downloaded=False,
+        ).update(full_downloaded=True)
+        if claimed:
+            analytics.record_download(application_id, full=True)
+    if not claimed:
+        if not Respondent.objects.filter(application_id=application_id).exists():
+            raise Http404("No Respondent matches the given query.")
         return HttpResponse("Full questionnaire has already been downloaded.", status=403)
     
-    respondent.full_downloaded = True
-    respondent.save()
     return redirect('download_trigger', application_id=application_id, download_type='full')
 
 def download_section_pdf(request, application_id, section_key):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
-    if section_key not in SECTION_B_QUESTIONS:
+    if section_key not in get_questionnaire().questions:
         raise Http404("Section not found")
     
-    if section_key in respondent.sections_downloaded:
+    # Set the section key in SQL only if it is not there yet, so parallel
+    # clicks on different sections cannot overwrite each other
+    with transaction.atomic():
+        claimed = Respondent.objects.filter(
+            application_id=application_id,
+        ).exclude(
+            sections_downloaded__has_key=section_key,
+        ).update(sections_downloaded=JSONSetKey('sections_downloaded', section_key, True))
+        if claimed:
+            analytics.record_download(application_id, full=False)
+    if not claimed:
+        if not Respondent.objects.filter(application_id=application_id).exists():
+            raise Http404("No Respondent matches the given query.")
         return HttpResponse(f"Section '{section_key}' has already been downloaded.", status=403)
     
-    downloaded_sections = respondent.sections_downloaded
-    downloaded_sections[section_key] = True
-    respondent.sections_downloaded = downloaded_sections
-    respondent.save()
     return redirect('download_trigger_section', 
                    application_id=application_id, 
                    download_type='section',
@@ -378,93 +173,215 @@ def download_section_pdf(request, application_id, section_key):
 #         'redirect_url': final_url
 #     })
 
-def download_trigger(request, application_id, download_type, section_key=None):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
+async def download_trigger(request, application_id, download_type, section_key=None):
+    respondent = await aget_object_or_404(Respondent, application_id=application_id)
     final_url = reverse('final_page', kwargs={'application_id': application_id})
+    questionnaire = await aget_questionnaire()
     
+    # Links are only handed out for downloads that have been claimed
     if download_type == 'full':
-        download_url = reverse('serve_pdf', kwargs={'application_id': application_id, 'pdf_type': 'full'})
+        claimed = respondent.full_downloaded
     else:
-        download_url = reverse('serve_pdf_section', 
-                             kwargs={'application_id': application_id, 
-                                    'pdf_type': 'section', 
-                                    'section_key': section_key})
+        claimed = section_key in questionnaire.questions and section_key in respondent.sections_downloaded
+    if not claimed:
+        return HttpResponse("This download has not been requested.", status=403)
+    
+    # The link renders this questionnaire version even if a newer one goes
+    # live, in the language the respondent picked
+    language = await request.session.aget('language')
+    token = make_download_token(respondent, download_type, section_key, questionnaire.version, language)
+    download_url = reverse('serve_pdf', kwargs={'token': token})
     
-    return render(request, 'questionnaire/download_trigger.html', {
+    return await _arender(request, 'questionnaire/download_trigger.html', {
         'download_url': download_url,
         'redirect_url': final_url
     })
 
 
-def serve_pdf(request, application_id, pdf_type, section_key=None):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
+def _parse_byte_range(range_header, size):
+    """
+    Parse a single-range "bytes=" Range header.
+
+    Returns (start, end) inclusive, None when the header should be ignored
+    (unknown unit, multiple ranges, malformed) or False when the range
+    cannot be satisfied.
+    """
+    units, _, spec = range_header.partition('=')
+    if units.strip() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                return False
+            start = max(size - suffix, 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return False
+    return start, min(end, size - 1)
+
+
+async def serve_pdf(request, token):
+    # reportlab is imported on first use rather than with the views
+    from .pdf import pdf_etag, pdf_questionnaire
+    from .pdf_service import PDFRenderError, get_render_service
+
+    # The signed token says what to render; the header details usually come
+    # from the cache, so there is no session and normally no DB query
+    try:
+        application_id, pdf_type, section_key, version, language = read_download_token(token)
+        # Already compiled in this process unless it was just restarted
+        questionnaire = pdf_questionnaire(await aget_questionnaire(version), language)
+        respondent = await aget_header_respondent(application_id)
+    except ExpiredDownloadToken:
+        return HttpResponse("This download link has expired. Please start the download again.", status=403)
+    except (InvalidDownloadToken, UnknownQuestionnaireVersion, Respondent.DoesNotExist):
+        raise Http404("Invalid download link")
+    
+    # Revalidation (If-None-Match) is answered without rendering anything
+    etag = pdf_etag(respondent, pdf_type, section_key, questionnaire)
+    conditional_response = get_conditional_response(request, etag=etag)
+    if conditional_response is not None:
+        conditional_response['ETag'] = etag
+        return conditional_response
     
     if pdf_type == 'full':
-        pdf_content = generate_full_pdf(respondent)
         filename = f"CSR_Full_Questionnaire_{respondent.application_id}.pdf"
     else:
-        pdf_content = generate_section_pdf(respondent, section_key)
         filename = f"CSR_{section_key}_{respondent.application_id}.pdf"
     
-    response = HttpResponse(pdf_content, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    def pdf_response(content, status=200):
+        response = HttpResponse(content, content_type='application/pdf', status=status)
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        patch_cache_control(response, private=True, max_age=getattr(settings, 'PDF_CACHE_MAX_AGE', 3600))
+        return response
+    
+    # HEAD gets the headers only; the size is not known without rendering
+    if request.method == 'HEAD':
+        return pdf_response(b'')
+    
+    # Rendering runs in the render worker pool; shed load when it is saturated
+    render_started = time.perf_counter()
+    try:
+        pdf_content = await get_render_service().arender(respondent, pdf_type, section_key, version, language)
+    except PDFRenderError as exc:
+        logger.warning("PDF render rejected for %s: %s", application_id, exc)
+        response = HttpResponse("We are preparing many downloads right now. Please try again shortly.",
+                                status=503)
+        response['Retry-After'] = str(getattr(settings, 'PDF_RENDER_RETRY_AFTER', 5))
+        return response
+    metrics.observe_pdf_render(pdf_type, time.perf_counter() - render_started, len(pdf_content))
+    
+    # Resume support; If-Range falls back to the full document when stale
+    size = len(pdf_content)
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.headers.get('If-Range', etag) == etag:
+        byte_range = _parse_byte_range(range_header, size)
+    
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    
+    # The rendered document is in memory already, so it is sent as is
+    # rather than streamed
+    if byte_range:
+        start, end = byte_range
+        response = pdf_response(pdf_content[start:end + 1], status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = pdf_response(pdf_content)
+    response['Content-Length'] = len(response.content)
     return response
 
 
-
-
-
-def final_page(request, application_id):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
-    return render(request, 'questionnaire/final_page.html', {
+async def final_page(request, application_id):
+    respondent = await aget_object_or_404(Respondent, application_id=application_id)
+    return await _arender(request, 'questionnaire/final_page.html', {
         'respondent': respondent
     })
 
 
-def upload_start(request):
+async def upload_start(request):
     if request.method == 'POST':
         form = UploadVerificationForm(request.POST)
         if form.is_valid():
             application_id = form.cleaned_data['application_id']
             mobile_number = form.cleaned_data['mobile_number']
             
-            # First check if application ID exists
-            if not Respondent.objects.filter(application_id=application_id).exists():
+            # A single lookup tells a missing ID apart from a wrong number
+            respondent = await (
+                Respondent.objects.filter(application_id=application_id)
+                .only('id', 'mobile_number')
+                .afirst()
+            )
+            if respondent is None:
                 form.add_error('application_id', "This Application ID does not exist.")
-                return render(request, 'questionnaire/upload_start.html', {'form': form})
+                return await _arender(request, 'questionnaire/upload_start.html', {'form': form})
             
-            try:
-                respondent = Respondent.objects.get(
-                    application_id=application_id,
-                    mobile_number=mobile_number
-                )
-                request.session['verified_respondent_id'] = str(respondent.id)
+            if respondent.mobile_number == mobile_number:
+                await request.session.aset('verified_respondent_id', str(respondent.id))
                 return redirect('upload_pdf', application_id=application_id)
-                
-            except Respondent.DoesNotExist:
-                form.add_error('mobile_number', "Mobile number does not match our records for this Application ID.")
+            
+            form.add_error('mobile_number', "Mobile number does not match our records for this Application ID.")
     else:
         form = UploadVerificationForm()
     
-    return render(request, 'questionnaire/upload_start.html', {'form': form})
+    return await _arender(request, 'questionnaire/upload_start.html', {'form': form})
 
 
 
 
-def upload_pdf(request, application_id):
+@csrf_exempt
+async def upload_pdf(request, application_id):
     # Check session verification
-    respondent_id = request.session.get('verified_respondent_id')
+    respondent_id = await request.session.aget('verified_respondent_id')
     if not respondent_id:
         return redirect('upload_start')
     
-    respondent = get_object_or_404(Respondent, id=respondent_id, application_id=application_id)
+    respondent = await aget_object_or_404(Respondent, id=respondent_id, application_id=application_id)
     
+    # The file is streamed to disk while the body is parsed, so the handler
+    # must be in place before anything (the CSRF check included) reads POST
+    handler = ResponsePDFUploadHandler(request)
+    request.upload_handlers = [handler]
     if request.method == 'POST':
-        form = ResponseUploadForm(request.POST, request.FILES)
+        if request_too_large(request):
+            # Answered without reading the body; the form shown is read-only,
+            # so there is nothing for the CSRF check to protect
+            form = ResponseUploadForm({}, {}, upload_error=too_large_message())
+            return await _arender(request, 'questionnaire/upload_pdf.html', {
+                'form': form,
+                'respondent': respondent
+            })
+        # The CSRF check rejects a bad Origin or Referer and a missing CSRF
+        # cookie before it reads the body; only the token itself has to be
+        # parsed out of the upload
+        rejected = await sync_to_async(_check_csrf, thread_sensitive=False)(request)
+        if rejected is not None:
+            return rejected
+    
+    return await _upload_pdf(request, respondent, handler)
+
+def _check_csrf(request):
+    return CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {})
+
+async def _upload_pdf(request, respondent, handler):
+    application_id = respondent.application_id
+    if request.method == 'POST':
+        form = ResponseUploadForm(request.POST, request.FILES, upload_error=handler.error)
         if form.is_valid():
-            response_pdf = form.save(commit=False)
-            response_pdf.respondent = respondent
-            response_pdf.save()
+            metrics.observe_upload(form.cleaned_data['pdf_file'].size)
+            await sync_to_async(_save_response)(form, respondent)
             
             # Send verification email (would need email setup)
             # send_verification_email(response_pdf)
@@ -474,22 +391,63 @@ def upload_pdf(request, application_id):
     else:
         form = ResponseUploadForm()
     
-    return render(request, 'questionnaire/upload_pdf.html', {
+    return await _arender(request, 'questionnaire/upload_pdf.html', {
         'form': form,
         'respondent': respondent
     })
 
-def upload_success(request, application_id):
-    respondent = get_object_or_404(Respondent, application_id=application_id)
-    return render(request, 'questionnaire/upload_success.html', {'respondent': respondent})
+def _save_response(form, respondent):
+    with transaction.atomic():
+        response_pdf = form.save(commit=False)
+        response_pdf.respondent = respondent
+        response_pdf.save()
+        analytics.record_upload(respondent)
+        # Answers are read from the form fields in the background
+        schedule_extraction(response_pdf.pk)
+    return response_pdf
+
+async def upload_success(request, application_id):
+    respondent = await aget_object_or_404(Respondent, application_id=application_id)
+    return await _arender(request, 'questionnaire/upload_success.html', {'respondent': respondent})
 
 def verify_response(request, verification_code):
     try:
-        response_pdf = ResponsePDF.objects.get(verification_code=verification_code)
-        response_pdf.is_verified = True
-        response_pdf.save()
+        response_pdf = ResponsePDF.objects.select_related('respondent').get(verification_code=verification_code)
+        with transaction.atomic():
+            # Counted once, however often the link is opened
+            if ResponsePDF.objects.filter(pk=response_pdf.pk, is_verified=False).update(is_verified=True):
+                analytics.record_verification(response_pdf.respondent)
         messages.success(request, "Your response has been verified successfully!")
         return redirect('home')
     except ResponsePDF.DoesNotExist:
         messages.error(request, "Invalid verification code")
-        return redirect('home')
\ No newline at end of file
+        return redirect('home')
+
+
+@staff_member_required
+def metrics_view(request):
+    """Prometheus scrape endpoint for this worker's metrics"""
+    return HttpResponse(metrics.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def export_data(request, dataset):
+    """Stream respondents or responses as CSV / JSONL, filtered by the query string"""
+    if dataset not in exports.DATASETS:
+        raise Http404("Unknown dataset")
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    fmt = form.cleaned_data['format']
+    queryset = exports.export_queryset(dataset, **form.filters())
+    encoder = exports.RowEncoder(dataset, fmt)
+    if isinstance(request, ASGIRequest):
+        content = exports.aexport_lines(queryset, encoder)
+    else:
+        content = exports.export_lines(queryset, encoder)
+
+    response = StreamingHttpResponse(content, content_type=exports.FORMATS[fmt])
+    filename = f"{dataset}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response